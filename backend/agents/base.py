@@ -2,12 +2,21 @@
 Base agent class and interfaces
 """
 
-from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from abc import ABC
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, AsyncIterator, List, Optional
 from pydantic import BaseModel
+import asyncio
+import hashlib
 import logging
+import re
 
-from core.llm_router import llm_router, AgentType
+import litellm
+
+from core.config import settings
+from core.llm_router import llm_router, AgentType, prompt_cache_usage
+from services.tool_executor import ToolExecutionError, ToolExecutionService
 
 logger = logging.getLogger(__name__)
 
@@ -35,14 +44,263 @@ class AgentResponse(BaseModel):
     conversation_state: Dict[str, Any] = {}
 
 
+class AgentPrompt(BaseModel):
+    """Prepared LLM input for a request"""
+    messages: List[Dict[str, Any]]
+    metadata: Dict[str, Any] = {}
+
+
+class ContextPiece(BaseModel):
+    """Candidate piece of prompt context"""
+    kind: str  # selection, recent_change, related_code, open_file
+    label: str
+    content: str
+    relevance: float
+    language: str = ""
+
+
+# Workspace context render order: open files change least between requests
+RENDER_ORDER = {"open_file": 0, "recent_change": 1, "related_code": 2}
+
+
+class PackedContext(BaseModel):
+    """Context pieces that fit the prompt budget"""
+    pieces: List[ContextPiece] = []
+    tokens: int = 0
+    budget: int = 0
+    dropped: int = 0
+    truncated: int = 0
+    
+    def text(self, kind: str) -> str:
+        """Content of the kept pieces of one kind"""
+        return "\n\n".join(piece.content for piece in self.pieces if piece.kind == kind)
+    
+    def render(self, exclude: tuple = ("selection",)) -> str:
+        """
+        Render kept pieces as a prompt section
+        
+        Ordered by kind (most stable first) and label rather than relevance,
+        so the same workspace state renders to the same bytes across requests.
+        """
+        pieces = sorted(
+            (piece for piece in self.pieces if piece.kind not in exclude),
+            key=lambda piece: (RENDER_ORDER.get(piece.kind, len(RENDER_ORDER)), piece.label)
+        )
+        blocks = [
+            f"\n{piece.label}:\n```{piece.language}\n{piece.content}\n```"
+            for piece in pieces
+        ]
+        if not blocks:
+            return ""
+        return "Workspace context:" + "".join(blocks)
+    
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "context_tokens": self.tokens,
+            "context_budget": self.budget,
+            "context_pieces": len(self.pieces),
+            "context_pieces_dropped": self.dropped,
+            "context_pieces_truncated": self.truncated
+        }
+
+
+@lru_cache(maxsize=1)
+def _get_tokenizer():
+    """Shared tokenizer (cl100k_base approximates the DeepSeek/OpenAI vocabularies)"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating tokens from length: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens for a piece of text"""
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return len(text) // 4 + 1
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+class ContextBuilder:
+    """
+    Packs ranked context pieces into a token budget
+    
+    Pieces are considered by relevance. Exact and mostly-overlapping
+    duplicates of a more relevant piece are dropped, and spans repeating a
+    more relevant piece are elided. Pieces that do not fit are compacted
+    (head and tail kept) when enough budget is left, otherwise dropped.
+    The selection is always kept, compacted if needed.
+    """
+    
+    # Smallest remainder worth compacting a piece into
+    MIN_COMPACT_TOKENS = 200
+    # Share of a piece's lines found in a kept piece that makes it a duplicate
+    OVERLAP_THRESHOLD = 0.8
+    
+    def __init__(self, budget: int):
+        self.budget = max(0, budget)
+        self._pieces: List[ContextPiece] = []
+    
+    def add(self, piece: ContextPiece):
+        if piece.content and piece.content.strip():
+            self._pieces.append(piece)
+    
+    def build(self) -> PackedContext:
+        packed = PackedContext(budget=self.budget)
+        kept_hashes = set()
+        kept_lines: List[set] = []
+        
+        for piece in sorted(self._pieces, key=lambda p: (p.kind != "selection", -p.relevance)):
+            digest = hashlib.sha1(" ".join(piece.content.split()).encode()).hexdigest()
+            lines = _significant_lines(piece.content)
+            if digest in kept_hashes or self._overlaps(lines, kept_lines):
+                packed.dropped += 1
+                continue
+            
+            piece = self._elide_repeats(piece, packed.pieces)
+            tokens = count_tokens(piece.content)
+            remaining = self.budget - packed.tokens
+            
+            if tokens > remaining:
+                if piece.kind == "selection":
+                    # Never reduce the selection to nothing
+                    remaining = max(remaining, self.MIN_COMPACT_TOKENS)
+                elif remaining < self.MIN_COMPACT_TOKENS:
+                    packed.dropped += 1
+                    continue
+                piece = piece.model_copy(update={"content": _compact(piece.content, remaining)})
+                tokens = count_tokens(piece.content)
+                packed.truncated += 1
+            
+            packed.pieces.append(piece)
+            packed.tokens += tokens
+            kept_hashes.add(digest)
+            kept_lines.append(lines)
+        
+        return packed
+    
+    def _overlaps(self, lines: set, kept_lines: List[set]) -> bool:
+        if not lines:
+            return False
+        return any(len(lines & kept) / len(lines) >= self.OVERLAP_THRESHOLD for kept in kept_lines)
+    
+    def _elide_repeats(self, piece: ContextPiece, kept: List[ContextPiece]) -> ContextPiece:
+        """Replace verbatim copies of kept pieces (e.g. the selection inside its file)"""
+        content = piece.content
+        for other in kept:
+            if len(other.content) >= 200 and other.content in content:
+                content = content.replace(other.content, f"[... {other.label} shown above ...]")
+        if content == piece.content:
+            return piece
+        return piece.model_copy(update={"content": content})
+
+
+def _significant_lines(text: str) -> set:
+    return {line.strip() for line in text.splitlines() if len(line.strip()) > 3}
+
+
+def _compact(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of a text within a token budget"""
+    lines = text.splitlines()
+    if max_tokens <= 0 or not lines:
+        return ""
+    
+    # Shrink by the observed chars-per-token ratio until it fits
+    ratio = max(1.0, len(text) / max(1, count_tokens(text)))
+    max_chars = int(max_tokens * ratio * 0.9)
+    while True:
+        head, tail, used = [], [], 0
+        for line in lines:
+            if used + len(line) + 1 > max_chars * 0.7:
+                break
+            head.append(line)
+            used += len(line) + 1
+        for line in reversed(lines[len(head):]):
+            if used + len(line) + 1 > max_chars:
+                break
+            tail.insert(0, line)
+            used += len(line) + 1
+        
+        if not head and not tail:
+            # A single overlong line
+            return text[:max_chars] + "\n... truncated ..."
+        
+        omitted = len(lines) - len(head) - len(tail)
+        marker = [f"... {omitted} lines omitted ..."] if omitted else []
+        compacted = "\n".join(head + marker + tail)
+        if count_tokens(compacted) <= max_tokens or max_chars < 100:
+            return compacted
+        max_chars = int(max_chars * 0.8)
+
+
+# Allowance for prompt template text around the packed context
+PROMPT_OVERHEAD_TOKENS = 300
+
+_LANGUAGES = {
+    ".py": "python", ".js": "javascript", ".jsx": "javascript", ".ts": "typescript",
+    ".tsx": "tsx", ".go": "go", ".rs": "rust", ".java": "java", ".rb": "ruby",
+    ".yml": "yaml", ".yaml": "yaml", ".json": "json", ".md": "markdown", ".sh": "bash"
+}
+
+
+def _language_of(path: Optional[str]) -> str:
+    if not path:
+        return ""
+    return _LANGUAGES.get(Path(path).suffix.lower(), "")
+
+
+def _terms(text: str) -> set:
+    return {term.lower() for term in re.findall(r"[A-Za-z_][A-Za-z0-9_]{2,}", text)}
+
+
+def _overlap(query_terms: set, terms: set) -> float:
+    """Share of query terms that appear in a piece"""
+    if not query_terms:
+        return 0.0
+    return len(query_terms & terms) / len(query_terms)
+
+
+@lru_cache(maxsize=64)
+def _model_context_window(model: str) -> int:
+    provider = model.split("/", 1)[0].lower()
+    if provider in settings.MODEL_CONTEXT_WINDOWS:
+        return settings.MODEL_CONTEXT_WINDOWS[provider]
+    try:
+        info = litellm.get_model_info(model)
+        return int(info.get("max_input_tokens") or settings.MAX_CONTEXT_TOKENS)
+    except Exception:
+        return settings.MAX_CONTEXT_TOKENS
+
+
+def _read_workspace_file(workspace_path: str, path: str) -> str:
+    """Read an open file for context; paths outside the tool file root are ignored"""
+    try:
+        # Same root (TOOL_FILE_ROOT or the workspace) and escape check as file_read
+        file_path = ToolExecutionService(workspace_path)._resolve_path(path)
+        if not file_path.is_file() or file_path.stat().st_size > settings.TOOL_MAX_FILE_SIZE_BYTES:
+            return ""
+        return file_path.read_text(encoding="utf-8", errors="replace")
+    except (OSError, ToolExecutionError):
+        return ""
+
+
 class BaseAgent(ABC):
     """Base class for all agents"""
     
+    # Sampling temperature for this agent's completions
+    temperature: float = 0.7
+    # Prefix of the error message returned when processing fails
+    failure_message: str = "Request processing failed"
+    
     def __init__(self, agent_type: AgentType):
         self.agent_type = agent_type
         self.logger = logging.getLogger(f"agent.{agent_type.value}")
+        self._system_prompt: Optional[str] = None
     
-    @abstractmethod
     async def process(self, context: AgentContext) -> AgentResponse:
         """
         Process request and generate response
@@ -53,7 +311,216 @@ class BaseAgent(ABC):
         Returns:
             Agent response
         """
-        pass
+        try:
+            rejection = self.check_context(context)
+            if rejection:
+                return rejection
+            
+            prompt = await self.build_prompt(context)
+            completion = await self.get_completion(
+                messages=prompt.messages,
+                temperature=self.temperature,
+                raw=True
+            )
+            content = completion.choices[0].message.get("content") or ""
+            prompt.metadata.update(prompt_cache_usage(completion))
+            
+            response = self.build_response(context, content, prompt)
+            await self.log_interaction(context, response)
+            return response
+            
+        except Exception as e:
+            self.logger.error(f"{self.failure_message}: {e}", exc_info=True)
+            return AgentResponse(
+                success=False,
+                content=f"{self.failure_message}: {str(e)}",
+                confidence=0.0
+            )
+    
+    async def process_stream(self, context: AgentContext) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process request, streaming model output as it is generated
+        
+        Yields events:
+            {"type": "delta", "content": str} for each content delta
+            {"type": "tool_call", "tool_call": dict} for each requested tool
+            {"type": "done", "response": AgentResponse} once finished
+        """
+        try:
+            rejection = self.check_context(context)
+            if rejection:
+                yield {"type": "done", "response": rejection}
+                return
+            
+            prompt = await self.build_prompt(context)
+            content = ""
+            async for event in self.stream_completion(
+                messages=prompt.messages,
+                temperature=self.temperature
+            ):
+                if event["type"] == "finish":
+                    content = event["content"]
+                    prompt.metadata.update(event["usage"])
+                else:
+                    yield event
+            
+            response = self.build_response(context, content, prompt)
+            await self.log_interaction(context, response)
+            yield {"type": "done", "response": response}
+            
+        except Exception as e:
+            self.logger.error(f"{self.failure_message}: {e}", exc_info=True)
+            yield {
+                "type": "done",
+                "response": AgentResponse(
+                    success=False,
+                    content=f"{self.failure_message}: {str(e)}",
+                    confidence=0.0
+                )
+            }
+    
+    def check_context(self, context: AgentContext) -> Optional[AgentResponse]:
+        """Return a response to short-circuit requests this agent cannot handle"""
+        return None
+    
+    async def build_prompt(self, context: AgentContext) -> AgentPrompt:
+        """
+        Prepare the prompt and add output of upstream agents, if any
+        
+        In multi-agent runs an agent's dependencies pass their output as
+        ``{agent}_response`` entries of additional_context.
+        """
+        prompt = await self.prepare_prompt(context)
+        
+        upstream = [
+            f"Output from the {key[:-len('_response')]} agent:\n{value}"
+            for key, value in context.additional_context.items()
+            if key.endswith("_response") and value
+        ]
+        if not upstream:
+            return prompt
+        if prompt.messages and prompt.messages[-1]["role"] == "user":
+            last = dict(prompt.messages[-1])
+            last["content"] = "\n\n".join([last["content"], *upstream])
+            prompt.messages[-1] = last
+        else:
+            # Prompts ending in an assistant or tool turn get it as a new user turn
+            prompt.messages.append({"role": "user", "content": "\n\n".join(upstream)})
+        return prompt
+    
+    def context_budget(self, reserved_tokens: int = 0) -> int:
+        """
+        Tokens available for context pieces in this agent's prompts
+        
+        CONTEXT_BUDGET_TOKENS, capped by the model's context window (from
+        MODEL_CONTEXT_WINDOWS by provider prefix, else litellm's model info,
+        else MAX_CONTEXT_TOKENS) minus the output allowance.
+        
+        Args:
+            reserved_tokens: Tokens already used by instructions and the query
+        """
+        model = llm_router.get_model(self.agent_type)
+        window = _model_context_window(model)
+        available = min(settings.CONTEXT_BUDGET_TOKENS, window - settings.MAX_OUTPUT_TOKENS)
+        return max(0, available - reserved_tokens)
+    
+    async def assemble_context(
+        self,
+        context: AgentContext,
+        related_code: Optional[List[Dict[str, Any]]] = None
+    ) -> PackedContext:
+        """
+        Rank, deduplicate and pack the request's context into the budget
+        
+        Candidates: the selection, recent changes, related code search hits
+        and the current/open files' contents.
+        
+        Args:
+            context: Agent context
+            related_code: Vector search hits (with score) to consider
+            
+        Returns:
+            Packed context; see PackedContext.metadata() for accounting
+        """
+        reserved = count_tokens(self.build_system_prompt()) + count_tokens(context.user_query) + PROMPT_OVERHEAD_TOKENS
+        builder = ContextBuilder(self.context_budget(reserved))
+        query_terms = _terms(context.user_query)
+        
+        if context.selected_code:
+            builder.add(ContextPiece(
+                kind="selection",
+                label=f"Selected code ({context.current_file or 'unknown file'})",
+                content=context.selected_code,
+                relevance=1.0,
+                language=_language_of(context.current_file)
+            ))
+        
+        # Most recent change first
+        for i, change in enumerate(reversed(context.recent_changes[-10:])):
+            content = change.get("diff") or change.get("content") or ""
+            file_path = change.get("file_path") or change.get("file") or "unknown file"
+            builder.add(ContextPiece(
+                kind="recent_change",
+                label=f"Recent change ({file_path})",
+                content=content,
+                relevance=0.75 - 0.05 * i,
+                language="diff" if change.get("diff") else _language_of(file_path)
+            ))
+        
+        for hit in related_code or []:
+            builder.add(ContextPiece(
+                kind="related_code",
+                label=f"Related code ({hit.get('file_path', 'unknown')})",
+                content=hit.get("content", ""),
+                relevance=0.4 + 0.5 * float(hit.get("score") or 0.0),
+                language=hit.get("language", "")
+            ))
+        
+        open_files = list(dict.fromkeys(
+            ([context.current_file] if context.current_file else []) + context.open_files
+        ))[:settings.CONTEXT_MAX_OPEN_FILES]
+        contents = await asyncio.gather(*(
+            asyncio.to_thread(_read_workspace_file, context.workspace_path, path) for path in open_files
+        ))
+        for path, content in zip(open_files, contents):
+            if not content:
+                continue
+            base = 0.45 if path == context.current_file else 0.25
+            builder.add(ContextPiece(
+                kind="open_file",
+                label=f"File {path}",
+                content=content,
+                relevance=base + 0.2 * _overlap(query_terms, _terms(content)),
+                language=_language_of(path)
+            ))
+        
+        packed = builder.build()
+        self.logger.debug(
+            f"Context: {packed.tokens}/{packed.budget} tokens, "
+            f"{len(packed.pieces)} pieces, {packed.dropped} dropped, {packed.truncated} compacted"
+        )
+        return packed
+    
+    async def prepare_prompt(self, context: AgentContext) -> AgentPrompt:
+        """Build the messages (and request metadata) sent to the model"""
+        packed = await self.assemble_context(context)
+        return AgentPrompt(
+            messages=self.compose_messages(packed, self.format_context(context, packed)),
+            metadata=packed.metadata()
+        )
+    
+    def build_response(
+        self,
+        context: AgentContext,
+        content: str,
+        prompt: AgentPrompt
+    ) -> AgentResponse:
+        """Turn model output into an agent response"""
+        return AgentResponse(
+            success=True,
+            content=content,
+            metadata=dict(prompt.metadata)
+        )
     
     async def get_completion(
         self,
@@ -87,19 +554,114 @@ class BaseAgent(ABC):
         # OpenAI-compatible responses may omit content when issuing tool calls
         return message.get("content") or ""
     
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: float = 0.7,
+        **kwargs
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream LLM completion for this agent
+        
+        Yields "delta" events as content arrives, a "tool_call" event per
+        assembled tool call, then a final "finish" event carrying the full
+        content, tool calls, finish reason and prompt token usage.
+        """
+        content_parts: List[str] = []
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+        finish_reason = None
+        usage: Dict[str, int] = {}
+        
+        async for chunk in llm_router.stream_chunks(
+            messages=messages,
+            agent_type=self.agent_type,
+            temperature=temperature,
+            **kwargs
+        ):
+            # Usage arrives on the final chunk, when the provider sends it
+            usage = prompt_cache_usage(chunk) or usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta
+            finish_reason = choice.finish_reason or finish_reason
+            
+            if delta.content:
+                content_parts.append(delta.content)
+                yield {"type": "delta", "content": delta.content}
+            
+            # Tool calls arrive as fragments keyed by index
+            for fragment in getattr(delta, "tool_calls", None) or []:
+                call = tool_calls.setdefault(fragment.index or 0, {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+                if fragment.id:
+                    call["id"] = fragment.id
+                if fragment.function:
+                    if fragment.function.name:
+                        call["function"]["name"] += fragment.function.name
+                    if fragment.function.arguments:
+                        call["function"]["arguments"] += fragment.function.arguments
+        
+        ordered_calls = [tool_calls[index] for index in sorted(tool_calls)]
+        for call in ordered_calls:
+            yield {"type": "tool_call", "tool_call": call}
+        
+        yield {
+            "type": "finish",
+            "content": "".join(content_parts),
+            "tool_calls": ordered_calls,
+            "finish_reason": finish_reason,
+            "usage": usage
+        }
+    
+    def system_prompt(self) -> str:
+        """This agent's system prompt, built once"""
+        if self._system_prompt is None:
+            self._system_prompt = self.build_system_prompt()
+        return self._system_prompt
+    
+    def compose_messages(self, packed: Optional[PackedContext], request_text: str) -> List[Dict[str, Any]]:
+        """
+        Assemble messages in prefix-stable order
+        
+        Static system prompt, then workspace context (stable across a
+        session's requests), then the request-specific text. Providers that
+        cache prompt prefixes (DeepSeek context caching, llamafile's KV
+        cache) can then reuse everything up to the volatile part. The
+        workspace context and request share one user message, as some
+        models reject consecutive user messages.
+        
+        Args:
+            packed: Packed context (its non-selection pieces form the workspace block)
+            request_text: Selection, query and instructions for this request
+            
+        Returns:
+            Chat messages
+        """
+        workspace = packed.render() if packed else ""
+        user_content = f"{workspace}\n\n{request_text}" if workspace else request_text
+        return [
+            {"role": "system", "content": self.system_prompt()},
+            {"role": "user", "content": user_content}
+        ]
+    
     def build_system_prompt(self) -> str:
         """Build system prompt for this agent"""
         return f"You are a {self.agent_type.value} agent."
     
-    def format_context(self, context: AgentContext) -> str:
-        """Format context for LLM"""
+    def format_context(self, context: AgentContext, packed: Optional[PackedContext] = None) -> str:
+        """Format context for LLM (using the packed context when given)"""
         parts = [f"User Query: {context.user_query}"]
         
         if context.current_file:
             parts.append(f"\nCurrent File: {context.current_file}")
         
-        if context.selected_code:
-            parts.append(f"\nSelected Code:\n```\n{context.selected_code}\n```")
+        selection = packed.text("selection") if packed else context.selected_code
+        if selection:
+            parts.append(f"\nSelected Code:\n```\n{selection}\n```")
         
         if context.open_files:
             parts.append(f"\nOpen Files: {', '.join(context.open_files)}")
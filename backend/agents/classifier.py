@@ -0,0 +1,191 @@
+"""
+Embedding-based request classifier
+
+Each RequestType has a centroid: the normalized mean embedding of a few
+exemplar requests. A query is embedded once (through the embedding cache)
+and scored against all centroids with a single matrix-vector product. Low
+confidence results return None so the caller can fall back to keyword rules.
+"""
+
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+import numpy as np
+
+from core.config import settings
+from core.embeddings import embed_text, embed_texts, get_embeddings_model
+
+logger = logging.getLogger(__name__)
+
+
+class RequestType(str, Enum):
+    """Types of user requests"""
+    IMPLEMENT = "implement"
+    REVIEW = "review"
+    DEBUG = "debug"
+    REFACTOR = "refactor"
+    EXPLAIN = "explain"
+    DOCUMENT = "document"
+    SECURITY = "security"
+    DEVOPS = "devops"
+    TEST = "test"
+    UNKNOWN = "unknown"
+
+
+EXEMPLARS: Dict[RequestType, List[str]] = {
+    RequestType.IMPLEMENT: [
+        "implement a function that parses the config file",
+        "create a REST endpoint for user registration",
+        "add a method to the class that exports results as CSV",
+        "write a React component that shows a paginated table",
+        "build a CLI command to import data from a JSON file",
+        "generate a data model for orders and invoices",
+    ],
+    RequestType.REVIEW: [
+        "review this code for quality and best practices",
+        "can you check this pull request for issues",
+        "give me feedback on this implementation",
+        "what could be improved in this function",
+        "is this code idiomatic and maintainable",
+        "look over my changes before I merge",
+    ],
+    RequestType.DEBUG: [
+        "why does this throw a KeyError",
+        "fix this bug, the test fails with a null pointer",
+        "the app crashes on startup with this stack trace",
+        "this function returns the wrong result",
+        "debug why the request times out",
+        "I get TypeError: undefined is not a function",
+    ],
+    RequestType.REFACTOR: [
+        "refactor this class into smaller functions",
+        "clean up this module and remove duplication",
+        "simplify this nested conditional logic",
+        "restructure the code to use dependency injection",
+        "rename variables and extract helper methods",
+        "convert these callbacks to async await",
+    ],
+    RequestType.EXPLAIN: [
+        "explain what this code does",
+        "how does this algorithm work",
+        "what is the purpose of this function",
+        "help me understand this regular expression",
+        "walk me through this module step by step",
+    ],
+    RequestType.DOCUMENT: [
+        "write docstrings for these functions",
+        "generate API documentation for this module",
+        "add comments explaining this code",
+        "write a README for this project",
+        "document the parameters and return values",
+    ],
+    RequestType.SECURITY: [
+        "audit this code for security vulnerabilities",
+        "is this vulnerable to SQL injection",
+        "check for XSS and CSRF issues in this form handler",
+        "are there hardcoded secrets or credentials here",
+        "review the authentication and authorization logic for flaws",
+    ],
+    RequestType.DEVOPS: [
+        "write a Dockerfile for this service",
+        "create a GitHub Actions CI pipeline",
+        "set up a Kubernetes deployment and service",
+        "configure nginx as a reverse proxy",
+        "write a docker-compose file with postgres and redis",
+        "add Terraform for an S3 bucket",
+    ],
+    RequestType.TEST: [
+        "write unit tests for this function",
+        "add pytest cases covering the edge cases",
+        "generate integration tests for the API",
+        "increase test coverage for this module",
+        "mock the database in these tests",
+    ],
+}
+
+
+class RequestClassifier:
+    """Nearest-centroid classifier over request embeddings"""
+    
+    def __init__(self, exemplars: Dict[RequestType, List[str]] = EXEMPLARS):
+        self.exemplars = exemplars
+        self._types: List[RequestType] = []
+        self._centroids: Optional[np.ndarray] = None  # (types, dim), unit rows
+        self._lock = asyncio.Lock()
+    
+    def available(self) -> bool:
+        """Whether a local embedding model is loaded to classify with"""
+        return settings.CLASSIFIER_ENABLED and get_embeddings_model() is not None
+    
+    async def warmup(self):
+        """Build the centroids ahead of the first request"""
+        if not self.available():
+            return
+        try:
+            await self._get_centroids()
+        except Exception as e:
+            logger.warning(f"Request classifier warmup failed: {e}")
+    
+    async def classify(self, query: str) -> Optional[Tuple[RequestType, float]]:
+        """
+        Classify a request
+        
+        Args:
+            query: User query
+        
+        Returns:
+            (request type, cosine score), or None when the classifier is
+            unavailable or not confident enough
+        """
+        if not self.available() or not query.strip():
+            return None
+        
+        centroids = await self._get_centroids()
+        vector = np.asarray(await embed_text(query), dtype=np.float32)
+        return self.score(centroids, vector)
+    
+    def score(self, centroids: np.ndarray, vector: np.ndarray) -> Optional[Tuple[RequestType, float]]:
+        """Nearest centroid for an embedded query, subject to the confidence thresholds"""
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        
+        scores = centroids @ (vector / norm)
+        order = np.argsort(scores)
+        best, runner_up = scores[order[-1]], scores[order[-2]]
+        
+        if best < settings.CLASSIFIER_MIN_SCORE or best - runner_up < settings.CLASSIFIER_MIN_MARGIN:
+            return None
+        return self._types[order[-1]], float(best)
+    
+    async def _get_centroids(self) -> np.ndarray:
+        """Embed the exemplars once and build the centroid matrix"""
+        if self._centroids is not None:
+            return self._centroids
+        
+        async with self._lock:
+            if self._centroids is None:
+                types = list(self.exemplars)
+                texts = [text for request_type in types for text in self.exemplars[request_type]]
+                vectors = np.asarray(await embed_texts(texts), dtype=np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                
+                rows = []
+                offset = 0
+                for request_type in types:
+                    count = len(self.exemplars[request_type])
+                    centroid = vectors[offset:offset + count].mean(axis=0)
+                    rows.append(centroid / np.linalg.norm(centroid))
+                    offset += count
+                
+                self._types = types
+                self._centroids = np.vstack(rows)
+                logger.info(f"🧭 Request classifier ready ({len(types)} types, {len(texts)} exemplars)")
+        
+        return self._centroids
+
+
+# Global classifier instance
+request_classifier = RequestClassifier()
@@ -2,7 +2,7 @@
 Debug Agent - Troubleshooting and error analysis
 """
 
-from agents.base import BaseAgent, AgentContext, AgentResponse
+from agents.base import BaseAgent, AgentContext, AgentPrompt, AgentResponse, PackedContext
 from core.llm_router import AgentType
 from services.sandbox import execute_code
 
@@ -10,6 +10,9 @@ from services.sandbox import execute_code
 class DebugAgent(BaseAgent):
     """Agent specialized in debugging"""
     
+    temperature = 0.3
+    failure_message = "Debug analysis failed"
+    
     def __init__(self):
         super().__init__(AgentType.DEBUG)
     
@@ -37,59 +40,48 @@ Always:
 - Explain the debugging process
 - Recommend testing approaches"""
     
-    async def process(self, context: AgentContext) -> AgentResponse:
-        """Debug code and provide solutions"""
-        try:
-            # Check if we can run the code in sandbox
-            can_execute = self._can_sandbox_execute(context)
-            
-            messages = [
-                {"role": "system", "content": self.build_system_prompt()},
-                {"role": "user", "content": self._build_debug_prompt(context)}
-            ]
-            
-            # If we have runnable code, try executing it
-            execution_result = None
-            if can_execute and context.selected_code:
-                execution_result = await self._safe_execute(context)
-                if execution_result:
-                    messages.append({
-                        "role": "assistant",
-                        "content": f"Execution result:\n{execution_result}"
-                    })
-            
-            debug_analysis = await self.get_completion(
-                messages=messages,
-                temperature=0.3
-            )
-            
-            response = AgentResponse(
-                success=True,
-                content=debug_analysis,
-                metadata={
-                    "execution_attempted": can_execute,
-                    "execution_result": execution_result
-                },
-                actions=self._generate_debug_actions(debug_analysis),
-                confidence=0.8
-            )
-            
-            await self.log_interaction(context, response)
-            return response
-            
-        except Exception as e:
-            self.logger.error(f"Debug failed: {e}", exc_info=True)
-            return AgentResponse(
-                success=False,
-                content=f"Debug analysis failed: {str(e)}",
-                confidence=0.0
-            )
+    async def prepare_prompt(self, context: AgentContext) -> AgentPrompt:
+        """Build debug prompt, including sandbox output when the code is runnable"""
+        # Check if we can run the code in sandbox
+        can_execute = self._can_sandbox_execute(context)
+        
+        packed = await self.assemble_context(context)
+        messages = self.compose_messages(packed, self._build_debug_prompt(context, packed))
+        
+        # If we have runnable code, try executing it
+        execution_result = None
+        if can_execute and context.selected_code:
+            execution_result = await self._safe_execute(context)
+            if execution_result:
+                messages.append({
+                    "role": "assistant",
+                    "content": f"Execution result:\n{execution_result}"
+                })
+        
+        return AgentPrompt(
+            messages=messages,
+            metadata={
+                "execution_attempted": can_execute,
+                "execution_result": execution_result,
+                **packed.metadata()
+            }
+        )
+    
+    def build_response(self, context: AgentContext, debug_analysis: str, prompt: AgentPrompt) -> AgentResponse:
+        """Wrap debug analysis"""
+        return AgentResponse(
+            success=True,
+            content=debug_analysis,
+            metadata=dict(prompt.metadata),
+            actions=self._generate_debug_actions(debug_analysis),
+            confidence=0.8
+        )
     
-    def _build_debug_prompt(self, context: AgentContext) -> str:
+    def _build_debug_prompt(self, context: AgentContext, packed: PackedContext) -> str:
         parts = [f"Debug Request: {context.user_query}"]
         
         if context.selected_code:
-            parts.append(f"\nCode to debug:\n```\n{context.selected_code}\n```")
+            parts.append(f"\nCode to debug:\n```\n{packed.text('selection')}\n```")
         
         if context.additional_context.get('error_message'):
             parts.append(f"\nError Message:\n{context.additional_context['error_message']}")
@@ -2,13 +2,16 @@
 DevOps Agent - Infrastructure, CI/CD, and deployment
 """
 
-from agents.base import BaseAgent, AgentContext, AgentResponse
+from agents.base import BaseAgent, AgentContext, AgentPrompt, AgentResponse, PackedContext
 from core.llm_router import AgentType
 
 
 class DevOpsAgent(BaseAgent):
     """Agent specialized in DevOps and infrastructure"""
     
+    temperature = 0.3
+    failure_message = "DevOps configuration failed"
+    
     def __init__(self):
         super().__init__(AgentType.DEVOPS)
     
@@ -51,52 +54,38 @@ Always provide:
 - Security considerations
 - Scalability considerations"""
     
-    async def process(self, context: AgentContext) -> AgentResponse:
-        """Generate DevOps configurations"""
-        try:
-            messages = [
-                {"role": "system", "content": self.build_system_prompt()},
-                {"role": "user", "content": self._build_devops_prompt(context)}
-            ]
-            
-            devops_config = await self.get_completion(
-                messages=messages,
-                temperature=0.3
-            )
-            
-            config_type = self._infer_config_type(context)
-            
-            response = AgentResponse(
-                success=True,
-                content=devops_config,
-                metadata={
-                    "config_type": config_type,
-                },
-                actions=[
-                    {"type": "create_config", "config_type": config_type}
-                ],
-                confidence=0.85
-            )
-            
-            await self.log_interaction(context, response)
-            return response
-            
-        except Exception as e:
-            self.logger.error(f"DevOps agent failed: {e}", exc_info=True)
-            return AgentResponse(
-                success=False,
-                content=f"DevOps configuration failed: {str(e)}",
-                confidence=0.0
-            )
+    async def prepare_prompt(self, context: AgentContext) -> AgentPrompt:
+        packed = await self.assemble_context(context)
+        return AgentPrompt(
+            messages=self.compose_messages(packed, self._build_devops_prompt(context, packed)),
+            metadata=packed.metadata()
+        )
+    
+    def build_response(self, context: AgentContext, devops_config: str, prompt: AgentPrompt) -> AgentResponse:
+        """Wrap generated configuration"""
+        config_type = self._infer_config_type(context)
+        
+        return AgentResponse(
+            success=True,
+            content=devops_config,
+            metadata={
+                "config_type": config_type,
+                **prompt.metadata
+            },
+            actions=[
+                {"type": "create_config", "config_type": config_type}
+            ],
+            confidence=0.85
+        )
     
-    def _build_devops_prompt(self, context: AgentContext) -> str:
+    def _build_devops_prompt(self, context: AgentContext, packed: PackedContext) -> str:
         parts = [f"DevOps Request: {context.user_query}"]
         
         if context.workspace_path:
             parts.append(f"\nProject: {context.workspace_path}")
         
         if context.selected_code:
-            parts.append(f"\nExisting configuration:\n```\n{context.selected_code}\n```")
+            parts.append(f"\nExisting configuration:\n```\n{packed.text('selection')}\n```")
         
         parts.append("\nProvide:")
         parts.append("- Complete configuration files")
@@ -2,13 +2,16 @@
 Documentation Agent - Generates and maintains documentation
 """
 
-from agents.base import BaseAgent, AgentContext, AgentResponse
+from agents.base import BaseAgent, AgentContext, AgentPrompt, AgentResponse, PackedContext
 from core.llm_router import AgentType
 
 
 class DocumentationAgent(BaseAgent):
     """Agent specialized in documentation"""
     
+    temperature = 0.3
+    failure_message = "Documentation generation failed"
+    
     def __init__(self):
         super().__init__(AgentType.DOCUMENTATION)
     
@@ -38,47 +41,33 @@ Best Practices:
 - Keep documentation up-to-date
 - Use proper formatting (Markdown)"""
     
-    async def process(self, context: AgentContext) -> AgentResponse:
-        """Generate documentation"""
-        try:
-            messages = [
-                {"role": "system", "content": self.build_system_prompt()},
-                {"role": "user", "content": self._build_doc_prompt(context)}
-            ]
-            
-            doc_text = await self.get_completion(
-                messages=messages,
-                temperature=0.3  # Lower for consistent formatting
-            )
-            
-            response = AgentResponse(
-                success=True,
-                content=doc_text,
-                metadata={
-                    "doc_type": self._infer_doc_type(context)
-                },
-                actions=[
-                    {"type": "create_documentation", "content": doc_text}
-                ],
-                confidence=0.9
-            )
-            
-            await self.log_interaction(context, response)
-            return response
-            
-        except Exception as e:
-            self.logger.error(f"Documentation failed: {e}", exc_info=True)
-            return AgentResponse(
-                success=False,
-                content=f"Documentation generation failed: {str(e)}",
-                confidence=0.0
-            )
+    async def prepare_prompt(self, context: AgentContext) -> AgentPrompt:
+        packed = await self.assemble_context(context)
+        return AgentPrompt(
+            messages=self.compose_messages(packed, self._build_doc_prompt(context, packed)),
+            metadata=packed.metadata()
+        )
+    
+    def build_response(self, context: AgentContext, doc_text: str, prompt: AgentPrompt) -> AgentResponse:
+        """Wrap generated documentation"""
+        return AgentResponse(
+            success=True,
+            content=doc_text,
+            metadata={
+                "doc_type": self._infer_doc_type(context),
+                **prompt.metadata
+            },
+            actions=[
+                {"type": "create_documentation", "content": doc_text}
+            ],
+            confidence=0.9
+        )
     
-    def _build_doc_prompt(self, context: AgentContext) -> str:
+    def _build_doc_prompt(self, context: AgentContext, packed: PackedContext) -> str:
         parts = [f"Documentation Request: {context.user_query}"]
         
         if context.selected_code:
-            parts.append(f"\nCode to document:\n```\n{context.selected_code}\n```")
+            parts.append(f"\nCode to document:\n```\n{packed.text('selection')}\n```")
         
         if context.current_file:
             parts.append(f"\nFile: {context.current_file}")
@@ -2,25 +2,20 @@
 Implementation Agent - Generates and edits code
 """
 
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any
+import asyncio
 import re
 import json
-import copy
+import time
 
-from agents.base import BaseAgent, AgentContext, AgentResponse
-from core.llm_router import AgentType
+from agents.base import BaseAgent, AgentContext, AgentPrompt, AgentResponse, PackedContext
+from core.llm_router import AgentType, prompt_cache_usage
 from core.config import settings
+from core.conversation_log import conversation_log
 from services.vector_store import search_code
-from tools.definitions import TOOL_FUNCTIONS
+from tools.definitions import TOOL_SCHEMAS
 
-
-TOOL_DEFINITIONS = [
-    {
-        "type": "function",
-        "function": copy.deepcopy(definition)
-    }
-    for definition in TOOL_FUNCTIONS
-]
+REFUSAL_PATTERN = re.compile(r"^(i'?m sorry|i cannot|i can'?t|sorry,|as an ai)", re.IGNORECASE)
 
 
 class ImplementationAgent(BaseAgent):
@@ -53,71 +48,40 @@ Always provide:
 3. Error handling where appropriate
 4. Brief explanation of approach"""
     
+    async def prepare_prompt(self, context: AgentContext) -> AgentPrompt:
+        # Search for relevant code examples, then pack what fits the budget
+        related_code = await self._find_related_code(context)
+        packed = await self.assemble_context(context, related_code=related_code)
+        
+        return AgentPrompt(
+            messages=self.compose_messages(packed, self._build_prompt(context, packed)),
+            metadata={"related_examples": len(related_code), **packed.metadata()}
+        )
+    
     async def process(self, context: AgentContext) -> AgentResponse:
         """Generate code implementation"""
         try:
-            # Search for relevant code examples
-            related_code = await self._find_related_code(context)
-            
-            # Build prompt
-            messages = [
-                {"role": "system", "content": self.build_system_prompt()},
-                {"role": "user", "content": self._build_prompt(context, related_code)}
-            ]
-
-            models_used: List[str] = []
+            prompt = await self.build_prompt(context)
+            messages = prompt.messages
 
-            # Initial completion with tool support (chat model)
-            raw_response = await self.get_completion(
-                messages=messages,
-                temperature=0.3,
-                raw=True,
-                tools=TOOL_DEFINITIONS,
-                tool_choice="auto",
-                override_model=settings.MODEL_TOOL_CALL
-            )
-            models_used.append(settings.MODEL_TOOL_CALL)
-
-            assistant_message = self._normalize_message(raw_response.choices[0].message)
-            content = assistant_message.get("content") or ""
-            tool_calls = self._extract_tool_calls(assistant_message)
+            turn = await self._run_turn(messages)
+            content = turn["content"]
+            tool_calls = turn["tool_calls"]
             requires_tool = bool(tool_calls)
 
-            conversation_messages = copy.deepcopy(messages) + [assistant_message]
-
-            if not requires_tool:
-                # Follow-up with reasoner for higher-quality code when no tool branch
-                reasoner_response = await self.get_completion(
-                    messages=messages,
-                    temperature=0.3,
-                    raw=True,
-                    override_model=settings.MODEL_IMPLEMENTATION
-                )
-                models_used.append(settings.MODEL_IMPLEMENTATION)
-
-                assistant_message = self._normalize_message(reasoner_response.choices[0].message)
-                content = assistant_message.get("content") or ""
-                tool_calls = self._extract_tool_calls(assistant_message)
-                requires_tool = bool(tool_calls)
-                conversation_messages = copy.deepcopy(messages) + [assistant_message]
-
             # Parse response
             code_blocks = self._extract_code_blocks(content)
             actions = self._generate_actions(code_blocks)
 
-            conversation_state = {
-                "messages": conversation_messages,
-                "agent": self.agent_type.value,
-                "context": context.model_dump()
-            }
+            conversation_state = await self._start_conversation(context, messages + [turn["message"]])
 
             response = AgentResponse(
                 success=True,
                 content=content,
                 metadata={
                     "code_blocks": len(code_blocks),
-                    "related_examples": len(related_code),
-                    "models_used": models_used
+                    **turn["metadata"],
+                    **prompt.metadata
                 },
                 actions=actions,
                 confidence=0.9 if code_blocks else 0.5,
@@ -137,6 +101,240 @@ Always provide:
                 confidence=0.0
             )
 
+    async def process_stream(self, context: AgentContext) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream code implementation from the tool-call model
+        
+        Content deltas are forwarded as they arrive. There is no reasoner
+        follow-up on this path: re-answering after the first answer has been
+        streamed would discard output the client already displayed.
+        """
+        try:
+            prompt = await self.build_prompt(context)
+            content = ""
+            tool_calls: List[Dict[str, Any]] = []
+            
+            async for event in self.stream_completion(
+                messages=prompt.messages,
+                temperature=0.3,
+                tools=TOOL_SCHEMAS,
+                tool_choice="auto",
+                override_model=settings.MODEL_TOOL_CALL
+            ):
+                if event["type"] == "finish":
+                    content = event["content"]
+                    tool_calls = event["tool_calls"]
+                    prompt.metadata.update(event["usage"])
+                else:
+                    yield event
+            
+            assistant_message: Dict[str, Any] = {"role": "assistant", "content": content}
+            if tool_calls:
+                assistant_message["tool_calls"] = tool_calls
+            
+            code_blocks = self._extract_code_blocks(content)
+            response = AgentResponse(
+                success=True,
+                content=content,
+                metadata={
+                    "code_blocks": len(code_blocks),
+                    "models_used": [settings.MODEL_TOOL_CALL],
+                    "streamed": True,
+                    **prompt.metadata
+                },
+                actions=self._generate_actions(code_blocks),
+                confidence=0.9 if code_blocks else 0.5,
+                requires_tool=bool(tool_calls),
+                tool_calls=tool_calls,
+                conversation_state=await self._start_conversation(
+                    context, prompt.messages + [assistant_message]
+                )
+            )
+            
+            await self.log_interaction(context, response)
+            yield {"type": "done", "response": response}
+            
+        except Exception as e:
+            self.logger.error(f"Implementation failed: {e}", exc_info=True)
+            yield {
+                "type": "done",
+                "response": AgentResponse(
+                    success=False,
+                    content=f"Failed to generate implementation: {str(e)}",
+                    confidence=0.0
+                )
+            }
+
+    async def _start_conversation(self, context: AgentContext, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Conversation state for a tool loop: segment IDs in the conversation log, not the transcript"""
+        return {
+            "segments": await conversation_log.append([], messages),
+            "agent": self.agent_type.value,
+            "context_ref": await conversation_log.put(context.model_dump())
+        }
+
+    async def _run_turn(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Produce the next assistant message using IMPLEMENTATION_STRATEGY
+        
+        The tool-call model (MODEL_TOOL_CALL) may request tools; answers
+        without tool calls can be upgraded by the reasoner
+        (MODEL_IMPLEMENTATION):
+        
+        - sequential: always re-ask the reasoner after a tool-free answer
+        - speculative: ask both at once, cancel the reasoner if tools are
+          requested; keep the tool-call model's answer if the reasoner fails
+          or exceeds IMPLEMENTATION_REASONER_TIMEOUT
+        - escalate: keep the tool-free answer unless it fails a quality check
+        
+        Args:
+            messages: Conversation so far
+            
+        Returns:
+            Dict with message, content, tool_calls and metadata
+            (strategy, path, models_used, wall_time_ms, tokens_saved)
+        """
+        strategy = settings.IMPLEMENTATION_STRATEGY
+        started = time.monotonic()
+        models_used: List[str] = []
+        responses: List[Any] = []
+        tokens_saved = 0
+        
+        if strategy == "speculative":
+            tool_task = asyncio.ensure_future(self._complete_with_tools(messages))
+            reasoner_task = asyncio.ensure_future(self._complete_with_reasoner(messages))
+            try:
+                tool_response = await tool_task
+                models_used.append(settings.MODEL_TOOL_CALL)
+                responses.append(tool_response)
+                tool_turn = self._turn_from_response(tool_response)
+                
+                if tool_turn["tool_calls"]:
+                    if not reasoner_task.done():
+                        reasoner_task.cancel()
+                        # Estimate of the reasoner output the cancel avoided;
+                        # its prompt had already been sent
+                        tokens_saved = self._usage_tokens(tool_response, "completion_tokens")
+                    path = "tool_call"
+                    turn = tool_turn
+                else:
+                    try:
+                        reasoner_response = await asyncio.wait_for(
+                            reasoner_task,
+                            settings.IMPLEMENTATION_REASONER_TIMEOUT
+                        )
+                    except Exception as e:
+                        self.logger.warning(f"Reasoner failed, keeping the tool-call model answer: {e!r}")
+                        path = "reasoner_fallback"
+                        turn = tool_turn
+                    else:
+                        responses.append(reasoner_response)
+                        turn = self._turn_from_response(reasoner_response)
+                        models_used.append(settings.MODEL_IMPLEMENTATION)
+                        path = "reasoner"
+            finally:
+                for task in (tool_task, reasoner_task):
+                    if not task.done():
+                        task.cancel()
+        else:
+            tool_response = await self._complete_with_tools(messages)
+            models_used.append(settings.MODEL_TOOL_CALL)
+            responses.append(tool_response)
+            turn = self._turn_from_response(tool_response)
+            
+            if turn["tool_calls"]:
+                path = "tool_call"
+            elif strategy == "escalate" and self._answer_is_acceptable(turn):
+                path = "tool_call_accepted"
+                # Estimate of what the skipped reasoner call would have used
+                tokens_saved = self._usage_tokens(tool_response)
+            else:
+                reasoner_response = await self._complete_with_reasoner(messages)
+                responses.append(reasoner_response)
+                turn = self._turn_from_response(reasoner_response)
+                models_used.append(settings.MODEL_IMPLEMENTATION)
+                path = "escalated" if strategy == "escalate" else "reasoner"
+        
+        self.logger.info(f"Implementation turn: strategy={strategy} path={path}")
+        turn["metadata"] = {
+            "strategy": strategy,
+            "path": path,
+            "models_used": models_used,
+            "wall_time_ms": round((time.monotonic() - started) * 1000, 1),
+            "tokens_saved": tokens_saved,
+            **self._sum_prompt_usage(responses)
+        }
+        return turn
+    
+    async def _complete_with_tools(self, messages: List[Dict[str, Any]]) -> Any:
+        return await self.get_completion(
+            messages=messages,
+            temperature=0.3,
+            raw=True,
+            tools=TOOL_SCHEMAS,
+            tool_choice="auto",
+            override_model=settings.MODEL_TOOL_CALL
+        )
+    
+    async def _complete_with_reasoner(self, messages: List[Dict[str, Any]]) -> Any:
+        return await self.get_completion(
+            messages=messages,
+            temperature=0.3,
+            raw=True,
+            override_model=settings.MODEL_IMPLEMENTATION
+        )
+    
+    def _turn_from_response(self, response: Any) -> Dict[str, Any]:
+        choice = response.choices[0]
+        message = self._normalize_message(choice.message)
+        return {
+            "message": message,
+            "content": message.get("content") or "",
+            "tool_calls": self._extract_tool_calls(message),
+            "finish_reason": getattr(choice, "finish_reason", None)
+        }
+    
+    def _answer_is_acceptable(self, turn: Dict[str, Any]) -> bool:
+        """
+        Cheap check that a tool-free answer is good enough to return as-is
+        
+        Rejects truncated or refusal-like answers, answers without code, and
+        Python blocks that do not compile.
+        """
+        content = turn["content"].strip()
+        if turn.get("finish_reason") == "length" or not content:
+            return False
+        if content.count("```") % 2:
+            return False
+        if REFUSAL_PATTERN.match(content):
+            return False
+        
+        code_blocks = self._extract_code_blocks(content)
+        if not code_blocks:
+            return False
+        
+        for block in code_blocks:
+            if block["language"].lower() in ("python", "py"):
+                try:
+                    compile(block["code"], "<answer>", "exec")
+                except (SyntaxError, ValueError):
+                    return False
+        return True
+    
+    def _sum_prompt_usage(self, responses: List[Any]) -> Dict[str, int]:
+        """Prompt and provider-cached prompt tokens over a turn's calls"""
+        totals = {"prompt_tokens": 0, "cached_prompt_tokens": 0}
+        for response in responses:
+            for key, value in prompt_cache_usage(response).items():
+                totals[key] += value
+        return totals
+    
+    def _usage_tokens(self, response: Any, field: str = "total_tokens") -> int:
+        usage = getattr(response, "usage", None)
+        if not usage:
+            return 0
+        return int(getattr(usage, field, 0) or 0)
+    
     def _normalize_message(self, message: Any) -> Dict[str, Any]:
         if hasattr(message, "model_dump"):
             return message.model_dump()
@@ -167,60 +365,40 @@ Always provide:
         conversation_state: Dict[str, Any],
         tool_results: List[Dict[str, Any]]
     ) -> AgentResponse:
-        messages = copy.deepcopy(conversation_state.get("messages", []))
-        if not messages:
+        segment_ids = conversation_state.get("segments")
+        if segment_ids is None:
+            # State stored before conversations moved to the conversation log
+            segment_ids = await conversation_log.append([], conversation_state.get("messages", []))
+        if not segment_ids:
             raise ValueError("Conversation state is missing messages")
 
-        augmented_messages = copy.deepcopy(messages)
-        for result in tool_results:
-            augmented_messages.append({
+        messages = await conversation_log.load(segment_ids)
+        tool_messages = [
+            {
                 "role": "tool",
                 "tool_call_id": result.get("call_id"),
                 "name": result.get("name"),
                 "content": result.get("output", "")
-            })
-
-        models_used: List[str] = []
-
-        raw_response = await self.get_completion(
-            messages=augmented_messages,
-            temperature=0.3,
-            raw=True,
-            tools=TOOL_DEFINITIONS,
-            tool_choice="auto",
-            override_model=settings.MODEL_TOOL_CALL
-        )
-        models_used.append(settings.MODEL_TOOL_CALL)
+            }
+            for result in tool_results
+        ]
 
-        assistant_message = self._normalize_message(raw_response.choices[0].message)
-        content = assistant_message.get("content") or ""
-        tool_calls = self._extract_tool_calls(assistant_message)
+        turn = await self._run_turn(messages + tool_messages)
+        content = turn["content"]
+        tool_calls = turn["tool_calls"]
         requires_tool = bool(tool_calls)
 
-        conversation_messages = augmented_messages + [assistant_message]
-
-        if not requires_tool:
-            reasoner_response = await self.get_completion(
-                messages=augmented_messages,
-                temperature=0.3,
-                raw=True,
-                override_model=settings.MODEL_IMPLEMENTATION
-            )
-            models_used.append(settings.MODEL_IMPLEMENTATION)
-
-            assistant_message = self._normalize_message(reasoner_response.choices[0].message)
-            content = assistant_message.get("content") or ""
-            tool_calls = self._extract_tool_calls(assistant_message)
-            requires_tool = bool(tool_calls)
-            conversation_messages = augmented_messages + [assistant_message]
-
         code_blocks = self._extract_code_blocks(content)
         actions = self._generate_actions(code_blocks)
 
+        # Only this turn's messages are written; earlier segments are referenced
+        context_ref = conversation_state.get("context_ref")
+        if context_ref is None and conversation_state.get("context"):
+            context_ref = await conversation_log.put(conversation_state["context"])
         new_conversation_state = {
-            "messages": conversation_messages,
+            "segments": await conversation_log.append(segment_ids, tool_messages + [turn["message"]]),
             "agent": self.agent_type.value,
-            "context": conversation_state.get("context")
+            "context_ref": context_ref
         }
 
         response = AgentResponse(
@@ -229,7 +407,7 @@ Always provide:
             metadata={
                 "code_blocks": len(code_blocks),
                 "carried_tool_calls": len(tool_results),
-                "models_used": models_used
+                **turn["metadata"]
             },
             actions=actions,
             confidence=0.9 if code_blocks else 0.5,
@@ -246,24 +424,25 @@ Always provide:
             results = await search_code(
                 query=context.user_query,
                 workspace_id=context.workspace_path,
-                limit=3
+                limit=5
             )
             return results
         except Exception as e:
             self.logger.warning(f"Code search failed: {e}")
             return []
     
-    def _build_prompt(self, context: AgentContext, related_code: List[Dict]) -> str:
+    def _build_prompt(self, context: AgentContext, packed: PackedContext) -> str:
         """Build implementation prompt"""
-        parts = [self.format_context(context)]
+        parts = [f"User Query: {context.user_query}"]
         
-        if related_code:
-            parts.append("\n\nRelated code examples from your codebase:")
-            for i, example in enumerate(related_code, 1):
-                parts.append(
-                    f"\nExample {i} ({example['file_path']}):\n"
-                    f"```{example['language']}\n{example['content']}\n```"
-                )
+        if context.current_file:
+            parts.append(f"\nCurrent File: {context.current_file}")
+        
+        if packed.text("selection"):
+            parts.append(f"\nSelected Code:\n```\n{packed.text('selection')}\n```")
+        
+        if context.open_files:
+            parts.append(f"\nOpen Files: {', '.join(context.open_files)}")
         
         parts.append("\n\nProvide a complete implementation:")
         
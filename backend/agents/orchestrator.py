@@ -2,11 +2,12 @@
 Agent Orchestrator - Routes and coordinates multiple agents
 """
 
-from typing import Dict, List, Optional, Any
-from enum import Enum
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
+import asyncio
 import logging
 
 from agents.base import AgentContext, AgentResponse
+from agents.classifier import RequestType, request_classifier
 from agents.implementation import ImplementationAgent
 from agents.review import ReviewAgent
 from agents.debug import DebugAgent
@@ -14,22 +15,13 @@ from agents.documentation import DocumentationAgent
 from agents.refactoring import RefactoringAgent
 from agents.security import SecurityAgent
 from agents.devops import DevOpsAgent
+from core.config import settings
+from core.llm_router import llm_router
 
 
 logger = logging.getLogger(__name__)
 
 
-class RequestType(str, Enum):
-    """Types of user requests"""
-    IMPLEMENT = "implement"
-    REVIEW = "review"
-    DEBUG = "debug"
-    REFACTOR = "refactor"
-    EXPLAIN = "explain"
-    TEST = "test"
-    UNKNOWN = "unknown"
-
-
 class AgentOrchestrator:
     """Coordinates multiple agents to handle complex tasks"""
     
@@ -48,43 +40,22 @@ class AgentOrchestrator:
     
     async def process_request(
         self,
-        context: AgentContext
+        context: AgentContext,
+        agent_name: Optional[str] = None
     ) -> AgentResponse:
         """
         Process user request with appropriate agent(s)
         
         Args:
             context: Request context
+            agent_name: Agent chosen by admit (classified here if omitted)
             
         Returns:
             Agent response
         """
         try:
-            # Classify request type
-            request_type = self._classify_request(context.user_query)
-            logger.info(f"Classified request as: {request_type.value}")
-            
-            # Route to appropriate agent
-            if request_type == RequestType.IMPLEMENT:
-                return await self.agents["implementation"].process(context)
-            
-            elif request_type == RequestType.REVIEW:
-                return await self.agents["review"].process(context)
-            
-            elif request_type == RequestType.DEBUG:
-                return await self.agents["debug"].process(context)
-            
-            elif request_type == RequestType.REFACTOR:
-                # Use implementation agent for refactoring
-                return await self.agents["implementation"].process(context)
-            
-            elif request_type == RequestType.EXPLAIN:
-                # Use review agent to explain code
-                return await self.agents["review"].process(context)
-            
-            else:
-                # Default to implementation agent
-                return await self.agents["implementation"].process(context)
+            agent_name = agent_name or await self._select_agent(context)
+            return await self.agents[agent_name].process(context)
                 
         except Exception as e:
             logger.error(f"Orchestration failed: {e}", exc_info=True)
@@ -94,10 +65,126 @@ class AgentOrchestrator:
                 confidence=0.0
             )
     
-    def _classify_request(self, query: str) -> RequestType:
+    async def process_request_stream(
+        self,
+        context: AgentContext,
+        agent_name: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process user request, streaming the selected agent's events
+        
+        Args:
+            context: Request context
+            agent_name: Agent chosen by admit (classified here if omitted)
+            
+        Yields:
+            Agent stream events (see BaseAgent.process_stream)
+        """
+        try:
+            agent_name = agent_name or await self._select_agent(context)
+        except Exception as e:
+            logger.error(f"Orchestration failed: {e}", exc_info=True)
+            yield {
+                "type": "done",
+                "response": AgentResponse(
+                    success=False,
+                    content=f"Request processing failed: {str(e)}",
+                    confidence=0.0
+                )
+            }
+            return
+        
+        yield {"type": "agent", "agent": agent_name}
+        async for event in self.agents[agent_name].process_stream(context):
+            yield event
+    
+    async def admit(self, context: AgentContext, agent_names: Optional[List[str]] = None) -> List[str]:
+        """
+        Pre-flight admission check before any work is done for a request
+        
+        Args:
+            context: Request context
+            agent_names: Agents the request will run (default: the routed agent)
+            
+        Returns:
+            The admitted agent names; pass the routed agent on to
+            process_request so the request is not classified twice
+            
+        Raises:
+            AdmissionRejected: When the models involved are over their queue budget
+        """
+        names = agent_names or [await self._select_agent(context)]
+        llm_router.check_admission([
+            self.agents[name].agent_type for name in names if name in self.agents
+        ])
+        return names
+    
+    async def _select_agent(self, context: AgentContext) -> str:
+        """Pick the agent that should handle a request"""
+        # Classify request type
+        request_type = await self.classify_request(context.user_query)
+        
+        # Route to appropriate agent
+        if request_type == RequestType.IMPLEMENT:
+            return "implementation"
+        
+        elif request_type == RequestType.REVIEW:
+            return "review"
+        
+        elif request_type == RequestType.DEBUG:
+            return "debug"
+        
+        elif request_type == RequestType.REFACTOR:
+            return "refactoring"
+        
+        elif request_type == RequestType.EXPLAIN:
+            # Use review agent to explain code
+            return "review"
+        
+        elif request_type == RequestType.DOCUMENT:
+            return "documentation"
+        
+        elif request_type == RequestType.SECURITY:
+            return "security"
+        
+        elif request_type == RequestType.DEVOPS:
+            return "devops"
+        
+        # Default to implementation agent (also writes tests)
+        return "implementation"
+    
+    async def classify_request(self, query: str) -> RequestType:
         """
         Classify user request type
         
+        Uses the embedding classifier when it is confident, keyword rules
+        otherwise.
+        
+        Args:
+            query: User query
+            
+        Returns:
+            Request type
+        """
+        try:
+            result = await request_classifier.classify(query)
+        except Exception as e:
+            logger.warning(f"Embedding classifier failed, using keywords: {e}")
+            result = None
+        
+        if result:
+            request_type, score = result
+            logger.info(f"Classified request as: {request_type.value} (score {score:.2f})")
+            return request_type
+        
+        request_type = self._classify_request(query)
+        logger.info(f"Classified request as: {request_type.value} (keywords)")
+        return request_type
+    
+    def _classify_request(self, query: str) -> RequestType:
+        """
+        Classify user request type with keyword rules
+        
         Args:
             query: User query
             
@@ -106,24 +193,29 @@ class AgentOrchestrator:
         """
         query_lower = query.lower()
         
-        # Implementation keywords
+        # Specialist keywords first, so "add a Dockerfile" is not IMPLEMENT
         if any(kw in query_lower for kw in [
-            'create', 'implement', 'build', 'add', 'write',
-            'generate', 'make', 'develop'
+            'security', 'vulnerab', 'injection', 'xss', 'csrf',
+            'exploit', 'audit', 'secret'
         ]):
-            return RequestType.IMPLEMENT
+            return RequestType.SECURITY
         
-        # Review keywords
         if any(kw in query_lower for kw in [
-            'review', 'check', 'analyze', 'improve',
-            'suggest', 'feedback', 'quality'
+            'docker', 'kubernetes', 'k8s', 'deploy', 'pipeline',
+            'ci/cd', 'terraform', 'helm', 'nginx', 'github actions'
         ]):
-            return RequestType.REVIEW
+            return RequestType.DEVOPS
+        
+        if any(kw in query_lower for kw in [
+            'document', 'docstring', 'readme', 'comment', 'jsdoc'
+        ]):
+            return RequestType.DOCUMENT
         
         # Debug keywords
         if any(kw in query_lower for kw in [
             'debug', 'fix', 'error', 'bug', 'problem',
-            'issue', 'not working', 'broken', 'fails'
+            'issue', 'not working', 'broken', 'fails',
+            'crash', 'exception', 'traceback'
         ]):
             return RequestType.DEBUG
         
@@ -134,6 +226,26 @@ class AgentOrchestrator:
         ]):
             return RequestType.REFACTOR
         
+        # Test keywords
+        if any(kw in query_lower for kw in [
+            'unit test', 'tests', 'pytest', 'coverage', 'test case'
+        ]):
+            return RequestType.TEST
+        
+        # Implementation keywords
+        if any(kw in query_lower for kw in [
+            'create', 'implement', 'build', 'add', 'write',
+            'generate', 'make', 'develop'
+        ]):
+            return RequestType.IMPLEMENT
+        
+        # Review keywords
+        if any(kw in query_lower for kw in [
+            'review', 'check', 'analyze', 'improve',
+            'suggest', 'feedback', 'quality'
+        ]):
+            return RequestType.REVIEW
+        
         # Explain keywords
         if any(kw in query_lower for kw in [
             'explain', 'what does', 'how does', 'why',
@@ -143,32 +255,148 @@ class AgentOrchestrator:
         
         return RequestType.UNKNOWN
     
+    def plan_multi_agent(
+        self,
+        agent_sequence: List[str],
+        dependencies: Optional[Dict[str, List[str]]] = None
+    ) -> Dict[str, List[str]]:
+        """
+        Build and validate the dependency graph for a multi-agent run
+        
+        Agents are independent unless ``dependencies`` lists the agents
+        whose output they need (passed on as ``{name}_response`` in
+        additional_context).
+        
+        Args:
+            agent_sequence: Agent names to run (unknown names are skipped)
+            dependencies: Optional map of agent name to upstream agent names
+            
+        Returns:
+            Ordered map of agent name to its dependencies
+            
+        Raises:
+            ValueError: On dependencies outside the run or cycles
+        """
+        graph: Dict[str, List[str]] = {}
+        for agent_name in agent_sequence:
+            if agent_name not in self.agents:
+                logger.warning(f"Skipping unknown agent: {agent_name}")
+                continue
+            graph.setdefault(agent_name, [])
+        
+        for agent_name, upstream in (dependencies or {}).items():
+            if agent_name not in graph:
+                raise ValueError(f"Dependencies given for agent not in the run: {agent_name}")
+            for dependency in upstream:
+                if dependency not in graph:
+                    raise ValueError(f"{agent_name} depends on agent not in the run: {dependency}")
+                if dependency not in graph[agent_name]:
+                    graph[agent_name].append(dependency)
+        
+        # Kahn's algorithm: every agent must become ready at some point
+        remaining = {name: set(upstream) for name, upstream in graph.items()}
+        while remaining:
+            ready = [name for name, upstream in remaining.items() if not upstream]
+            if not ready:
+                raise ValueError(f"Dependency cycle between agents: {', '.join(sorted(remaining))}")
+            for name in ready:
+                del remaining[name]
+            for upstream in remaining.values():
+                upstream.difference_update(ready)
+        
+        return graph
+    
+    async def run_multi_agent(
+        self,
+        context: AgentContext,
+        graph: Dict[str, List[str]]
+    ) -> AsyncIterator[Tuple[str, AgentResponse]]:
+        """
+        Run a validated agent graph, independent agents concurrently
+        
+        At most MULTI_AGENT_MAX_CONCURRENCY agents run at once. Each agent
+        gets its own copy of the context; an agent whose dependency failed
+        is skipped.
+        
+        Args:
+            context: Request context
+            graph: Output of plan_multi_agent
+            
+        Yields:
+            (agent name, response) in completion order
+        """
+        pending = dict(graph)
+        results: Dict[str, AgentResponse] = {}
+        running: Dict[asyncio.Task, str] = {}
+        limit = max(1, settings.MULTI_AGENT_MAX_CONCURRENCY)
+        
+        try:
+            while pending or running:
+                for agent_name, upstream in list(pending.items()):
+                    if len(running) >= limit:
+                        break
+                    if not all(dependency in results for dependency in upstream):
+                        continue
+                    del pending[agent_name]
+                    
+                    failed = [d for d in upstream if not results[d].success]
+                    if failed:
+                        results[agent_name] = AgentResponse(
+                            success=False,
+                            content=f"Skipped: dependency failed ({', '.join(failed)})",
+                            confidence=0.0
+                        )
+                        yield agent_name, results[agent_name]
+                        continue
+                    
+                    agent_context = context.model_copy(deep=True)
+                    for dependency in upstream:
+                        agent_context.additional_context[f"{dependency}_response"] = results[dependency].content
+                    
+                    task = asyncio.create_task(self.agents[agent_name].process(agent_context))
+                    running[task] = agent_name
+                
+                if not running:
+                    # Only skips were produced this round; schedule again
+                    continue
+                
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    agent_name = running.pop(task)
+                    try:
+                        results[agent_name] = task.result()
+                    except Exception as e:
+                        logger.error(f"Agent {agent_name} failed: {e}", exc_info=True)
+                        results[agent_name] = AgentResponse(
+                            success=False,
+                            content=f"Agent failed: {str(e)}",
+                            confidence=0.0
+                        )
+                    yield agent_name, results[agent_name]
+        finally:
+            for task in running:
+                task.cancel()
+    
     async def process_multi_agent(
         self,
         context: AgentContext,
-        agent_sequence: List[str]
+        agent_sequence: List[str],
+        dependencies: Optional[Dict[str, List[str]]] = None
     ) -> List[AgentResponse]:
         """
-        Process request with multiple agents in sequence
+        Process request with multiple agents
         
         Args:
             context: Request context
             agent_sequence: List of agent names to use
+            dependencies: Optional map of agent name to upstream agent names
             
         Returns:
-            List of agent responses
+            List of agent responses, in plan order
         """
-        responses = []
-        
-        for agent_name in agent_sequence:
-            if agent_name in self.agents:
-                response = await self.agents[agent_name].process(context)
-                responses.append(response)
-                
-                # Update context with previous response
-                context.additional_context[f"{agent_name}_response"] = response.content
-        
-        return responses
+        graph = self.plan_multi_agent(agent_sequence, dependencies)
+        results = {name: response async for name, response in self.run_multi_agent(context, graph)}
+        return [results[name] for name in graph]
 
     async def continue_with_tool(
         self,
@@ -2,13 +2,18 @@
 Refactoring Agent - Code improvement and restructuring
 """
 
-from agents.base import BaseAgent, AgentContext, AgentResponse
+from typing import Optional
+
+from agents.base import BaseAgent, AgentContext, AgentPrompt, AgentResponse, PackedContext
 from core.llm_router import AgentType
 
 
 class RefactoringAgent(BaseAgent):
     """Agent specialized in code refactoring"""
     
+    temperature = 0.2
+    failure_message = "Refactoring failed"
+    
     def __init__(self):
         super().__init__(AgentType.REFACTORING)
     
@@ -42,58 +47,46 @@ Refactoring Principles:
 - Maintain or improve tests
 - Document significant changes"""
     
-    async def process(self, context: AgentContext) -> AgentResponse:
-        """Refactor code"""
-        try:
-            if not context.selected_code:
-                return AgentResponse(
-                    success=False,
-                    content="No code selected for refactoring",
-                    confidence=0.0
-                )
-            
-            messages = [
-                {"role": "system", "content": self.build_system_prompt()},
-                {"role": "user", "content": self._build_refactor_prompt(context)}
-            ]
-            
-            refactored_code = await self.get_completion(
-                messages=messages,
-                temperature=0.2  # Low temperature for consistent refactoring
-            )
-            
-            response = AgentResponse(
-                success=True,
-                content=refactored_code,
-                metadata={
-                    "original_length": len(context.selected_code),
-                    "refactored_length": len(refactored_code)
-                },
-                actions=[
-                    {"type": "apply_refactoring", "code": refactored_code}
-                ],
-                confidence=0.85
-            )
-            
-            await self.log_interaction(context, response)
-            return response
-            
-        except Exception as e:
-            self.logger.error(f"Refactoring failed: {e}", exc_info=True)
+    def check_context(self, context: AgentContext) -> Optional[AgentResponse]:
+        if not context.selected_code:
             return AgentResponse(
                 success=False,
-                content=f"Refactoring failed: {str(e)}",
+                content="No code selected for refactoring",
                 confidence=0.0
             )
+        return None
+    
+    async def prepare_prompt(self, context: AgentContext) -> AgentPrompt:
+        packed = await self.assemble_context(context)
+        return AgentPrompt(
+            messages=self.compose_messages(packed, self._build_refactor_prompt(context, packed)),
+            metadata=packed.metadata()
+        )
+    
+    def build_response(self, context: AgentContext, refactored_code: str, prompt: AgentPrompt) -> AgentResponse:
+        """Wrap refactored code"""
+        return AgentResponse(
+            success=True,
+            content=refactored_code,
+            metadata={
+                "original_length": len(context.selected_code),
+                "refactored_length": len(refactored_code),
+                **prompt.metadata
+            },
+            actions=[
+                {"type": "apply_refactoring", "code": refactored_code}
+            ],
+            confidence=0.85
+        )
     
-    def _build_refactor_prompt(self, context: AgentContext) -> str:
+    def _build_refactor_prompt(self, context: AgentContext, packed: PackedContext) -> str:
         return f"""Refactor the following code:
 
 File: {context.current_file or 'unknown'}
 
 Original Code:
 ```
-{context.selected_code}
+{packed.text('selection')}
 ```
 
 User Request: {context.user_query}
@@ -2,13 +2,18 @@
 Review Agent - Code review and suggestions
 """
 
-from agents.base import BaseAgent, AgentContext, AgentResponse
+from typing import Optional
+
+from agents.base import BaseAgent, AgentContext, AgentPrompt, AgentResponse, PackedContext
 from core.llm_router import AgentType
 
 
 class ReviewAgent(BaseAgent):
     """Agent specialized in code review"""
     
+    temperature = 0.4
+    failure_message = "Review failed"
+    
     def __init__(self):
         super().__init__(AgentType.REVIEW)
     
@@ -42,57 +47,45 @@ Provide:
 - Specific code examples
 - Positive feedback on good practices"""
     
-    async def process(self, context: AgentContext) -> AgentResponse:
-        """Perform code review"""
-        try:
-            if not context.selected_code:
-                return AgentResponse(
-                    success=False,
-                    content="No code selected for review",
-                    confidence=0.0
-                )
-            
-            messages = [
-                {"role": "system", "content": self.build_system_prompt()},
-                {"role": "user", "content": self._build_review_prompt(context)}
-            ]
-            
-            review_text = await self.get_completion(
-                messages=messages,
-                temperature=0.4
-            )
-            
-            issues = self._parse_issues(review_text)
-            
-            response = AgentResponse(
-                success=True,
-                content=review_text,
-                metadata={
-                    "issues_found": len(issues),
-                    "code_length": len(context.selected_code)
-                },
-                actions=self._generate_fix_actions(issues),
-                confidence=0.85
-            )
-            
-            await self.log_interaction(context, response)
-            return response
-            
-        except Exception as e:
-            self.logger.error(f"Review failed: {e}", exc_info=True)
+    def check_context(self, context: AgentContext) -> Optional[AgentResponse]:
+        if not context.selected_code:
             return AgentResponse(
                 success=False,
-                content=f"Review failed: {str(e)}",
+                content="No code selected for review",
                 confidence=0.0
             )
+        return None
+    
+    async def prepare_prompt(self, context: AgentContext) -> AgentPrompt:
+        packed = await self.assemble_context(context)
+        return AgentPrompt(
+            messages=self.compose_messages(packed, self._build_review_prompt(context, packed)),
+            metadata=packed.metadata()
+        )
+    
+    def build_response(self, context: AgentContext, review_text: str, prompt: AgentPrompt) -> AgentResponse:
+        """Parse review into issues and fix actions"""
+        issues = self._parse_issues(review_text)
+        
+        return AgentResponse(
+            success=True,
+            content=review_text,
+            metadata={
+                "issues_found": len(issues),
+                "code_length": len(context.selected_code),
+                **prompt.metadata
+            },
+            actions=self._generate_fix_actions(issues),
+            confidence=0.85
+        )
     
-    def _build_review_prompt(self, context: AgentContext) -> str:
+    def _build_review_prompt(self, context: AgentContext, packed: PackedContext) -> str:
         return f"""Review the following code:
 
 File: {context.current_file or 'unknown'}
 
 ```
-{context.selected_code}
+{packed.text('selection')}
 ```
 
 User Query: {context.user_query}
@@ -2,13 +2,18 @@
 Security Agent - Security auditing and vulnerability detection
 """
 
-from agents.base import BaseAgent, AgentContext, AgentResponse
+from typing import Optional
+
+from agents.base import BaseAgent, AgentContext, AgentPrompt, AgentResponse, PackedContext
 from core.llm_router import AgentType
 
 
 class SecurityAgent(BaseAgent):
     """Agent specialized in security analysis"""
     
+    temperature = 0.2
+    failure_message = "Security audit failed"
+    
     def __init__(self):
         super().__init__(AgentType.SECURITY)
     
@@ -47,58 +52,46 @@ Always:
 - Suggest concrete fixes
 - Explain security implications"""
     
-    async def process(self, context: AgentContext) -> AgentResponse:
-        """Perform security audit"""
-        try:
-            if not context.selected_code:
-                return AgentResponse(
-                    success=False,
-                    content="No code selected for security audit",
-                    confidence=0.0
-                )
-            
-            messages = [
-                {"role": "system", "content": self.build_system_prompt()},
-                {"role": "user", "content": self._build_security_prompt(context)}
-            ]
-            
-            audit_result = await self.get_completion(
-                messages=messages,
-                temperature=0.2  # Low temperature for consistent analysis
-            )
-            
-            vulnerabilities = self._parse_vulnerabilities(audit_result)
-            
-            response = AgentResponse(
-                success=True,
-                content=audit_result,
-                metadata={
-                    "vulnerabilities_found": len(vulnerabilities),
-                    "severity": self._get_max_severity(vulnerabilities)
-                },
-                actions=self._generate_security_actions(vulnerabilities),
-                confidence=0.9
-            )
-            
-            await self.log_interaction(context, response)
-            return response
-            
-        except Exception as e:
-            self.logger.error(f"Security audit failed: {e}", exc_info=True)
+    def check_context(self, context: AgentContext) -> Optional[AgentResponse]:
+        if not context.selected_code:
             return AgentResponse(
                 success=False,
-                content=f"Security audit failed: {str(e)}",
+                content="No code selected for security audit",
                 confidence=0.0
             )
+        return None
+    
+    async def prepare_prompt(self, context: AgentContext) -> AgentPrompt:
+        packed = await self.assemble_context(context)
+        return AgentPrompt(
+            messages=self.compose_messages(packed, self._build_security_prompt(context, packed)),
+            metadata=packed.metadata()
+        )
+    
+    def build_response(self, context: AgentContext, audit_result: str, prompt: AgentPrompt) -> AgentResponse:
+        """Parse audit into vulnerabilities"""
+        vulnerabilities = self._parse_vulnerabilities(audit_result)
+        
+        return AgentResponse(
+            success=True,
+            content=audit_result,
+            metadata={
+                "vulnerabilities_found": len(vulnerabilities),
+                "severity": self._get_max_severity(vulnerabilities),
+                **prompt.metadata
+            },
+            actions=self._generate_security_actions(vulnerabilities),
+            confidence=0.9
+        )
     
-    def _build_security_prompt(self, context: AgentContext) -> str:
+    def _build_security_prompt(self, context: AgentContext, packed: PackedContext) -> str:
         return f"""Perform a security audit on the following code:
 
 File: {context.current_file or 'unknown'}
 
 Code:
 ```
-{context.selected_code}
+{packed.text('selection')}
 ```
 
 User Request: {context.user_query}
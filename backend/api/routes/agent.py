@@ -2,15 +2,16 @@
 Agent API routes
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import uuid
-import asyncio
+import json
 
 from agents.orchestrator import orchestrator
 from agents.base import AgentContext, AgentResponse
+from core.admission import AdmissionRejected, Priority, request_priority
 from core.tool_state import tool_state_manager
 
 router = APIRouter()
@@ -55,17 +56,11 @@ async def process_query(request: AgentRequest):
         request_id = str(uuid.uuid4())
         
         # Build context
-        context = AgentContext(
-            workspace_path=request.workspace_path,
-            current_file=request.current_file,
-            selected_code=request.selected_code,
-            open_files=request.open_files,
-            user_query=request.query,
-            additional_context=request.additional_context
-        )
+        context = _build_context(request)
         
         # Process with orchestrator
-        response = await orchestrator.process_request(context)
+        agent_name = (await orchestrator.admit(context))[0]
+        response = await orchestrator.process_request(context, agent_name)
         
         if response.requires_tool and response.conversation_state:
             await tool_state_manager.set_state(
@@ -89,98 +84,227 @@ async def process_query(request: AgentRequest):
             tool_calls=response.tool_calls
         )
         
+    except AdmissionRejected as e:
+        raise _too_busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/query/stream")
-async def process_query_stream(request: AgentRequest):
+async def process_query_stream(request: AgentRequest, http_request: Request):
     """
     Process query with streaming response
     
+    Server-sent events, each ``data:`` line holding one JSON object:
+    ``{"type": "start", "request_id"}``, ``{"type": "agent", "agent"}``,
+    ``{"type": "delta", "content"}`` per model delta,
+    ``{"type": "tool_call", "tool_call"}`` per requested tool call, then
+    ``{"type": "done", ...}`` with the final response metadata, followed by
+    ``data: [DONE]``. Disconnecting closes the upstream model stream.
+    
     Args:
         request: Agent request
         
     Returns:
         Streaming response
     """
+    request_id = str(uuid.uuid4())
+    context = _build_context(request)
+    
+    # Reject before the 200 response and event stream start
+    try:
+        agent_name = (await orchestrator.admit(context))[0]
+    except AdmissionRejected as e:
+        raise _too_busy(e)
+    
     async def generate():
+        events = orchestrator.process_request_stream(context, agent_name)
         try:
-            context = AgentContext(
-                workspace_path=request.workspace_path,
-                current_file=request.current_file,
-                selected_code=request.selected_code,
-                open_files=request.open_files,
-                user_query=request.query,
-                additional_context=request.additional_context
-            )
+            yield _sse({"type": "start", "request_id": request_id})
             
-            # For MVP, just send the response in chunks
-            # TODO: Implement actual streaming from LLM
-            response = await orchestrator.process_request(context)
-            
-            # Stream content in chunks
-            chunk_size = 50
-            content = response.content
-            for i in range(0, len(content), chunk_size):
-                chunk = content[i:i+chunk_size]
-                yield f"data: {chunk}\n\n"
-                await asyncio.sleep(0.01)  # Small delay for smoother streaming
+            async for event in events:
+                if await http_request.is_disconnected():
+                    break
+                
+                if event["type"] != "done":
+                    yield _sse(event)
+                    continue
+                
+                response: AgentResponse = event["response"]
+                if response.requires_tool and response.conversation_state:
+                    await tool_state_manager.set_state(
+                        request_id,
+                        {
+                            "agent": response.conversation_state.get("agent"),
+                            "conversation_state": response.conversation_state
+                        }
+                    )
+                
+                yield _sse({
+                    "type": "done",
+                    "request_id": request_id,
+                    "success": response.success,
+                    "content": None if response.success else response.content,
+                    "metadata": response.metadata,
+                    "actions": response.actions,
+                    "confidence": response.confidence,
+                    "requires_tool": response.requires_tool,
+                    "tool_calls": response.tool_calls
+                })
             
             yield "data: [DONE]\n\n"
             
         except Exception as e:
             yield f"data: [ERROR] {str(e)}\n\n"
+        finally:
+            # Propagates cancellation down to the provider stream
+            await events.aclose()
     
     return StreamingResponse(generate(), media_type="text/event-stream")
 
 
+def _sse(payload: Dict[str, Any]) -> str:
+    """Encode one server-sent event"""
+    return f"data: {json.dumps(payload, default=str)}\n\n"
+
+
+def _too_busy(error: AdmissionRejected) -> HTTPException:
+    """429 response for a request rejected by admission control"""
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
 @router.post("/multi-agent")
 async def process_multi_agent(
     request: AgentRequest,
-    agent_sequence: List[str]
+    agent_sequence: List[str],
+    dependencies: Optional[Dict[str, List[str]]] = None
 ):
     """
-    Process request with multiple agents in sequence
+    Process request with multiple agents
+    
+    Agents run concurrently unless ``dependencies`` says otherwise, e.g.
+    ``{"review": ["implementation"]}`` runs review on implementation's output.
     
     Args:
         request: Agent request
         agent_sequence: List of agent names (e.g., ["implementation", "review"])
+        dependencies: Optional map of agent name to the agents it depends on
         
     Returns:
         List of agent responses
     """
+    # Multi-agent runs queue behind interactive queries
+    request_priority.set(Priority.BATCH)
+    
     try:
-        context = AgentContext(
-            workspace_path=request.workspace_path,
-            current_file=request.current_file,
-            selected_code=request.selected_code,
-            open_files=request.open_files,
-            user_query=request.query,
-            additional_context=request.additional_context
-        )
+        context = _build_context(request)
+        graph = orchestrator.plan_multi_agent(agent_sequence, dependencies)
+        await orchestrator.admit(context, list(graph))
         
-        responses = await orchestrator.process_multi_agent(context, agent_sequence)
+        results = {
+            agent_name: response
+            async for agent_name, response in orchestrator.run_multi_agent(context, graph)
+        }
         
         return {
             "request_id": str(uuid.uuid4()),
-            "agents_used": agent_sequence,
+            "agents_used": list(graph),
             "responses": [
-                {
-                    "agent": agent_sequence[i],
-                    "success": r.success,
-                    "content": r.content,
-                    "metadata": r.metadata,
-                    "confidence": r.confidence
-                }
-                for i, r in enumerate(responses)
+                _agent_result(agent_name, results[agent_name])
+                for agent_name in graph
             ]
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected as e:
+        raise _too_busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/multi-agent/stream")
+async def process_multi_agent_stream(
+    request: AgentRequest,
+    agent_sequence: List[str],
+    http_request: Request,
+    dependencies: Optional[Dict[str, List[str]]] = None
+):
+    """
+    Process request with multiple agents, streaming each result as it finishes
+    
+    Server-sent events: ``{"type": "start", "request_id", "agents"}``, one
+    ``{"type": "agent_result", "agent", ...}`` per agent in completion
+    order, then ``data: [DONE]``.
+    
+    Args:
+        request: Agent request
+        agent_sequence: List of agent names
+        dependencies: Optional map of agent name to the agents it depends on
+        
+    Returns:
+        Streaming response
+    """
+    request_priority.set(Priority.BATCH)
+    request_id = str(uuid.uuid4())
+    context = _build_context(request)
+    
+    try:
+        graph = orchestrator.plan_multi_agent(agent_sequence, dependencies)
+        await orchestrator.admit(context, list(graph))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected as e:
+        raise _too_busy(e)
+    
+    async def generate():
+        results = orchestrator.run_multi_agent(context, graph)
+        try:
+            yield _sse({"type": "start", "request_id": request_id, "agents": list(graph)})
+            
+            async for agent_name, response in results:
+                if await http_request.is_disconnected():
+                    break
+                yield _sse({"type": "agent_result", **_agent_result(agent_name, response)})
+            
+            yield "data: [DONE]\n\n"
+            
+        except Exception as e:
+            yield f"data: [ERROR] {str(e)}\n\n"
+        finally:
+            # Cancels agents still running
+            await results.aclose()
+    
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+def _build_context(request: AgentRequest) -> AgentContext:
+    """Agent context for a request"""
+    return AgentContext(
+        workspace_path=request.workspace_path,
+        current_file=request.current_file,
+        selected_code=request.selected_code,
+        open_files=request.open_files,
+        user_query=request.query,
+        additional_context=request.additional_context
+    )
+
+
+def _agent_result(agent_name: str, response: AgentResponse) -> Dict[str, Any]:
+    """One agent's entry in a multi-agent response"""
+    return {
+        "agent": agent_name,
+        "success": response.success,
+        "content": response.content,
+        "metadata": response.metadata,
+        "confidence": response.confidence
+    }
+
+
 class ToolResultItem(BaseModel):
     call_id: str
     name: str
@@ -261,6 +385,26 @@ async def list_agents():
                 "name": "debug",
                 "description": "Debugs and troubleshoots code",
                 "capabilities": ["error_analysis", "debugging", "root_cause_analysis"]
+            },
+            {
+                "name": "documentation",
+                "description": "Generates and maintains documentation",
+                "capabilities": ["docstrings", "readme", "api_documentation"]
+            },
+            {
+                "name": "refactoring",
+                "description": "Improves and restructures existing code",
+                "capabilities": ["code_quality", "design_patterns", "complexity_reduction"]
+            },
+            {
+                "name": "security",
+                "description": "Audits code for security vulnerabilities",
+                "capabilities": ["vulnerability_detection", "security_best_practices", "dependency_audit"]
+            },
+            {
+                "name": "devops",
+                "description": "Builds infrastructure, CI/CD and deployment configuration",
+                "capabilities": ["ci_cd", "infrastructure_as_code", "containerization"]
             }
         ]
     }
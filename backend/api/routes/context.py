@@ -2,15 +2,21 @@
 Code context and indexing endpoints
 """
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterator, List, Optional
+import json
 
+from core.config import settings
 from services.vector_store import (
     index_code_snippet,
+    index_code_snippets,
     search_code,
     delete_workspace_code
 )
+from services.workspace_indexer import workspace_indexer
+from services.workspace_watcher import workspace_watchers
 
 router = APIRouter()
 
@@ -23,6 +29,21 @@ class IndexRequest(BaseModel):
     metadata: dict = {}
 
 
+class BulkIndexRequest(BaseModel):
+    snippets: List[IndexRequest]
+
+
+class WorkspaceIndexRequest(BaseModel):
+    workspace_path: str
+    workspace_id: Optional[str] = None
+    force: bool = False
+
+
+class WorkspaceWatchRequest(BaseModel):
+    workspace_path: str
+    workspace_id: Optional[str] = None
+
+
 class SearchRequest(BaseModel):
     query: str
     workspace_id: Optional[str] = None
@@ -52,6 +73,108 @@ async def index_code(request: IndexRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/index/bulk")
+async def index_code_bulk(request: BulkIndexRequest):
+    """Index many code snippets with batched embedding and upserts"""
+    if len(request.snippets) > settings.INDEX_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.INDEX_BULK_MAX_ITEMS} snippets per request"
+        )
+    
+    try:
+        results = await index_code_snippets(
+            [snippet.model_dump() for snippet in request.snippets]
+        )
+        failed = sum(1 for result in results if not result["success"])
+        
+        return {
+            "success": failed == 0,
+            "indexed": len(results) - failed,
+            "failed": failed,
+            "results": results
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/index/stream")
+async def index_code_stream(request: Request):
+    """
+    Index NDJSON-streamed code snippets
+    
+    The request body holds one IndexRequest JSON object per line. Snippets are
+    indexed in batches as they arrive and one NDJSON result line is written
+    per input line (``line``, ``point_id``, ``success``, ``error``), followed
+    by a summary line.
+    """
+    async def generate() -> AsyncIterator[str]:
+        batch: List[dict] = []
+        batch_lines: List[int] = []
+        indexed = failed = 0
+        
+        async def flush():
+            nonlocal indexed, failed
+            results = await index_code_snippets(batch)
+            lines = []
+            for line_no, result in zip(batch_lines, results):
+                if result["success"]:
+                    indexed += 1
+                else:
+                    failed += 1
+                lines.append(json.dumps({
+                    "line": line_no,
+                    "point_id": result["point_id"],
+                    "success": result["success"],
+                    "error": result["error"]
+                }) + "\n")
+            batch.clear()
+            batch_lines.clear()
+            return "".join(lines)
+        
+        line_no = 0
+        async for raw_line in _iter_lines(request):
+            line_no += 1
+            if not raw_line.strip():
+                continue
+            try:
+                snippet = IndexRequest.model_validate_json(raw_line)
+            except ValidationError as e:
+                failed += 1
+                yield json.dumps({
+                    "line": line_no,
+                    "point_id": None,
+                    "success": False,
+                    "error": str(e)
+                }) + "\n"
+                continue
+            
+            batch.append(snippet.model_dump())
+            batch_lines.append(line_no)
+            if len(batch) >= settings.INDEX_BATCH_SIZE * settings.INDEX_UPSERT_CONCURRENCY:
+                yield await flush()
+        
+        if batch:
+            yield await flush()
+        
+        yield json.dumps({"done": True, "indexed": indexed, "failed": failed}) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[bytes]:
+    """Split a streamed request body into lines"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
 @router.post("/search")
 async def search_context(request: SearchRequest):
     """Search for relevant code"""
@@ -73,11 +196,63 @@ async def search_context(request: SearchRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/workspace/index")
+async def index_workspace(request: WorkspaceIndexRequest):
+    """Parse and index a workspace, re-embedding only files that changed"""
+    try:
+        stats = await workspace_indexer.index_workspace(
+            workspace_path=request.workspace_path,
+            workspace_id=request.workspace_id,
+            force=request.force
+        )
+        
+        return {
+            "success": not stats["failures"],
+            **stats
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/workspace/watch")
+async def watch_workspace(request: WorkspaceWatchRequest):
+    """Keep a workspace's index current by re-indexing files as they change"""
+    try:
+        status = await workspace_watchers.watch(
+            workspace_path=request.workspace_path,
+            workspace_id=request.workspace_id
+        )
+        
+        return {"success": True, **status}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/workspace/watch")
+async def list_watched_workspaces():
+    """List watched workspaces with pending changes and index lag"""
+    return {"watchers": workspace_watchers.status()}
+
+
+@router.delete("/workspace/watch")
+async def unwatch_workspace(workspace_path: str):
+    """Stop watching a workspace"""
+    if not await workspace_watchers.unwatch(workspace_path):
+        raise HTTPException(status_code=404, detail="Workspace is not watched")
+    
+    return {"success": True}
+
+
 @router.delete("/workspace/{workspace_id}")
 async def delete_workspace(workspace_id: str):
     """Delete all indexed code for workspace"""
     try:
         await delete_workspace_code(workspace_id)
+        await workspace_indexer.forget_workspace(workspace_id)
         
         return {
             "success": True,
@@ -7,7 +7,11 @@ from datetime import datetime
 import psutil
 import torch
 
+from core.admission import admission
 from core.config import settings
+from core.llm_router import llm_router
+from services.language_servers import language_servers
+from services.sandbox import sandbox_pools
 from services.vector_store import get_collection_stats
 
 router = APIRouter()
@@ -47,6 +51,15 @@ async def detailed_health():
         except:
             vector_stats = {"status": "unavailable"}
         
+        # LLM provider circuit breakers (shared across workers)
+        try:
+            llm_providers = await llm_router.health()
+        except Exception:
+            llm_providers = {"status": "unavailable"}
+        
+        # LLM concurrency slots and queues (this worker)
+        llm_queues = admission.snapshot()
+        
         return {
             "status": "healthy",
             "timestamp": datetime.utcnow().isoformat(),
@@ -61,7 +74,11 @@ async def detailed_health():
             },
             "services": {
                 "vector_store": vector_stats,
-                "sandbox": settings.SANDBOX_ENABLED
+                "sandbox": settings.SANDBOX_ENABLED,
+                "sandbox_pools": sandbox_pools.snapshot(),
+                "language_servers": language_servers.snapshot(),
+                "llm_providers": llm_providers,
+                "llm_queues": llm_queues
             },
             "configuration": {
                 "embeddings_provider": settings.EMBEDDINGS_PROVIDER,
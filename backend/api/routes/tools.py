@@ -1,8 +1,11 @@
 """Tool execution API routes."""
 
+import json
+
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, model_validator
+from typing import Dict, Any, List, Optional
 
 from services.tool_executor import ToolExecutionService, ToolExecutionError
 
@@ -20,12 +23,64 @@ class ToolExecutionResponse(BaseModel):
     result: Dict[str, Any]
 
 
+class BatchToolCall(BaseModel):
+    id: Optional[str] = None
+    name: str
+    arguments: Dict[str, Any] = {}
+
+    @model_validator(mode="before")
+    @classmethod
+    def _flatten_function_call(cls, data: Any) -> Any:
+        # Accept tool calls exactly as the model returned them:
+        # {"id", "type": "function", "function": {"name", "arguments": "<json>"}}
+        if isinstance(data, dict) and isinstance(data.get("function"), dict):
+            function = data["function"]
+            data = {"id": data.get("id"), "name": function.get("name"), "arguments": function.get("arguments")}
+        if isinstance(data, dict) and isinstance(data.get("arguments"), str):
+            try:
+                data = {**data, "arguments": json.loads(data["arguments"] or "{}")}
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"Tool arguments are not valid JSON: {exc}") from exc
+        return data
+
+
+class ToolBatchRequest(BaseModel):
+    workspace_path: str
+    tool_calls: List[BatchToolCall]
+    concurrency: Optional[int] = None
+
+
 @router.post("/execute", response_model=ToolExecutionResponse)
 async def execute_tool(request: ToolExecutionRequest) -> ToolExecutionResponse:
     try:
         executor = ToolExecutionService(request.workspace_path)
-        result = executor.execute(request.tool, request.arguments)
+        result = await executor.execute(request.tool, request.arguments)
     except ToolExecutionError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     return ToolExecutionResponse(success=True, result=result)
+
+
+@router.post("/execute-batch")
+async def execute_tool_batch(request: ToolBatchRequest) -> StreamingResponse:
+    """
+    Execute one turn's tool calls, streaming each result as it completes
+
+    Independent read-only calls run concurrently; file writes and terminal
+    commands wait for the calls before them. Each result is an SSE
+    ``data:`` event (``call_id``, ``name``, ``success``, ``result`` or
+    ``error``, ``duration_ms``), followed by ``data: [DONE]``.
+    """
+    try:
+        executor = ToolExecutionService(request.workspace_path)
+    except ToolExecutionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    calls = [call.model_dump() for call in request.tool_calls]
+
+    async def generate():
+        async for outcome in executor.execute_batch(calls, concurrency=request.concurrency):
+            yield f"data: {json.dumps(outcome, default=str)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
@@ -0,0 +1,77 @@
+"""
+Benchmark: /api/context/index (one snippet per request) vs. /index/bulk
+
+Requires a running backend with Qdrant. Snippets are unique per run so the
+embedding cache does not flatter either path.
+
+Usage (from backend/):
+    python -m benchmarks.bulk_indexing --url http://localhost:8000 --snippets 2000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+
+def make_snippets(count: int, workspace_id: str):
+    run = uuid.uuid4().hex[:8]
+    return [
+        {
+            "content": f"def handler_{run}_{i}(request):\n    return process(request, retries={i % 7})\n",
+            "file_path": f"src/module_{i // 50}/handler_{i}.py",
+            "language": "python",
+            "workspace_id": workspace_id,
+            "metadata": {}
+        }
+        for i in range(count)
+    ]
+
+
+async def bench_single(client: httpx.AsyncClient, snippets, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(snippet):
+        async with semaphore:
+            response = await client.post("/api/context/index", json=snippet)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(post(s) for s in snippets))
+    return time.perf_counter() - started
+
+
+async def bench_bulk(client: httpx.AsyncClient, snippets, request_size: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, len(snippets), request_size):
+        response = await client.post(
+            "/api/context/index/bulk",
+            json={"snippets": snippets[start:start + request_size]}
+        )
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--snippets", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8, help="In-flight requests for the single route")
+    parser.add_argument("--request-size", type=int, default=5000, help="Snippets per bulk request")
+    args = parser.parse_args()
+
+    workspace_id = f"bench-{uuid.uuid4().hex[:8]}"
+    async with httpx.AsyncClient(base_url=args.url, timeout=600) as client:
+        single = await bench_single(client, make_snippets(args.snippets, workspace_id), args.concurrency)
+        bulk = await bench_bulk(client, make_snippets(args.snippets, workspace_id), args.request_size)
+        await client.delete(f"/api/context/workspace/{workspace_id}")
+
+    print(f"single: {args.snippets / single:8.0f} snippets/s ({single:.1f}s)")
+    print(f"bulk:   {args.snippets / bulk:8.0f} snippets/s ({bulk:.1f}s)")
+    print(f"speedup: {single / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,159 @@
+"""
+Benchmark: tool-loop conversation state, full transcripts vs the conversation log
+
+Replays a long tool loop (each turn an assistant tool call plus a large
+file_read output) two ways:
+
+* transcript: the previous continue_with_tool path, deep-copying the
+  messages twice per turn and storing the whole transcript and context
+* log: segment IDs in the conversation log, writing only each turn's delta
+
+Reports per-turn latency, bytes stored per turn (encoded as the Redis
+backend would) and Python heap held by the in-memory backends after the
+loops.
+
+Usage (from backend/):
+    python -m benchmarks.conversation_log
+    python -m benchmarks.conversation_log --turns 40 --conversations 50 --output-kib 64
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import time
+import tracemalloc
+import uuid
+from typing import Any, Dict, List
+
+from core.conversation_log import ConversationLog
+from core.tool_state import MemoryToolStateBackend, encode_state
+
+
+def make_output(kib: int) -> str:
+    # Distinct identifiers per line so compression is not flattered
+    lines = []
+    while sum(len(line) for line in lines) < kib * 1024:
+        lines.append(f"    result_{uuid.uuid4().hex[:12]} = compute('{uuid.uuid4().hex}', {len(lines)})")
+    return "\n".join(lines)
+
+
+def make_start(index: int) -> List[Dict[str, Any]]:
+    return [
+        {"role": "system", "content": "You are an expert software engineer. " * 40},
+        {"role": "user", "content": f"Workspace context:\n{make_output(8)}\n\nAdd caching ({index})"},
+    ]
+
+
+def make_turn(index: int, turn: int, output: str) -> Dict[str, Any]:
+    call_id = f"call_{index}_{turn}"
+    return {
+        "assistant": {
+            "role": "assistant",
+            "content": f"Reading module {turn}",
+            "tool_calls": [{
+                "id": call_id,
+                "type": "function",
+                "function": {"name": "file_read", "arguments": json.dumps({"path": f"src/module_{turn}.py"})}
+            }]
+        },
+        "tool": {"role": "tool", "tool_call_id": call_id, "name": "file_read", "content": output}
+    }
+
+
+CONTEXT = {"workspace_path": "/workspace/project", "user_query": "Add caching", "open_files": []}
+
+
+async def run_transcript(store: MemoryToolStateBackend, index: int, turns: int, outputs: List[str]) -> Dict[str, float]:
+    key = f"transcript-{index}"
+    await store.set(key, {"messages": make_start(index), "agent": "implementation", "context": CONTEXT})
+    written = 0
+    started = time.perf_counter()
+
+    for turn in range(turns):
+        step = make_turn(index, turn, outputs[turn])
+        state = await store.get(key)
+        messages = copy.deepcopy(state["messages"])
+        augmented = copy.deepcopy(messages)
+        augmented.append(step["tool"])
+        state = {"messages": augmented + [step["assistant"]], "agent": "implementation", "context": state["context"]}
+        written += len(encode_state(state))
+        await store.set(key, state)
+
+    return {"seconds": time.perf_counter() - started, "bytes": written}
+
+
+async def run_log(log: ConversationLog, store: MemoryToolStateBackend, index: int, turns: int,
+                  outputs: List[str]) -> Dict[str, float]:
+    key = f"log-{index}"
+    state = {
+        "segments": await log.append([], make_start(index)),
+        "agent": "implementation",
+        "context_ref": await log.put(CONTEXT)
+    }
+    await store.set(key, state)
+    written = 0
+    started = time.perf_counter()
+
+    for turn in range(turns):
+        step = make_turn(index, turn, outputs[turn])
+        state = await store.get(key)
+        messages = await log.load(state["segments"])
+        messages = messages + [step["tool"]]
+        delta = [step["tool"], step["assistant"]]
+        state = {
+            "segments": await log.append(state["segments"], delta),
+            "agent": "implementation",
+            "context_ref": state["context_ref"]
+        }
+        # Delta segments and blobs as the Redis backend would store them, plus the state itself
+        written += len(encode_state(state)) + sum(len(encode_state(message)) for message in delta)
+        await store.set(key, state)
+
+    return {"seconds": time.perf_counter() - started, "bytes": written}
+
+
+async def measure(name: str, runner, conversations: int, turns: int) -> None:
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    results = [await runner(index) for index in range(conversations)]
+    heap = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    total_turns = conversations * turns
+    seconds = sum(result["seconds"] for result in results)
+    written = sum(result["bytes"] for result in results)
+    print(f"{name:<11} {seconds / total_turns * 1000:8.2f} ms/turn  "
+          f"{written / total_turns / 1024:9.1f} KiB written/turn  "
+          f"{heap / conversations / 1024:9.1f} KiB heap/conversation")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--output-kib", type=int, default=32)
+    args = parser.parse_args()
+
+    # Tool outputs are generated up front so both runs store the same data
+    outputs = [make_output(args.output_kib) for _ in range(args.turns)]
+    print(f"{args.conversations} conversations x {args.turns} turns, {args.output_kib} KiB tool output per turn")
+
+    transcripts = MemoryToolStateBackend(ttl_seconds=600)
+    await measure(
+        "transcript",
+        lambda index: run_transcript(transcripts, index, args.turns, outputs),
+        args.conversations, args.turns
+    )
+
+    log = ConversationLog(ttl_seconds=600, blob_threshold=4096, backend="memory")
+    states = MemoryToolStateBackend(ttl_seconds=600)
+    await measure(
+        "log",
+        lambda index: run_log(log, states, index, args.turns, outputs),
+        args.conversations, args.turns
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Benchmark: direct in-coroutine encode vs. the micro-batching EmbeddingBatcher
+
+Runs N concurrent callers, each embedding single strings back to back, and
+reports p50/p99 latency and texts/sec for both paths.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_batcher
+    python -m benchmarks.embedding_batcher --synthetic
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from core.config import settings
+from core.embeddings import EmbeddingBatcher
+
+
+class SyntheticModel:
+    """Stand-in for SentenceTransformer: fixed per-call overhead plus per-text cost"""
+
+    def __init__(self, call_overhead_ms: float = 8.0, per_text_ms: float = 0.3, dim: int = 768):
+        self.call_overhead = call_overhead_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self.dim = dim
+
+    def encode(self, texts, **kwargs):
+        import numpy as np
+        time.sleep(self.call_overhead + self.per_text * len(texts))
+        return np.zeros((len(texts), self.dim), dtype="float32")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_callers(embed, concurrency: int, requests_per_caller: int) -> dict:
+    latencies: List[float] = []
+
+    async def caller(caller_id: int):
+        for i in range(requests_per_caller):
+            started = time.perf_counter()
+            await embed([f"def handler_{caller_id}_{i}(request): return request.json()"])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(caller(c) for c in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "texts_per_sec": len(latencies) / elapsed,
+        "mean_ms": statistics.mean(latencies) * 1000
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--synthetic", action="store_true", help="Use a synthetic model instead of loading weights")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--requests", type=int, default=256, help="Total requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 128])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        model = SyntheticModel()
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(settings.EMBEDDINGS_MODEL, device=args.device)
+        model.encode(["warmup"], show_progress_bar=False)
+
+    async def direct_embed(texts):
+        # Today's path before the batcher: encode inline on the event loop
+        return model.encode(texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True).tolist()
+
+    batcher = EmbeddingBatcher(
+        model,
+        max_batch_size=settings.EMBEDDINGS_MAX_BATCH_SIZE,
+        max_wait_ms=settings.EMBEDDINGS_MAX_WAIT_MS
+    )
+    batcher.start()
+
+    print(f"{'path':<10}{'callers':>8}{'p50 ms':>10}{'p99 ms':>10}{'texts/s':>10}")
+    for concurrency in args.concurrency:
+        per_caller = max(1, args.requests // concurrency)
+        for name, embed in (("direct", direct_embed), ("batched", batcher.embed)):
+            stats = await run_callers(embed, concurrency, per_caller)
+            print(
+                f"{name:<10}{concurrency:>8}{stats['p50_ms']:>10.1f}"
+                f"{stats['p99_ms']:>10.1f}{stats['texts_per_sec']:>10.0f}"
+            )
+
+    await batcher.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
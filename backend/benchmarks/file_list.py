@@ -0,0 +1,123 @@
+"""
+Benchmark: cached workspace tree vs per-call directory reads for file_list
+
+Generates a synthetic monorepo (~200k entries by default) and times
+file_list-style calls cold (new tree cache) and warm (cached, within
+FILE_TREE_REFRESH_SECONDS) plus warm-revalidated (every directory's mtime
+re-checked). Baselines are the previous implementation (iterdir + stat per
+child, one directory) and a full os.walk + stat of the tree.
+
+Usage (from backend/):
+    python -m benchmarks.file_list
+    python -m benchmarks.file_list --packages 100 --root /tmp/breezer-monorepo
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from core.config import settings
+from services.workspace_tree import WorkspaceTree
+
+
+def make_tree(root: Path, packages: int, modules: int, files: int) -> int:
+    entries = 0
+    (root / ".gitignore").write_text("*.log\n/packages/*/coverage/\n")
+    for p in range(packages):
+        package = root / "packages" / f"pkg_{p}"
+        for m in range(modules):
+            directory = package / "src" / f"mod_{m}"
+            directory.mkdir(parents=True, exist_ok=True)
+            for f in range(files):
+                (directory / f"file_{f}.ts").write_text("export {}\n")
+            (directory / "debug.log").write_text("")
+            entries += files + 2
+        (package / "package.json").write_text("{}")
+        (package / "coverage").mkdir(exist_ok=True)
+        (package / "coverage" / "lcov.info").write_text("")
+        entries += 5
+    return entries
+
+
+def legacy_list(target: Path, max_entries: int = 500) -> int:
+    entries = []
+    for idx, child in enumerate(target.iterdir()):
+        if idx >= max_entries:
+            break
+        entries.append((child.name, child.is_dir(), None if child.is_dir() else child.stat().st_size))
+    return len(entries)
+
+
+def walk_stat(root: Path) -> int:
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            os.stat(os.path.join(dirpath, name))
+        count += len(dirnames) + len(filenames)
+    return count
+
+
+def list_all(tree: WorkspaceTree, **options) -> int:
+    count, cursor = 0, None
+    while True:
+        page = tree.list(cursor=cursor, **options)
+        count += len(page["entries"])
+        cursor = page.get("next_cursor")
+        if not cursor:
+            return count
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--packages", type=int, default=400)
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--files", type=int, default=48)
+    parser.add_argument("--root", help="Tree location (generated if missing); default: a temp dir")
+    args = parser.parse_args()
+
+    root = Path(args.root or tempfile.mkdtemp(prefix="breezer-monorepo-"))
+    root.mkdir(parents=True, exist_ok=True)
+    if not any(root.iterdir()):
+        seconds, entries = timed(make_tree, root, args.packages, args.modules, args.files)
+        print(f"generated ~{entries} entries in {seconds / 1000:.1f}s under {root}")
+
+    package = root / "packages" / "pkg_0"
+    ms, count = timed(legacy_list, root / "packages")
+    print(f"{'legacy: one dir (iterdir + stat)':<44} {ms:9.1f} ms  {count:>7} entries")
+    ms, count = timed(walk_stat, root)
+    print(f"{'baseline: os.walk + stat, whole tree':<44} {ms:9.1f} ms  {count:>7} entries")
+
+    cases = [
+        ("root, depth 1", dict(path="", depth=1, limit=500)),
+        ("packages/pkg_0 tree, depth 3", dict(path=str(package.relative_to(root)), depth=3, limit=500)),
+        ("first page, depth 32", dict(path="", depth=32, limit=500)),
+        ("page at cursor, depth 32", dict(path="", depth=32, limit=500,
+                                         cursor=f"packages/pkg_{args.packages // 2}/src/mod_5/file_3.ts")),
+        ("*.ts glob, depth 32, first page", dict(path="", depth=32, limit=500, glob="*/mod_9/*.ts")),
+    ]
+    settings.FILE_TREE_REFRESH_SECONDS = 3600
+    for name, options in cases:
+        tree = WorkspaceTree(root)
+        cold, _ = timed(tree.list, **options)
+        warm, page = timed(tree.list, **options)
+        print(f"{name:<44} cold {cold:9.1f} ms  warm {warm:7.2f} ms  {len(page['entries']):>5} entries")
+
+    tree = WorkspaceTree(root)
+    cold, count = timed(list_all, tree, path="", depth=32, limit=500)
+    warm, _ = timed(list_all, tree, path="", depth=32, limit=500)
+    settings.FILE_TREE_REFRESH_SECONDS = 0
+    revalidated, _ = timed(list_all, tree, path="", depth=32, limit=500)
+    print(f"{'all pages, depth 32':<44} cold {cold:9.1f} ms  warm {warm:7.1f} ms  "
+          f"revalidated {revalidated:7.1f} ms  {count} entries")
+
+
+if __name__ == "__main__":
+    main()
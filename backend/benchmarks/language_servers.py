@@ -0,0 +1,72 @@
+"""
+Benchmark: workspace_diagnostics cold vs warm through the language server pool
+
+Runs diagnostics for a workspace with a freshly started server (cold),
+again with nothing changed (warm), and after editing one file (warm +
+incremental change). Needs the servers in LSP_SERVERS on PATH
+(pyright-langserver, typescript-language-server).
+
+Usage (from backend/):
+    python -m benchmarks.language_servers /path/to/workspace
+    python -m benchmarks.language_servers /path/to/workspace --rounds 5 --touch src/app.py
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from services.language_servers import LanguageServerError, language_servers
+
+
+async def timed(root: Path, **options):
+    started = time.perf_counter()
+    result = await language_servers.diagnostics(root, **options)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def describe(result) -> str:
+    servers = ", ".join(
+        f"{server['language']}: {server['files']} files{'' if server['complete'] else ' (incomplete)'}"
+        for server in result["servers"]
+    )
+    return f"{result['total']:>5} diagnostics  [{servers}]"
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workspace")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--touch", help="Relative file to append a comment to between warm rounds")
+    args = parser.parse_args()
+
+    root = Path(args.workspace).resolve()
+    try:
+        ms, result = await timed(root)
+        print(f"{'cold':<22} {ms:9.1f} ms  {describe(result)}")
+        for errors in result.get("errors", {}).values():
+            print(f"  skipped: {errors}")
+
+        for _ in range(args.rounds):
+            ms, result = await timed(root)
+            print(f"{'warm, unchanged':<22} {ms:9.1f} ms  {describe(result)}")
+
+        if args.touch:
+            target = root / args.touch
+            original = target.read_text()
+            comment = "//" if target.suffix in (".ts", ".tsx", ".js", ".jsx") else "#"
+            try:
+                for round_number in range(args.rounds):
+                    target.write_text(original + f"\n{comment} benchmark edit {round_number}\n")
+                    ms, result = await timed(root)
+                    print(f"{'warm, one file edited':<22} {ms:9.1f} ms  {describe(result)}")
+            finally:
+                target.write_text(original)
+    except LanguageServerError as e:
+        print(f"language servers unavailable: {e}")
+    finally:
+        await language_servers.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
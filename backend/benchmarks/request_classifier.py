@@ -0,0 +1,136 @@
+"""
+Benchmark: keyword rules vs. the embedding request classifier
+
+Classifies a labelled set of requests (none of them classifier exemplars)
+with the keyword rules, the embedding classifier alone, and the combined
+orchestrator path, then reports accuracy and per-query latency. Latency is
+measured with query embeddings already cached, which is the steady state
+for the centroid lookup.
+
+Requires the local embedding model (EMBEDDINGS_PROVIDER=local).
+
+Usage (from backend/):
+    python -m benchmarks.request_classifier
+"""
+
+import asyncio
+import statistics
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from agents.classifier import RequestType, request_classifier
+from agents.orchestrator import orchestrator
+from core.config import settings
+from core.embeddings import embed_texts, init_embeddings, shutdown_embeddings
+
+
+LABELLED: List[Tuple[str, RequestType]] = [
+    ("implement pagination for the users endpoint", RequestType.IMPLEMENT),
+    ("write a function to merge two sorted lists", RequestType.IMPLEMENT),
+    ("create a websocket handler for chat messages", RequestType.IMPLEMENT),
+    ("add a caching layer in front of the product lookup", RequestType.IMPLEMENT),
+    ("build a form with email and password validation", RequestType.IMPLEMENT),
+    ("I need a retry decorator with exponential backoff", RequestType.IMPLEMENT),
+    ("review my changes to the payment service", RequestType.REVIEW),
+    ("does this code follow best practices?", RequestType.REVIEW),
+    ("any suggestions to improve readability here", RequestType.REVIEW),
+    ("critique this class design", RequestType.REVIEW),
+    ("getting IndexError: list index out of range in the parser", RequestType.DEBUG),
+    ("the login page is blank after the last deploy, what's wrong", RequestType.DEBUG),
+    ("tests pass locally but fail on CI with a timeout", RequestType.DEBUG),
+    ("segfault when calling the native extension", RequestType.DEBUG),
+    ("why is the total always zero", RequestType.DEBUG),
+    ("break this 300-line function into smaller pieces", RequestType.REFACTOR),
+    ("remove the duplicated validation logic across these handlers", RequestType.REFACTOR),
+    ("make this code more readable without changing behavior", RequestType.REFACTOR),
+    ("replace the inheritance here with composition", RequestType.REFACTOR),
+    ("what does this decorator do", RequestType.EXPLAIN),
+    ("can you explain how the event loop schedules these tasks", RequestType.EXPLAIN),
+    ("what's the difference between these two functions", RequestType.EXPLAIN),
+    ("describe the data flow in this module", RequestType.EXPLAIN),
+    ("add docstrings to every public method", RequestType.DOCUMENT),
+    ("write usage docs for this library", RequestType.DOCUMENT),
+    ("generate a changelog entry and update the README", RequestType.DOCUMENT),
+    ("document this REST API in OpenAPI format", RequestType.DOCUMENT),
+    ("can an attacker bypass this permission check", RequestType.SECURITY),
+    ("scan this file upload handler for path traversal", RequestType.SECURITY),
+    ("is it safe to build this shell command from user input", RequestType.SECURITY),
+    ("are the JWTs validated correctly here", RequestType.SECURITY),
+    ("containerize this Flask app", RequestType.DEVOPS),
+    ("set up a CI workflow that runs lint and tests on every push", RequestType.DEVOPS),
+    ("write a helm chart for the worker service", RequestType.DEVOPS),
+    ("configure autoscaling for the API pods", RequestType.DEVOPS),
+    ("write tests for the invoice calculator", RequestType.TEST),
+    ("add parametrized pytest cases for the date parser", RequestType.TEST),
+    ("cover the error branches with unit tests", RequestType.TEST),
+]
+
+
+def accuracy(predicted: List[RequestType]) -> float:
+    correct = sum(1 for p, (_, label) in zip(predicted, LABELLED) if p == label)
+    return correct / len(LABELLED)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def main():
+    settings.EMBEDDINGS_CACHE_REDIS = False
+    await init_embeddings()
+    if not request_classifier.available():
+        print("Local embedding model not available; nothing to benchmark")
+        return
+
+    queries = [query for query, _ in LABELLED]
+    await request_classifier.warmup()
+    await embed_texts(queries)  # populate the embedding cache
+
+    keyword = [orchestrator._classify_request(q) for q in queries]
+
+    embedding: List[RequestType] = []
+    for query in queries:
+        result = await request_classifier.classify(query)
+        embedding.append(result[0] if result else RequestType.UNKNOWN)
+
+    combined = [await orchestrator.classify_request(q) for q in queries]
+
+    print(f"{'path':<12} {'accuracy':>9}")
+    print(f"{'keywords':<12} {accuracy(keyword):>8.1%}")
+    print(f"{'embedding':<12} {accuracy(embedding):>8.1%}  "
+          f"({embedding.count(RequestType.UNKNOWN)} below threshold)")
+    print(f"{'combined':<12} {accuracy(combined):>8.1%}")
+
+    # Latency: centroid lookup alone, and classify() with a cached embedding
+    centroids = await request_classifier._get_centroids()
+    vectors = [np.asarray(v, dtype=np.float32) for v in await embed_texts(queries)]
+    lookup: List[float] = []
+    for _ in range(50):
+        for vector in vectors:
+            started = time.perf_counter()
+            request_classifier.score(centroids, vector)
+            lookup.append(time.perf_counter() - started)
+
+    cached: List[float] = []
+    for _ in range(5):
+        for query in queries:
+            started = time.perf_counter()
+            await request_classifier.classify(query)
+            cached.append(time.perf_counter() - started)
+
+    for name, samples in (("lookup", lookup), ("cached", cached)):
+        print(
+            f"{name:<12} p50={percentile(samples, 50) * 1e6:.0f}us "
+            f"p99={percentile(samples, 99) * 1e6:.0f}us "
+            f"mean={statistics.mean(samples) * 1e6:.0f}us"
+        )
+
+    await shutdown_embeddings()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
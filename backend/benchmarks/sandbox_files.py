@@ -0,0 +1,80 @@
+"""
+Benchmark: injecting a multi-file project into a sandbox
+
+Compares writing each file through its own exec session (sh -c 'cat > f',
+content sent over the exec socket) with one put_archive call of an
+in-memory tar, for a synthetic project (200 files by default). Archive
+build time is reported even without Docker.
+
+Usage (from backend/):
+    python -m benchmarks.sandbox_files
+    python -m benchmarks.sandbox_files --files 500 --file-kib 8
+"""
+
+import argparse
+import asyncio
+import socket
+import time
+import uuid
+from typing import Dict
+
+from services.sandbox import Sandbox, _docker, build_archive, docker_client
+
+
+def make_project(count: int, kib: int) -> Dict[str, str]:
+    files = {}
+    for i in range(count):
+        body = "\n".join(f"VALUE_{j} = '{uuid.uuid4().hex}'" for j in range(kib * 1024 // 48))
+        files[f"pkg/module_{i // 20}/file_{i}.py"] = body
+    return files
+
+
+def write_per_file(sandbox: Sandbox, files: Dict[str, str]) -> None:
+    api = docker_client.api
+    for name, content in files.items():
+        exec_id = api.exec_create(
+            sandbox.container.id, ["sh", "-c", f"mkdir -p \"$(dirname '{name}')\" && cat > '{name}'"],
+            stdin=True, workdir="/workspace"
+        )["Id"]
+        sock = api.exec_start(exec_id, socket=True)
+        raw = getattr(sock, "_sock", sock)
+        raw.sendall(content.encode())
+        raw.shutdown(socket.SHUT_WR)
+        while raw.recv(65536):
+            pass
+        raw.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--file-kib", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    files = make_project(args.files, args.file_kib)
+    started = time.perf_counter()
+    archive = build_archive(files)
+    print(f"{args.files} files, archive {len(archive) / 1024:.0f} KiB built in "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms")
+
+    if docker_client is None:
+        print("docker: unavailable")
+        return
+
+    async with Sandbox() as sandbox:
+        for name, inject in (
+            ("per-file exec", lambda: write_per_file(sandbox, files)),
+            ("put_archive", lambda: sandbox._inject_archive(build_archive(files))),
+        ):
+            timings = []
+            for _ in range(args.rounds):
+                await sandbox.reset()
+                started = time.perf_counter()
+                await _docker(inject)
+                timings.append(time.perf_counter() - started)
+            print(f"{name:<14} {min(timings) * 1000:9.1f} ms (best of {args.rounds})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+Benchmark: per-call sandbox containers vs the warm sandbox pool
+
+Runs the same short program through a fresh Sandbox per execution (create,
+start, execute, stop, remove) and through leases on a pre-warmed
+SandboxPool, and reports executions/sec and latency percentiles. Needs a
+reachable Docker daemon.
+
+Usage (from backend/):
+    python -m benchmarks.sandbox_pool
+    python -m benchmarks.sandbox_pool --executions 100 --concurrency 4 --pool-size 4
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from services.sandbox import Sandbox, SandboxPool, docker_client
+
+CODE = "import sys\nprint(sum(range(1000)))\n"
+
+
+def report(name: str, latencies: List[float], elapsed: float, failures: int) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(f"{name:<10} {len(latencies) / elapsed:7.2f} exec/s  "
+          f"p50 {statistics.median(latencies) * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms  "
+          f"failed {failures}")
+
+
+async def run(execute, executions: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            result = await execute()
+            latencies.append(time.perf_counter() - started)
+            failures += not result["success"]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(executions)))
+    return latencies, time.perf_counter() - started, failures
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--executions", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--language", default="python")
+    args = parser.parse_args()
+
+    if docker_client is None:
+        print("docker: unavailable")
+        return
+
+    async def per_call():
+        async with Sandbox(language=args.language) as sandbox:
+            return await sandbox.execute(CODE)
+
+    pool = SandboxPool(args.language, min_size=args.pool_size, max_size=args.pool_size, max_uses=0)
+    await pool.fill()
+
+    async def pooled():
+        async with pool.lease() as sandbox:
+            return await sandbox.execute(CODE)
+
+    try:
+        # One warm-up each so image checks are not counted
+        await per_call()
+        await pooled()
+
+        report("per-call", *await run(per_call, args.executions, args.concurrency))
+        report("pool", *await run(pooled, args.executions, args.concurrency))
+    finally:
+        await pool.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""
+Benchmark: ToolStateManager backends
+
+Stores synthetic pending conversations (system prompt, workspace context,
+code-heavy assistant turns and tool calls) and reports set/get throughput
+for the in-memory and Redis backends, plus bytes per pending conversation:
+Python heap for the in-memory backend, encoded size (and Redis MEMORY USAGE)
+for the Redis backend, against plain JSON.
+
+Usage (from backend/):
+    python -m benchmarks.tool_state
+    python -m benchmarks.tool_state --conversations 2000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+import uuid
+from typing import Any, Dict, List
+
+from core.redis_client import close_redis, get_redis
+from core.tool_state import MemoryToolStateBackend, RedisToolStateBackend, encode_state
+
+
+def make_state(index: int, turns: int = 6) -> Dict[str, Any]:
+    # Distinct identifiers per line so compression is not flattered
+    code = "\n".join(
+        f"def handler_{uuid.uuid4().hex[:10]}(request):\n"
+        f"    data = request.json().get('{uuid.uuid4().hex[:6]}')\n"
+        f"    return process(data, {i}, key='{uuid.uuid4().hex}')"
+        for i in range(40)
+    )
+    messages: List[Dict[str, Any]] = [
+        {"role": "system", "content": "You are an expert software engineer. " * 40},
+        {"role": "user", "content": f"Workspace context:\nFile app.py:\n```python\n{code}\n```\n\nAdd caching"},
+    ]
+    for turn in range(turns):
+        messages.append({
+            "role": "assistant",
+            "content": f"Step {turn}:\n```python\n{code[:2000]}\n```",
+            "tool_calls": [{
+                "id": f"call_{index}_{turn}",
+                "type": "function",
+                "function": {"name": "file_read", "arguments": json.dumps({"path": f"src/module_{turn}.py"})}
+            }]
+        })
+        messages.append({
+            "role": "tool",
+            "tool_call_id": f"call_{index}_{turn}",
+            "name": "file_read",
+            "content": code
+        })
+    return {
+        "agent": "implementation",
+        "conversation_state": {
+            "messages": messages,
+            "agent": "implementation",
+            "context": {"workspace_path": "/workspace/project", "user_query": "Add caching", "open_files": []}
+        }
+    }
+
+
+async def run_throughput(backend, states: Dict[str, Dict[str, Any]], concurrency: int) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    ids = list(states)
+
+    async def limited(coro):
+        async with semaphore:
+            return await coro
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(backend.set(key, states[key])) for key in ids))
+    set_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(limited(backend.get(key)) for key in ids))
+    get_elapsed = time.perf_counter() - started
+
+    assert all(result is not None for result in results)
+    return {"set_per_sec": len(ids) / set_elapsed, "get_per_sec": len(ids) / get_elapsed}
+
+
+async def memory_bytes_per_state(count: int) -> float:
+    backend = MemoryToolStateBackend(ttl_seconds=600)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        await backend.set(str(uuid.uuid4()), make_state(i))
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return used / count
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    states = {str(uuid.uuid4()): make_state(i) for i in range(args.conversations)}
+    sample = next(iter(states.values()))
+    json_size = len(json.dumps(sample).encode())
+    encoded_size = len(encode_state(sample))
+
+    print(f"Conversation: {len(sample['conversation_state']['messages'])} messages")
+    print(f"  json:    {json_size / 1024:8.1f} KiB")
+    print(f"  encoded: {encoded_size / 1024:8.1f} KiB ({json_size / encoded_size:.1f}x smaller)")
+
+    memory = MemoryToolStateBackend(ttl_seconds=600)
+    result = await run_throughput(memory, states, args.concurrency)
+    heap = await memory_bytes_per_state(min(200, args.conversations))
+    print(f"memory: set {result['set_per_sec']:,.0f}/s  get {result['get_per_sec']:,.0f}/s  "
+          f"heap {heap / 1024:.1f} KiB/conversation")
+
+    redis = RedisToolStateBackend(ttl_seconds=600)
+    try:
+        await get_redis().ping()
+    except Exception as e:
+        print(f"redis: unavailable ({e})")
+        return
+
+    try:
+        result = await run_throughput(redis, states, args.concurrency)
+        key = RedisToolStateBackend.KEY_PREFIX + next(iter(states))
+        usage = await get_redis().memory_usage(key)
+        print(f"redis:  set {result['set_per_sec']:,.0f}/s  get {result['get_per_sec']:,.0f}/s  "
+              f"MEMORY USAGE {usage / 1024:.1f} KiB/conversation")
+    finally:
+        await get_redis().delete(*(RedisToolStateBackend.KEY_PREFIX + key for key in states))
+        await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
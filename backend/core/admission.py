@@ -0,0 +1,185 @@
+"""
+Per-model concurrency limits, priority queues and admission control
+
+Each model gets a limiter (sized by provider prefix from
+LLM_CONCURRENCY_LIMITS) bounding in-flight completions in this worker.
+Callers beyond the limit wait in a priority queue, interactive requests
+ahead of batch runs. Admission control projects the queue wait from the
+observed hold time and rejects new requests whose wait would exceed
+LLM_ADMISSION_MAX_WAIT, so the API sheds load instead of piling it up.
+"""
+
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Dict, List, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+
+from prometheus_client import Gauge, Histogram
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Queue priority (lower is served first)"""
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+# Set per request by the API routes
+request_priority: ContextVar[Priority] = ContextVar("request_priority", default=Priority.INTERACTIVE)
+
+QUEUE_TIME = Histogram(
+    "breezer_llm_queue_seconds",
+    "Time LLM requests waited for a concurrency slot",
+    ["model", "priority"],
+    buckets=(0.005, 0.05, 0.25, 1, 2.5, 5, 10, 30, 60, 120)
+)
+IN_FLIGHT = Gauge("breezer_llm_in_flight", "LLM requests holding a concurrency slot", ["model"])
+QUEUED = Gauge("breezer_llm_queued", "LLM requests waiting for a concurrency slot", ["model"])
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request would wait longer than the admission budget"""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ModelLimiter:
+    """Concurrency slots and priority wait queue for one model"""
+    
+    def __init__(self, model: str, limit: int):
+        self.model = model
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._avg_hold = 0.0  # EWMA of slot hold time (seconds)
+    
+    async def acquire(self) -> float:
+        """
+        Wait for a slot at the current request priority
+        
+        Returns:
+            Acquisition time (monotonic), to pass back to release()
+        """
+        priority = request_priority.get()
+        started = time.monotonic()
+        
+        if self.active >= self.limit or self._waiters:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), future))
+            self._update_gauges()
+            try:
+                await future
+            except asyncio.CancelledError:
+                # A slot handed over just before cancellation must be passed on
+                if future.done() and not future.cancelled():
+                    self._release_slot()
+                else:
+                    self._waiters = [w for w in self._waiters if w[2] is not future]
+                    heapq.heapify(self._waiters)
+                raise
+            finally:
+                self._update_gauges()
+        else:
+            self.active += 1
+            self._update_gauges()
+        
+        acquired = time.monotonic()
+        QUEUE_TIME.labels(model=self.model, priority=priority.name.lower()).observe(acquired - started)
+        return acquired
+    
+    def release(self, acquired: float):
+        """Return a slot, handing it to the highest-priority waiter"""
+        held = time.monotonic() - acquired
+        self._avg_hold = held if self._avg_hold == 0 else 0.8 * self._avg_hold + 0.2 * held
+        self._release_slot()
+    
+    def _release_slot(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # The slot moves to the waiter; active stays the same
+                future.set_result(None)
+                self._update_gauges()
+                return
+        self.active -= 1
+        self._update_gauges()
+    
+    def projected_wait(self, priority: Priority) -> float:
+        """Estimated queue wait for a new request at the given priority"""
+        ahead = sum(1 for p, _, f in self._waiters if p <= priority and not f.done())
+        if self.active + ahead < self.limit:
+            return 0.0
+        rounds = (self.active + ahead - self.limit) // self.limit + 1
+        return rounds * self._avg_hold
+    
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.active,
+            "queued": len(self._waiters),
+            "avg_hold_seconds": round(self._avg_hold, 3)
+        }
+    
+    def _update_gauges(self):
+        IN_FLIGHT.labels(model=self.model).set(self.active)
+        QUEUED.labels(model=self.model).set(len(self._waiters))
+
+
+class AdmissionController:
+    """Registry of per-model limiters"""
+    
+    def __init__(self):
+        self._limiters: Dict[str, ModelLimiter] = {}
+    
+    def get(self, model: str) -> ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = ModelLimiter(model, self._limit_for(model))
+            self._limiters[model] = limiter
+        return limiter
+    
+    def _limit_for(self, model: str) -> int:
+        """Concurrency limit by provider prefix ("deepseek/...", "llamafile/...")"""
+        provider = model.split("/", 1)[0].lower()
+        return settings.LLM_CONCURRENCY_LIMITS.get(provider, settings.LLM_CONCURRENCY_DEFAULT)
+    
+    def check(self, models: List[str]):
+        """
+        Reject a request up front if its projected queue wait is over budget
+        
+        Args:
+            models: Models the request will call
+        
+        Raises:
+            AdmissionRejected: With a Retry-After estimate in seconds
+        """
+        priority = request_priority.get()
+        budget = settings.LLM_ADMISSION_MAX_WAIT
+        
+        for model in models:
+            wait = self.get(model).projected_wait(priority)
+            if wait > budget:
+                retry_after = max(1, math.ceil(wait - budget))
+                logger.warning(f"🚦 Rejecting {priority.name.lower()} request: {model} queue ~{wait:.1f}s")
+                raise AdmissionRejected(
+                    f"{model} is at capacity (projected wait {wait:.0f}s)",
+                    retry_after=retry_after
+                )
+    
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {model: limiter.snapshot() for model, limiter in self._limiters.items()}
+
+
+# Global admission controller
+admission = AdmissionController()
@@ -0,0 +1,234 @@
+"""
+Per-model circuit breakers for LLM providers
+
+Each worker keeps a rolling window of call outcomes and latencies per model.
+When the failed/slow share of the window crosses the threshold the breaker
+opens and publishes that to Redis, so every API worker skips the model until
+the open period expires. After that a single probe at a time (coordinated
+through a Redis lock) is let through; enough successful probes close the
+breaker, a failed probe re-opens it with a doubled open period.
+"""
+
+from collections import deque
+from enum import Enum
+from typing import Any, Awaitable, Deque, Dict, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from core.config import settings
+from core.redis_client import get_redis, redis_available, report_redis_failure
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerState(str, Enum):
+    """Circuit breaker states"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when every candidate model is behind an open breaker"""
+    pass
+
+
+class CircuitBreaker:
+    """Circuit breaker for one model"""
+    
+    def __init__(self, model: str):
+        self.model = model
+        self.state = BreakerState.CLOSED
+        self.open_seconds = float(settings.LLM_BREAKER_OPEN_SECONDS)
+        self._open_until = 0.0
+        self._events: Deque[Tuple[float, bool, float]] = deque()  # (time, failed, latency)
+        self._probe_in_flight = False
+        self._probe_successes = 0
+        self._synced_at = 0.0
+        self._redis_key = f"breezer:breaker:{model}"
+    
+    async def allow(self) -> bool:
+        """Whether a request may be sent to this model now"""
+        now = time.monotonic()
+        await self._sync(now)
+        
+        if self.state == BreakerState.OPEN:
+            if now < self._open_until:
+                return False
+            self.state = BreakerState.HALF_OPEN
+            self._probe_successes = 0
+            logger.info(f"🔌 Breaker for {self.model} half-open, probing")
+        
+        if self.state == BreakerState.HALF_OPEN:
+            if self._probe_in_flight or not await self._acquire_probe():
+                return False
+            self._probe_in_flight = True
+        
+        return True
+    
+    def record(self, failed: bool, latency: float):
+        """Record the outcome of a call admitted by allow()"""
+        now = time.monotonic()
+        slow = 0 < settings.LLM_BREAKER_SLOW_CALL_SECONDS < latency
+        self._events.append((now, failed or slow, latency))
+        self._prune(now)
+        
+        if self.state == BreakerState.HALF_OPEN:
+            self.release()
+            if failed:
+                self._trip(now, "probe failed", backoff=True)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= settings.LLM_BREAKER_HALF_OPEN_SUCCESSES:
+                self._close()
+            return
+        
+        if self.state == BreakerState.CLOSED:
+            requests = len(self._events)
+            if requests >= settings.LLM_BREAKER_MIN_REQUESTS and self.error_rate() >= settings.LLM_BREAKER_ERROR_THRESHOLD:
+                self._trip(now, f"error rate {self.error_rate():.0%} over {requests} calls")
+    
+    def record_latency(self, latency: float):
+        """Record a successful call's latency for hedging only, with breaking disabled"""
+        now = time.monotonic()
+        self._events.append((now, False, latency))
+        self._prune(now)
+    
+    def release(self):
+        """Release a probe slot without recording an outcome (e.g. cancelled)"""
+        if self._probe_in_flight:
+            self._probe_in_flight = False
+            _spawn(self._redis_call("delete", f"{self._redis_key}:probe"))
+    
+    def error_rate(self) -> float:
+        if not self._events:
+            return 0.0
+        return sum(1 for _, failed, _ in self._events if failed) / len(self._events)
+    
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        """Latency percentile (seconds) of successful calls in the window"""
+        latencies = sorted(latency for _, failed, latency in self._events if not failed)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(pct / 100 * (len(latencies) - 1))))
+        return latencies[index]
+    
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._prune(now)
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        return {
+            "state": self.state.value,
+            "requests_in_window": len(self._events),
+            "error_rate": round(self.error_rate(), 3),
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+            "open_for_seconds": round(max(0.0, self._open_until - now), 1) if self.state == BreakerState.OPEN else 0
+        }
+    
+    def _trip(self, now: float, reason: str, backoff: bool = False):
+        if backoff:
+            self.open_seconds = min(self.open_seconds * 2, float(settings.LLM_BREAKER_MAX_OPEN_SECONDS))
+        self.state = BreakerState.OPEN
+        self._open_until = now + self.open_seconds
+        logger.warning(f"⚡ Breaker for {self.model} opened for {self.open_seconds:.0f}s: {reason}")
+        self._publish_open()
+    
+    def _close(self):
+        self.state = BreakerState.CLOSED
+        self.open_seconds = float(settings.LLM_BREAKER_OPEN_SECONDS)
+        self._events.clear()
+        logger.info(f"✅ Breaker for {self.model} closed")
+    
+    def _prune(self, now: float):
+        horizon = now - settings.LLM_BREAKER_WINDOW_SECONDS
+        while self._events and self._events[0][0] < horizon:
+            self._events.popleft()
+    
+    async def _sync(self, now: float, force: bool = False):
+        """Adopt an open state published by another worker"""
+        if not force and now - self._synced_at < settings.LLM_BREAKER_SYNC_INTERVAL:
+            return
+        self._synced_at = now
+        if not redis_available():
+            return
+        try:
+            ttl_ms = await get_redis().pttl(self._redis_key)
+        except Exception as e:
+            report_redis_failure(e)
+            return
+        if ttl_ms and ttl_ms > 0 and self.state != BreakerState.OPEN:
+            self.state = BreakerState.OPEN
+            self._open_until = now + ttl_ms / 1000
+    
+    def _publish_open(self):
+        _spawn(self._redis_call("set", self._redis_key, b"open", px=int(self.open_seconds * 1000)))
+    
+    async def _redis_call(self, method: str, *args, **kwargs):
+        if not redis_available():
+            return
+        try:
+            await getattr(get_redis(), method)(*args, **kwargs)
+        except Exception as e:
+            report_redis_failure(e)
+    
+    async def _acquire_probe(self) -> bool:
+        """Let only one worker probe a half-open model at a time"""
+        if not redis_available():
+            # Redis unavailable: fall back to per-worker probing
+            return True
+        try:
+            acquired = await get_redis().set(
+                f"{self._redis_key}:probe",
+                b"1",
+                nx=True,
+                px=int(max(settings.LLM_BREAKER_SLOW_CALL_SECONDS, 30) * 1000)
+            )
+            return bool(acquired)
+        except Exception as e:
+            report_redis_failure(e)
+            return True
+
+
+class CircuitBreakerRegistry:
+    """Lazily created breakers keyed by model"""
+    
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+    
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = CircuitBreaker(model)
+            self._breakers[model] = breaker
+        return breaker
+    
+    async def snapshot(self) -> Dict[str, Any]:
+        """Breaker state per model, including opens published by other workers"""
+        result: Dict[str, Any] = {}
+        for model, breaker in self._breakers.items():
+            await breaker._sync(time.monotonic(), force=True)
+            result[model] = breaker.snapshot()
+        return result
+
+
+def _spawn(coro: Awaitable):
+    """Run a best-effort Redis update without blocking the caller"""
+    try:
+        asyncio.get_running_loop().create_task(coro)
+    except RuntimeError:
+        coro.close()
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """Whether an error says something about provider health (not the request)"""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in (408, 429):
+        return False
+    return True
+
+
+# Global registry
+circuit_breakers = CircuitBreakerRegistry()
@@ -3,7 +3,7 @@ Configuration management using Pydantic Settings
 """
 
 from pydantic_settings import BaseSettings
-from typing import List, Dict
+from typing import List, Dict, Literal
 import os
 
 
@@ -71,11 +71,69 @@ class Settings(BaseSettings):
     MODEL_TOOL_CALL: str = "deepseek/deepseek-chat"
     MODEL_FALLBACK: str = "llamafile/mistral-7b-instruct"
     
+    # How ImplementationAgent uses MODEL_TOOL_CALL and MODEL_IMPLEMENTATION:
+    # sequential | speculative | escalate (see ImplementationAgent._run_turn)
+    IMPLEMENTATION_STRATEGY: Literal["sequential", "speculative", "escalate"] = "escalate"
+    # speculative: seconds to wait for the reasoner once the tool-call model
+    # answered without tools; on timeout or error that answer is kept
+    IMPLEMENTATION_REASONER_TIMEOUT: float = 120.0
+    
+    # Embedding request classifier (falls back to keyword rules below these)
+    CLASSIFIER_ENABLED: bool = True
+    CLASSIFIER_MIN_SCORE: float = 0.35  # cosine to the best centroid
+    CLASSIFIER_MIN_MARGIN: float = 0.03  # over the runner-up
+    
+    # Agents run concurrently by /api/agent/multi-agent
+    MULTI_AGENT_MAX_CONCURRENCY: int = 3
+    
+    # Provider circuit breakers (shared across workers through Redis)
+    LLM_BREAKER_ENABLED: bool = True
+    LLM_BREAKER_WINDOW_SECONDS: int = 60
+    LLM_BREAKER_MIN_REQUESTS: int = 5
+    LLM_BREAKER_ERROR_THRESHOLD: float = 0.5  # failed or slow share of window
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 60.0  # 0 disables slow-call tracking
+    LLM_BREAKER_OPEN_SECONDS: int = 30
+    LLM_BREAKER_MAX_OPEN_SECONDS: int = 600
+    LLM_BREAKER_HALF_OPEN_SUCCESSES: int = 2  # probes needed to close again
+    LLM_BREAKER_SYNC_INTERVAL: float = 1.0
+    
+    # Hedged requests: if the primary has not answered (or sent its first
+    # stream chunk) by the deadline, race a second request on LLM_HEDGE_MODEL
+    LLM_HEDGE_AGENTS: List[str] = []  # opt-in agent types, e.g. ["documentation"]
+    LLM_HEDGE_MODEL: str = ""  # defaults to MODEL_FALLBACK
+    LLM_HEDGE_PERCENTILE: float = 95.0  # of the primary's recent latency
+    LLM_HEDGE_MIN_DELAY: float = 2.0
+    LLM_HEDGE_DEFAULT_DELAY: float = 10.0  # until latency samples exist
+    
+    # Concurrent completions per model and API worker, by provider prefix
+    LLM_CONCURRENCY_LIMITS: Dict[str, int] = {"llamafile": 2, "deepseek": 16, "openai": 32, "anthropic": 16}
+    LLM_CONCURRENCY_DEFAULT: int = 16
+    LLM_ADMISSION_MAX_WAIT: float = 30.0  # seconds of projected queue wait before 429
+    
     # Embeddings
     EMBEDDINGS_PROVIDER: str = "local"  # or 'openai'
     EMBEDDINGS_MODEL: str = "sentence-transformers/all-mpnet-base-v2"
     EMBEDDINGS_DEVICE: str = "cuda"  # or 'cpu'
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDINGS_MAX_BATCH_SIZE: int = 64
+    EMBEDDINGS_MAX_WAIT_MS: float = 5.0
+    EMBEDDINGS_CACHE_ENABLED: bool = True
+    EMBEDDINGS_CACHE_SIZE: int = 20000  # in-memory LRU entries
+    EMBEDDINGS_CACHE_REDIS: bool = True  # persistent tier
+    EMBEDDINGS_CACHE_TTL: int = 30 * 86400
+    
+    # Indexing
+    INDEX_BATCH_SIZE: int = 256  # snippets per embed + upsert batch
+    INDEX_UPSERT_CONCURRENCY: int = 4
+    INDEX_BULK_MAX_ITEMS: int = 10000
+    INDEXER_WORKERS: int = 0  # parse processes, 0 = one per CPU
+    INDEXER_MAX_FILE_BYTES: int = 1_000_000
+    INDEXER_IGNORED_DIRS: List[str] = [
+        ".git", "node_modules", "__pycache__", ".venv", "venv",
+        "dist", "build", ".mypy_cache", ".pytest_cache", ".next"
+    ]
+    WATCHER_DEBOUNCE_MS: int = 500  # quiet period before a change set is emitted
+    WATCHER_RETRY_DELAY: int = 5
     
     # Sandbox (Strategy B - Heavy Isolation)
     SANDBOX_ENABLED: bool = True
@@ -85,6 +143,18 @@ class Settings(BaseSettings):
     SANDBOX_CPU_LIMIT: int = 2
     SANDBOX_NETWORK_ISOLATED: bool = True
     SANDBOX_READ_ONLY_ROOT: bool = True
+    SANDBOX_DOCKER_THREADS: int = 8  # threads for blocking Docker SDK calls
+    SANDBOX_WORKSPACE_TMPFS: str = ""  # tmpfs options for /workspace, e.g. "size=256m"; empty = container fs unless SANDBOX_READ_ONLY_ROOT
+    SANDBOX_ARTIFACT_MAX_BYTES: int = 50_000_000
+
+    # Warm sandbox pools (languages listed here are pre-warmed at startup)
+    SANDBOX_POOL_ENABLED: bool = True
+    SANDBOX_POOL_LANGUAGES: List[str] = ["python"]
+    SANDBOX_POOL_MIN_SIZE: int = 1
+    SANDBOX_POOL_MAX_SIZE: int = 4
+    SANDBOX_POOL_MAX_USES: int = 50
+    SANDBOX_POOL_LEASE_TIMEOUT: float = 30.0
+    SANDBOX_POOL_HEALTH_INTERVAL: float = 30.0
 
     # Tooling safety
     TOOL_FILE_ROOT: str = ""
@@ -101,14 +171,50 @@ class Settings(BaseSettings):
     }
     TOOL_MAX_FILE_SIZE_BYTES: int = 1_000_000
     TOOL_WEB_LOOKUP_ENABLED: bool = False
+    TOOL_BATCH_CONCURRENCY: int = 4  # concurrent read-only calls in a tool-call batch
+    TOOL_FILE_READ_INDEX_CACHE: int = 64  # files whose line offsets / symbols stay cached
+    FILE_TREE_REFRESH_SECONDS: float = 2.0  # how long a cached directory listing is trusted
+    CODE_SEARCH_INDEX_DIR: str = ".cache/code_search"
+    CODE_SEARCH_REFRESH_SECONDS: float = 5.0  # mtime re-scan interval per workspace
+    CODE_SEARCH_MAX_FILES_SCANNED: int = 5000  # candidate files read per query
+    
+    # Language servers behind workspace_diagnostics (one process per workspace and language)
+    LSP_ENABLED: bool = True
+    LSP_SERVERS: Dict[str, List[str]] = {
+        "python": ["pyright-langserver", "--stdio"],
+        "typescript": ["typescript-language-server", "--stdio"]
+    }
+    LSP_MAX_SERVERS: int = 4
+    LSP_IDLE_TIMEOUT: float = 600.0
+    LSP_MEMORY_LIMIT_MB: int = 1536  # resident memory per server, child processes included
+    LSP_MAX_OPEN_FILES: int = 500  # source files synced to each server
+    LSP_REQUEST_TIMEOUT: float = 30.0
+    LSP_DIAGNOSTICS_SETTLE: float = 1.0  # quiet period that ends a diagnostics wait
+    LSP_SWEEP_INTERVAL: float = 30.0
+    
+    # Pending tool-call conversations: "redis" (shared by all API workers)
+    # or "memory" (single process only)
+    TOOL_STATE_BACKEND: str = "redis"
+    TOOL_STATE_TTL: int = 600
+    TOOL_STATE_SWEEP_INTERVAL: float = 30.0
+    CONVERSATION_BLOB_THRESHOLD: int = 4096  # message content stored once as a blob above this size (chars)
     
     # Context
     MAX_CONTEXT_TOKENS: int = 128000
     MAX_OUTPUT_TOKENS: int = 4096
+    CONTEXT_BUDGET_TOKENS: int = 16000  # context pieces per prompt, before model window caps
+    MODEL_CONTEXT_WINDOWS: Dict[str, int] = {"llamafile": 8192}  # by provider prefix
+    CONTEXT_MAX_OPEN_FILES: int = 5
     
     # Caching
     CACHE_ENABLED: bool = True
     CACHE_TTL: int = 3600
+    CACHE_MAX_ENTRIES: int = 1000
+    CACHE_SEMANTIC_ENABLED: bool = True
+    CACHE_SEMANTIC_AGENTS: List[str] = ["review", "security", "documentation"]
+    CACHE_SEMANTIC_THRESHOLD: float = 0.97  # cosine similarity
+    CACHE_SEMANTIC_MAX_TEMPERATURE: float = 0.4
+    CACHE_SEMANTIC_MAX_ENTRIES: int = 500  # per agent and model
     
     # Rate Limiting
     RATE_LIMIT_REQUESTS: int = 100
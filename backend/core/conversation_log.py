@@ -0,0 +1,192 @@
+"""Append-only, content-addressed storage for tool-loop conversations.
+
+Pending tool-call conversations reference their history by segment ID
+instead of carrying the whole transcript. A segment is one message stored
+under the hash of its content, so each turn writes only the messages it
+added and identical segments (the system prompt, a shared context) are
+stored once. Message content above ``CONVERSATION_BLOB_THRESHOLD`` chars is
+split out into a blob, so a large file read referenced from several
+messages or conversations is also stored once.
+
+Entries live in Redis with the tool-state TTL (touched whenever a
+conversation is loaded) or, when Redis is not configured or unavailable,
+in a process-local dict.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.config import settings
+from core.redis_client import get_redis, redis_available, report_redis_failure
+from core.tool_state import decode_state, encode_state
+
+logger = logging.getLogger(__name__)
+
+BLOB_REF = "$blob"
+
+
+def _digest(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+
+class ConversationLog:
+    """Content-addressed message segments, blobs and contexts."""
+
+    KEY_PREFIX = "breezer:conv:"
+
+    def __init__(self, ttl_seconds: int = 600, blob_threshold: int = 4096, backend: str = "memory") -> None:
+        self._ttl = ttl_seconds
+        self._blob_threshold = blob_threshold
+        self._use_redis_backend = backend == "redis"
+        self._memory: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._last_sweep = time.monotonic()
+
+    async def append(self, segment_ids: List[str], messages: Iterable[Dict[str, Any]]) -> List[str]:
+        """Store new messages after an existing history.
+
+        Args:
+            segment_ids: Segment IDs of the history so far (not modified)
+            messages: Messages added since then
+
+        Returns:
+            Segment IDs of the whole history
+        """
+        entries: Dict[str, Dict[str, Any]] = {}
+        new_ids = []
+        for message in messages:
+            segment_id, segment = self._split(message, entries)
+            entries[segment_id] = segment
+            new_ids.append(segment_id)
+
+        await self._write(entries)
+        return segment_ids + new_ids
+
+    async def load(self, segment_ids: List[str]) -> List[Dict[str, Any]]:
+        """Rebuild the messages of a history, refreshing its expiry.
+
+        Returns:
+            New message dicts; nested values are shared with the log and
+            must not be mutated in place.
+
+        Raises:
+            ValueError: If part of the history has expired
+        """
+        segments = await self._read(dict.fromkeys(segment_ids))
+        blob_ids = {
+            segment["content"][BLOB_REF]
+            for segment in segments.values()
+            if segment and isinstance(segment.get("content"), dict) and BLOB_REF in segment["content"]
+        }
+        blobs = await self._read(blob_ids) if blob_ids else {}
+
+        messages = []
+        for segment_id in segment_ids:
+            segment = segments.get(segment_id)
+            if segment is None:
+                raise ValueError("Conversation history has expired")
+            message = dict(segment)
+            content = message.get("content")
+            if isinstance(content, dict) and BLOB_REF in content:
+                blob = blobs.get(content[BLOB_REF])
+                if blob is None:
+                    raise ValueError("Conversation history has expired")
+                message["content"] = blob["content"]
+            messages.append(message)
+        return messages
+
+    async def put(self, value: Dict[str, Any]) -> str:
+        """Store a standalone value (e.g. the request context) and return its ID."""
+        value_id = "v" + _digest(json.dumps(value, sort_keys=True, separators=(",", ":"), default=str))
+        await self._write({value_id: value})
+        return value_id
+
+    async def get(self, value_id: str) -> Optional[Dict[str, Any]]:
+        return (await self._read([value_id])).get(value_id)
+
+    def _split(self, message: Dict[str, Any], entries: Dict[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """Segment ID and stored form of a message, moving large content to ``entries`` as a blob."""
+        segment = dict(message)
+        content = segment.get("content")
+        if isinstance(content, str) and len(content) > self._blob_threshold:
+            blob_id = "b" + _digest(content)
+            entries[blob_id] = {"content": content}
+            segment["content"] = {BLOB_REF: blob_id}
+
+        encoded = json.dumps(segment, sort_keys=True, separators=(",", ":"), default=str)
+        return "s" + _digest(encoded), segment
+
+    async def _write(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        if not entries:
+            return
+
+        if self._use_redis():
+            try:
+                # Existing entries are left as written and only have their TTL extended
+                async with get_redis().pipeline(transaction=False) as pipe:
+                    for key, value in entries.items():
+                        pipe.set(self.KEY_PREFIX + key, encode_state(value), ex=self._ttl, nx=True)
+                        pipe.expire(self.KEY_PREFIX + key, self._ttl)
+                    await pipe.execute()
+                return
+            except Exception as exc:
+                report_redis_failure(exc)
+
+        now = time.monotonic()
+        for key, value in entries.items():
+            entry = self._memory.get(key)
+            self._memory[key] = (now + self._ttl, entry[1] if entry else value)
+        self._maybe_sweep(now)
+
+    async def _read(self, keys: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        keys = list(keys)
+        if self._use_redis():
+            try:
+                async with get_redis().pipeline(transaction=False) as pipe:
+                    pipe.mget([self.KEY_PREFIX + key for key in keys])
+                    for key in keys:
+                        pipe.expire(self.KEY_PREFIX + key, self._ttl)
+                    results = await pipe.execute()
+                values = {key: decode_state(data) for key, data in zip(keys, results[0]) if data}
+                if len(values) == len(keys):
+                    return values
+                # Written to process memory while Redis was down
+                return {**self._read_memory(keys), **values}
+            except Exception as exc:
+                report_redis_failure(exc)
+        return self._read_memory(keys)
+
+    def _read_memory(self, keys: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        now = time.monotonic()
+        values = {}
+        for key in keys:
+            entry = self._memory.get(key)
+            if entry and entry[0] >= now:
+                self._memory[key] = (now + self._ttl, entry[1])
+                values[key] = entry[1]
+        return values
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now - self._last_sweep < settings.TOOL_STATE_SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        expired = [key for key, (expires_at, _) in self._memory.items() if expires_at < now]
+        for key in expired:
+            del self._memory[key]
+        if expired:
+            logger.debug("Swept %d expired conversation segments", len(expired))
+
+    def _use_redis(self) -> bool:
+        return self._use_redis_backend and redis_available()
+
+
+# Global instance
+conversation_log = ConversationLog(
+    ttl_seconds=settings.TOOL_STATE_TTL,
+    blob_threshold=settings.CONVERSATION_BLOB_THRESHOLD,
+    backend=settings.TOOL_STATE_BACKEND
+)
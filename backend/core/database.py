@@ -4,7 +4,7 @@ Database initialization and connection management
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Boolean, inspect, text
 from datetime import datetime
 import logging
 
@@ -72,6 +72,7 @@ class CodeContext(Base):
     id = Column(Integer, primary_key=True, index=True)
     context_id = Column(String(36), unique=True, index=True)
     workspace_path = Column(String(500), index=True)
+    workspace_id = Column(String(500), index=True, nullable=True)  # vector store workspace
     file_path = Column(String(500), index=True)
     content_hash = Column(String(64))
     symbols = Column(JSON)  # functions, classes, imports
@@ -80,11 +81,22 @@ class CodeContext(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+def _add_missing_columns(connection):
+    """create_all does not alter existing tables; add columns introduced since"""
+    columns = {column["name"] for column in inspect(connection).get_columns("code_context")}
+    if "workspace_id" not in columns:
+        connection.execute(text("ALTER TABLE code_context ADD COLUMN workspace_id VARCHAR(500)"))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_code_context_workspace_id ON code_context (workspace_id)"
+        ))
+
+
 async def init_db():
     """Initialize database tables"""
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_add_missing_columns)
         logger.info("✅ Database tables created/verified")
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {e}")
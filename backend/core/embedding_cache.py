@@ -0,0 +1,152 @@
+"""
+Content-addressed embedding cache with an in-memory LRU tier and a Redis tier
+"""
+
+from collections import OrderedDict
+from typing import Dict, List
+import hashlib
+import logging
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+from core.config import settings
+from core.redis_client import get_redis, redis_available, report_redis_failure
+
+logger = logging.getLogger(__name__)
+
+# Prometheus metrics (exported through the /metrics mount)
+CACHE_HITS = Counter(
+    "breezer_embedding_cache_hits_total",
+    "Embedding cache hits",
+    ["tier"]
+)
+CACHE_MISSES = Counter(
+    "breezer_embedding_cache_misses_total",
+    "Embedding cache misses (texts that had to be encoded)"
+)
+CACHE_EVICTIONS = Counter(
+    "breezer_embedding_cache_evictions_total",
+    "Entries evicted from the in-memory embedding LRU"
+)
+CACHE_ENTRIES = Gauge(
+    "breezer_embedding_cache_entries",
+    "Entries held in the in-memory embedding LRU"
+)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so whitespace-only differences share a cache entry"""
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def cache_key(model: str, text: str) -> str:
+    """Build cache key from model name and normalized text hash"""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"emb:{model}:{digest}"
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: bounded LRU in memory, Redis for persistence"""
+    
+    def __init__(self, max_entries: int = 20000, use_redis: bool = True, ttl: int = 0):
+        self.max_entries = max_entries
+        self.use_redis = use_redis
+        self.ttl = ttl
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up vectors for keys
+        
+        Args:
+            keys: Cache keys
+            
+        Returns:
+            Mapping of found keys to float32 vectors
+        """
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        
+        for key in keys:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                found[key] = vector
+            else:
+                missing.append(key)
+        
+        if found:
+            CACHE_HITS.labels(tier="memory").inc(len(found))
+        
+        if missing and self._redis_available():
+            try:
+                values = await get_redis().mget(missing)
+            except Exception as e:
+                report_redis_failure(e)
+                values = [None] * len(missing)
+            
+            redis_hits = 0
+            for key, value in zip(missing, values):
+                if value is None:
+                    continue
+                vector = np.frombuffer(value, dtype=np.float32)
+                found[key] = vector
+                self._remember(key, vector)
+                redis_hits += 1
+            
+            if redis_hits:
+                CACHE_HITS.labels(tier="redis").inc(redis_hits)
+        
+        misses = len(keys) - len(found)
+        if misses:
+            CACHE_MISSES.inc(misses)
+        
+        return found
+    
+    async def set_many(self, items: Dict[str, List[float]]):
+        """Store vectors in both tiers"""
+        if not items:
+            return
+        
+        vectors = {key: np.asarray(value, dtype=np.float32) for key, value in items.items()}
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+        
+        if self._redis_available():
+            try:
+                pipe = get_redis().pipeline(transaction=False)
+                for key, vector in vectors.items():
+                    pipe.set(key, vector.tobytes(), ex=self.ttl or None)
+                await pipe.execute()
+            except Exception as e:
+                report_redis_failure(e)
+    
+    def clear(self):
+        """Drop the in-memory tier"""
+        self._lru.clear()
+        CACHE_ENTRIES.set(0)
+    
+    def _redis_available(self) -> bool:
+        return self.use_redis and redis_available()
+    
+    def _remember(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        
+        evicted = 0
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            evicted += 1
+        
+        if evicted:
+            CACHE_EVICTIONS.inc(evicted)
+        CACHE_ENTRIES.set(len(self._lru))
+
+
+# Global cache instance
+embedding_cache = EmbeddingCache(
+    max_entries=settings.EMBEDDINGS_CACHE_SIZE,
+    use_redis=settings.EMBEDDINGS_CACHE_REDIS,
+    ttl=settings.EMBEDDINGS_CACHE_TTL
+)
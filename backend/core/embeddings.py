@@ -4,10 +4,14 @@ Embeddings initialization with GPU support
 
 import torch
 from sentence_transformers import SentenceTransformer
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import logging
+import time
 
 from core.config import settings
+from core.embedding_cache import embedding_cache, cache_key, normalize_text
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +19,138 @@ logger = logging.getLogger(__name__)
 _embeddings_model: Optional[SentenceTransformer] = None
 
 
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into micro-batches.
+
+    Callers enqueue texts and await a future; a single worker task drains the
+    queue into batches of up to ``max_batch_size`` texts (waiting at most
+    ``max_wait_ms`` for a batch to fill) and runs ``encode`` on a dedicated
+    thread so the event loop is never blocked by the model.
+    """
+
+    def __init__(
+        self,
+        model: SentenceTransformer,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0
+    ):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stopped = False
+        # One thread: encode calls are serialized, the model is not re-entrant
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embeddings")
+
+    def start(self):
+        """Start the batching worker on the running event loop"""
+        if self._worker and not self._worker.done():
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run(), name="embedding-batcher")
+
+    async def stop(self):
+        """
+        Stop the worker and release the encode thread
+
+        Requests still queued or in the unfinished batch fail with
+        RuntimeError; the batcher cannot be used afterwards.
+        """
+        self._stopped = True
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._queue:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                self._fail([future])
+        self._executor.shutdown(wait=False)
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Queue texts for the next batch and wait for their vectors"""
+        if self._stopped:
+            raise RuntimeError("Embedding batcher is stopped")
+        if not texts:
+            return []
+        if not self._worker or self._worker.done():
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _run(self):
+        pending: List[Tuple[List[str], asyncio.Future]] = []
+        try:
+            while True:
+                pending = [await self._queue.get()]
+                size = len(pending[0][0])
+                deadline = time.monotonic() + self.max_wait
+
+                # Fill the batch until it is full or the wait window closes
+                while size < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    pending.append(item)
+                    size += len(item[0])
+
+                await self._encode_batch(pending)
+                pending = []
+        except asyncio.CancelledError:
+            # Stopped while filling or encoding a batch: its callers must not hang
+            self._fail([future for _, future in pending])
+            raise
+
+    def _fail(self, futures: List[asyncio.Future]):
+        for future in futures:
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher stopped"))
+
+    async def _encode_batch(self, pending: List[Tuple[List[str], asyncio.Future]]):
+        texts = [text for item_texts, _ in pending for text in item_texts]
+        loop = asyncio.get_running_loop()
+
+        try:
+            embeddings = await loop.run_in_executor(self._executor, self._encode, texts)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for item_texts, future in pending:
+            count = len(item_texts)
+            if not future.done():
+                future.set_result(embeddings[offset:offset + count])
+            offset += count
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.max_batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        return embeddings.tolist()
+
+
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+
+
 async def init_embeddings():
     """Initialize embeddings model"""
-    global _embeddings_model
+    global _embeddings_model, _embedding_batcher
     
     if settings.EMBEDDINGS_PROVIDER != "local":
         logger.info("Using cloud embeddings provider")
@@ -44,6 +177,13 @@ async def init_embeddings():
         # Warmup
         _ = _embeddings_model.encode(["warmup"], show_progress_bar=False)
         
+        _embedding_batcher = EmbeddingBatcher(
+            _embeddings_model,
+            max_batch_size=settings.EMBEDDINGS_MAX_BATCH_SIZE,
+            max_wait_ms=settings.EMBEDDINGS_MAX_WAIT_MS
+        )
+        _embedding_batcher.start()
+        
         logger.info(f"✅ Embeddings model loaded: {settings.EMBEDDINGS_MODEL}")
         
     except Exception as e:
@@ -52,6 +192,15 @@ async def init_embeddings():
         settings.EMBEDDINGS_PROVIDER = "openai"
 
 
+async def shutdown_embeddings():
+    """Stop the embedding batcher"""
+    global _embedding_batcher
+    
+    if _embedding_batcher:
+        await _embedding_batcher.stop()
+        _embedding_batcher = None
+
+
 def get_embeddings_model() -> Optional[SentenceTransformer]:
     """Get embeddings model instance"""
     return _embeddings_model
@@ -61,21 +210,46 @@ async def embed_texts(texts: List[str]) -> List[List[float]]:
     """
     Generate embeddings for texts
     
+    Texts are looked up in the embedding cache first (keyed by model name
+    and normalized text hash); only misses are encoded.
+    
     Args:
         texts: List of text strings
         
     Returns:
         List of embedding vectors
     """
-    if settings.EMBEDDINGS_PROVIDER == "local" and _embeddings_model:
-        # Use local GPU model
-        embeddings = _embeddings_model.encode(
-            texts,
-            batch_size=32,
-            show_progress_bar=False,
-            convert_to_numpy=True
-        )
-        return embeddings.tolist()
+    if not texts:
+        return []
+    
+    if not settings.EMBEDDINGS_CACHE_ENABLED:
+        return await _compute_embeddings(texts)
+    
+    model = get_embeddings_model_name()
+    keys = [cache_key(model, text) for text in texts]
+    cached = await embedding_cache.get_many(list(dict.fromkeys(keys)))
+    
+    # Encode each distinct missing text once
+    missing: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = normalize_text(text)
+    
+    vectors: Dict[str, List[float]] = {key: vector.tolist() for key, vector in cached.items()}
+    if missing:
+        computed = await _compute_embeddings(list(missing.values()))
+        fresh = dict(zip(missing.keys(), computed))
+        await embedding_cache.set_many(fresh)
+        vectors.update(fresh)
+    
+    return [vectors[key] for key in keys]
+
+
+async def _compute_embeddings(texts: List[str]) -> List[List[float]]:
+    """Encode texts with the configured provider (no caching)"""
+    if settings.EMBEDDINGS_PROVIDER == "local" and _embedding_batcher:
+        # Use local GPU model, micro-batched off the event loop
+        return await _embedding_batcher.embed(texts)
     
     elif settings.EMBEDDINGS_PROVIDER == "openai":
         # Use OpenAI embeddings API
@@ -93,6 +267,13 @@ async def embed_texts(texts: List[str]) -> List[List[float]]:
         raise ValueError(f"Unknown embeddings provider: {settings.EMBEDDINGS_PROVIDER}")
 
 
+def get_embeddings_model_name() -> str:
+    """Get name of the model that produces embeddings for the active provider"""
+    if settings.EMBEDDINGS_PROVIDER == "openai":
+        return settings.OPENAI_EMBEDDING_MODEL
+    return settings.EMBEDDINGS_MODEL
+
+
 async def embed_text(text: str) -> List[float]:
     """
     Generate embedding for single text
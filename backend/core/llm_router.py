@@ -3,14 +3,33 @@ LLM Router for multi-provider support with fallback
 """
 
 import litellm
-from typing import List, Dict, Any, Optional, AsyncIterator
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+import asyncio
 import logging
+import time
 from enum import Enum
 
+from prometheus_client import Counter
+
+from core.admission import admission
+from core.circuit_breaker import CircuitBreaker, CircuitOpenError, circuit_breakers, is_provider_failure
 from core.config import settings
+from core.response_cache import response_cache
 
 logger = logging.getLogger(__name__)
 
+HEDGE_EVENTS = Counter(
+    "breezer_llm_hedge_total",
+    "Hedged LLM requests by outcome",
+    ["agent", "outcome"]  # outcome: fired, primary_won, hedge_won, failed
+)
+
+PROMPT_TOKENS = Counter(
+    "breezer_llm_prompt_tokens_total",
+    "Prompt tokens sent to providers, by whether the provider served them from its prompt cache",
+    ["agent", "model", "cache"]  # cache: hit, miss
+)
+
 # Configure LiteLLM
 litellm.telemetry = False  # Disable telemetry
 litellm.set_verbose = settings.DEBUG
@@ -85,50 +104,262 @@ class LLMRouter:
         model = override_model or self.model_map.get(agent_type, settings.MODEL_FALLBACK)
         max_tokens = max_tokens or settings.MAX_OUTPUT_TOKENS
         
-        try:
-            logger.info(f"🤖 {agent_type.value} using model: {model}")
+        cacheable = settings.CACHE_ENABLED and not stream
+        cache_args = dict(
+            agent=agent_type.value,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            tools=kwargs.get("tools"),
+            tool_choice=kwargs.get("tool_choice")
+        )
+        if cacheable:
+            cached = await response_cache.get(**cache_args)
+            if cached is not None:
+                logger.info(f"💾 {agent_type.value} served from response cache")
+                return cached
+        
+        candidates = [model]
+        if model != settings.MODEL_FALLBACK:
+            candidates.append(settings.MODEL_FALLBACK)
+        
+        first_error: Optional[Exception] = None
+        for candidate in candidates:
+            breaker = circuit_breakers.get(candidate) if settings.LLM_BREAKER_ENABLED else None
+            if breaker and not await breaker.allow():
+                logger.warning(f"⚡ Skipping {candidate}: circuit open")
+                continue
             
-            # Use custom base URL for Llamafile
-            completion_kwargs = kwargs.copy()
-            if "llamafile" in model.lower() and self.llamafile_base_url:
-                completion_kwargs["api_base"] = self.llamafile_base_url
+            if candidate != model:
+                logger.warning(f"Retrying with fallback model: {candidate}")
             
-            response = await litellm.acompletion(
-                model=model,
+            call_kwargs = dict(
                 messages=messages,
                 temperature=temperature,
                 max_tokens=max_tokens,
                 stream=stream,
-                **completion_kwargs
+                **kwargs
             )
+            hedge_model = self._hedge_model(agent_type, candidate)
             
-            return response
+            try:
+                logger.info(f"🤖 {agent_type.value} using model: {candidate}")
+                if hedge_model:
+                    response, answered_by = await self._hedged_call(
+                        agent_type, candidate, breaker, hedge_model, **call_kwargs
+                    )
+                else:
+                    response = await self._call_model(candidate, breaker, **call_kwargs)
+                    answered_by = candidate
+            except Exception as e:
+                logger.error(f"❌ Model {candidate} failed: {e}")
+                first_error = first_error or e
+                continue
             
+            if not stream:
+                _record_prompt_usage(agent_type, answered_by, response)
+            
+            # Fallback answers are not cached under the primary model's key
+            if cacheable and answered_by == model:
+                await response_cache.set(response=response, **cache_args)
+            
+            return response
+        
+        if first_error:
+            raise first_error
+        raise CircuitOpenError(f"No available model for {agent_type.value}: circuits open for {', '.join(candidates)}")
+    
+    async def _call_model(
+        self,
+        model: str,
+        breaker: Optional[CircuitBreaker],
+        **kwargs
+    ) -> Any:
+        """
+        Call one model, recording outcome and latency on its breaker
+        (only the latency of successful calls when LLM_BREAKER_ENABLED is off)
+        
+        Holds one of the model's concurrency slots for the whole call; for
+        streams the slot is returned when the stream is closed.
+        """
+        # Use custom base URL for Llamafile
+        if "llamafile" in model.lower() and self.llamafile_base_url:
+            kwargs["api_base"] = self.llamafile_base_url
+        
+        limiter = admission.get(model)
+        try:
+            acquired = await limiter.acquire()
+        except asyncio.CancelledError:
+            if breaker:
+                breaker.release()
+            raise
+        
+        started = time.monotonic()
+        try:
+            response = await litellm.acompletion(model=model, **kwargs)
+        except asyncio.CancelledError:
+            limiter.release(acquired)
+            if breaker:
+                breaker.release()
+            raise
         except Exception as e:
-            logger.error(f"❌ Model {model} failed: {e}")
+            limiter.release(acquired)
+            if breaker:
+                breaker.record(is_provider_failure(e), time.monotonic() - started)
+            raise
+        
+        if breaker:
+            breaker.record(False, time.monotonic() - started)
+        else:
+            # Hedge deadlines use these latencies even when breaking is disabled
+            circuit_breakers.get(model).record_latency(time.monotonic() - started)
+        
+        if kwargs.get("stream"):
+            return _SlotStream(response, lambda: limiter.release(acquired))
+        limiter.release(acquired)
+        return response
+    
+    def _hedge_model(self, agent_type: AgentType, model: str) -> Optional[str]:
+        """Alternate model to hedge with, if hedging applies to this call"""
+        if agent_type.value not in settings.LLM_HEDGE_AGENTS:
+            return None
+        hedge_model = settings.LLM_HEDGE_MODEL or settings.MODEL_FALLBACK
+        return hedge_model if hedge_model != model else None
+    
+    def _hedge_delay(self, model: str) -> float:
+        """Deadline before hedging, from the model's recent latency percentile"""
+        observed = circuit_breakers.get(model).latency_percentile(settings.LLM_HEDGE_PERCENTILE)
+        if observed is None:
+            return settings.LLM_HEDGE_DEFAULT_DELAY
+        return max(settings.LLM_HEDGE_MIN_DELAY, observed)
+    
+    async def _hedged_call(
+        self,
+        agent_type: AgentType,
+        model: str,
+        breaker: Optional[CircuitBreaker],
+        hedge_model: str,
+        **kwargs
+    ) -> Tuple[Any, str]:
+        """
+        Race the primary against a hedge fired after the latency deadline
+        
+        Returns:
+            (response, model that produced it); the losing request is cancelled
+        """
+        agent = agent_type.value
+        primary = asyncio.create_task(self._first_response(model, breaker, **kwargs))
+        tasks = {primary: model}
+        
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay(model))
+            if done:
+                return primary.result(), model
             
-            # Try fallback model
-            if model != settings.MODEL_FALLBACK:
-                logger.warning(f"Retrying with fallback model: {settings.MODEL_FALLBACK}")
-                try:
-                    # Use custom base URL for fallback if it's Llamafile
-                    fallback_kwargs = kwargs.copy()
-                    if "llamafile" in settings.MODEL_FALLBACK.lower() and self.llamafile_base_url:
-                        fallback_kwargs["api_base"] = self.llamafile_base_url
-                    
-                    response = await litellm.acompletion(
-                        model=settings.MODEL_FALLBACK,
-                        messages=messages,
-                        temperature=temperature,
-                        max_tokens=max_tokens,
-                        stream=stream,
-                        **fallback_kwargs
-                    )
-                    return response
-                except Exception as fallback_error:
-                    logger.error(f"❌ Fallback model also failed: {fallback_error}")
+            hedge_breaker = circuit_breakers.get(hedge_model) if settings.LLM_BREAKER_ENABLED else None
+            if hedge_breaker and not await hedge_breaker.allow():
+                return await primary, model
+            
+            logger.info(f"🏁 {agent}: {model} slow, hedging with {hedge_model}")
+            HEDGE_EVENTS.labels(agent=agent, outcome="fired").inc()
+            hedge = asyncio.create_task(self._first_response(hedge_model, hedge_breaker, **kwargs))
+            tasks[hedge] = hedge_model
             
+            pending = set(tasks)
+            first_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        outcome = "hedge_won" if task is hedge else "primary_won"
+                        HEDGE_EVENTS.labels(agent=agent, outcome=outcome).inc()
+                        return task.result(), tasks[task]
+                    first_error = first_error or task.exception()
+            
+            HEDGE_EVENTS.labels(agent=agent, outcome="failed").inc()
+            raise first_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def _first_response(
+        self,
+        model: str,
+        breaker: Optional[CircuitBreaker],
+        **kwargs
+    ) -> Any:
+        """Call a model; for streams, wait until the first chunk has arrived"""
+        response = await self._call_model(model, breaker, **kwargs)
+        if not kwargs.get("stream"):
+            return response
+        
+        try:
+            first = await response.__anext__()
+        except StopAsyncIteration:
+            return _replay_stream(None, response)
+        except BaseException:
+            # Includes cancellation of the losing request
+            await _close_stream(response)
             raise
+        return _replay_stream(first, response)
+    
+    async def health(self) -> Dict[str, Any]:
+        """Circuit breaker state per model"""
+        return await circuit_breakers.snapshot()
+    
+    def check_admission(self, agent_types: List[AgentType]):
+        """
+        Pre-flight admission check for the models these agents will call
+        
+        Raises:
+            AdmissionRejected: When the projected queue wait is over budget
+        """
+        admission.check(list({self.get_model(agent_type) for agent_type in agent_types}))
+    
+    async def stream_chunks(
+        self,
+        messages: List[Dict[str, Any]],
+        agent_type: AgentType,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> AsyncIterator[Any]:
+        """
+        Stream raw completion chunks
+        
+        The provider stream is closed when the consumer stops iterating
+        (including cancellation on client disconnect), so generation is
+        not left running upstream.
+        
+        Args:
+            messages: List of message dicts
+            agent_type: Type of agent
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            **kwargs: Additional arguments
+            
+        Yields:
+            Streaming chunks (OpenAI delta format)
+        """
+        response = await self.complete(
+            messages=messages,
+            agent_type=agent_type,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **kwargs
+        )
+        
+        model = kwargs.get("override_model") or self.get_model(agent_type)
+        try:
+            async for chunk in response:
+                if getattr(chunk, "usage", None):
+                    _record_prompt_usage(agent_type, model, chunk)
+                yield chunk
+        finally:
+            await _close_stream(response)
     
     async def stream_complete(
         self,
@@ -151,17 +382,14 @@ class LLMRouter:
         Yields:
             Content chunks
         """
-        response = await self.complete(
+        async for chunk in self.stream_chunks(
             messages=messages,
             agent_type=agent_type,
             temperature=temperature,
             max_tokens=max_tokens,
-            stream=True,
             **kwargs
-        )
-        
-        async for chunk in response:
-            if chunk.choices[0].delta.content:
+        ):
+            if chunk.choices and chunk.choices[0].delta.content:
                 yield chunk.choices[0].delta.content
     
     def get_model(self, agent_type: AgentType) -> str:
@@ -195,6 +423,99 @@ class LLMRouter:
             return 0.0
 
 
+def prompt_cache_usage(response: Any) -> Dict[str, int]:
+    """
+    Prompt tokens and provider-cached prompt tokens reported for a completion
+    
+    Understands OpenAI-style ``prompt_tokens_details.cached_tokens`` (also
+    sent by recent llama.cpp/llamafile servers) and DeepSeek's
+    ``prompt_cache_hit_tokens``.
+    
+    Returns:
+        {"prompt_tokens", "cached_prompt_tokens"}, or {} without usage
+    """
+    usage = getattr(response, "usage", None)
+    if not usage:
+        return {}
+    
+    def field(source: Any, name: str) -> Any:
+        if isinstance(source, dict):
+            return source.get(name)
+        return getattr(source, name, None)
+    
+    cached = field(usage, "prompt_cache_hit_tokens")
+    if cached is None:
+        details = field(usage, "prompt_tokens_details")
+        cached = field(details, "cached_tokens") if details else None
+    
+    return {
+        "prompt_tokens": int(field(usage, "prompt_tokens") or 0),
+        "cached_prompt_tokens": int(cached or 0)
+    }
+
+
+def _record_prompt_usage(agent_type: AgentType, model: str, response: Any):
+    usage = prompt_cache_usage(response)
+    if not usage:
+        return
+    cached = min(usage["cached_prompt_tokens"], usage["prompt_tokens"])
+    PROMPT_TOKENS.labels(agent=agent_type.value, model=model, cache="hit").inc(cached)
+    PROMPT_TOKENS.labels(agent=agent_type.value, model=model, cache="miss").inc(usage["prompt_tokens"] - cached)
+
+
+async def _close_stream(response: Any):
+    """Close a litellm stream and its underlying HTTP response"""
+    for target in (response, getattr(response, "completion_stream", None)):
+        close = getattr(target, "aclose", None)
+        if close is None:
+            continue
+        try:
+            await close()
+        except Exception as e:
+            logger.debug(f"Closing stream failed: {e}")
+        return
+
+
+class _SlotStream:
+    """Provider stream that returns its concurrency slot once closed or exhausted"""
+    
+    def __init__(self, response: Any, on_close):
+        self._response = response
+        self._on_close = on_close
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> Any:
+        try:
+            return await self._response.__anext__()
+        except StopAsyncIteration:
+            self._finish()
+            raise
+    
+    async def aclose(self):
+        try:
+            await _close_stream(self._response)
+        finally:
+            self._finish()
+    
+    def _finish(self):
+        if self._on_close is not None:
+            on_close, self._on_close = self._on_close, None
+            on_close()
+
+
+async def _replay_stream(first: Any, response: Any) -> AsyncIterator[Any]:
+    """Re-attach an already consumed first chunk to the rest of a stream"""
+    try:
+        if first is not None:
+            yield first
+        async for chunk in response:
+            yield chunk
+    finally:
+        await _close_stream(response)
+
+
 # Global router instance
 llm_router = LLMRouter()
 
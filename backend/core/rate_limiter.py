@@ -0,0 +1,92 @@
+"""
+Per-client API rate limiting
+
+Fixed window of RATE_LIMIT_PERIOD seconds allowing RATE_LIMIT_REQUESTS per
+client, counted in Redis so the limit holds across API workers. While Redis
+is unavailable each worker counts locally.
+"""
+
+from typing import Dict, Tuple
+import logging
+import time
+
+from fastapi import HTTPException, Request
+
+from core.config import settings
+from core.redis_client import get_redis, redis_available, report_redis_failure
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Fixed-window request counter per client"""
+    
+    def __init__(self, limit: int, period: int):
+        self.limit = limit
+        self.period = period
+        self._local: Dict[str, Tuple[int, int]] = {}  # client -> (window, count)
+    
+    async def hit(self, client: str) -> Tuple[bool, int]:
+        """
+        Count one request for a client
+        
+        Args:
+            client: Client identifier
+        
+        Returns:
+            (allowed, seconds until the current window resets)
+        """
+        now = time.time()
+        window = int(now // self.period)
+        reset_in = max(1, int((window + 1) * self.period - now))
+        
+        count = None
+        if redis_available():
+            key = f"breezer:ratelimit:{client}:{window}"
+            try:
+                redis = get_redis()
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.incr(key)
+                    pipe.expire(key, self.period + 1)
+                    count, _ = await pipe.execute()
+            except Exception as e:
+                report_redis_failure(e)
+        
+        if count is None:
+            count = self._hit_local(client, window)
+        
+        return count <= self.limit, reset_in
+    
+    def _hit_local(self, client: str, window: int) -> int:
+        current, count = self._local.get(client, (window, 0))
+        count = count + 1 if current == window else 1
+        self._local[client] = (window, count)
+        
+        # Drop counters from past windows
+        if len(self._local) > 10000:
+            self._local = {c: v for c, v in self._local.items() if v[0] == window}
+        return count
+
+
+# Global rate limiter
+rate_limiter = RateLimiter(settings.RATE_LIMIT_REQUESTS, settings.RATE_LIMIT_PERIOD)
+
+
+async def rate_limit(request: Request):
+    """
+    Router dependency enforcing the per-client rate limit
+    
+    Raises:
+        HTTPException: 429 with Retry-After once the client is over the limit
+    """
+    if settings.RATE_LIMIT_REQUESTS <= 0:
+        return
+    
+    client = request.client.host if request.client else "unknown"
+    allowed, reset_in = await rate_limiter.hit(client)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(reset_in)}
+        )
@@ -0,0 +1,61 @@
+"""
+Shared Redis connection
+"""
+
+from typing import Optional
+import logging
+import time
+
+import redis.asyncio as aioredis
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Global client (one connection pool per worker process)
+_redis_client: Optional[aioredis.Redis] = None
+
+# Seconds to skip optional Redis use after a failure, so an outage does not
+# add a connect timeout to every request
+RETRY_INTERVAL = 30
+_retry_at = 0.0
+
+
+def get_redis() -> aioredis.Redis:
+    """Get Redis client instance, creating it on first use"""
+    global _redis_client
+    
+    if _redis_client is None:
+        _redis_client = aioredis.from_url(
+            settings.redis_url,
+            decode_responses=False,
+            socket_connect_timeout=2,
+            socket_timeout=2
+        )
+    return _redis_client
+
+
+def redis_available() -> bool:
+    """Whether optional Redis features (caches, shared state) should try Redis"""
+    return time.monotonic() >= _retry_at
+
+
+def report_redis_failure(error: Exception):
+    """Back off optional Redis use after an error"""
+    global _retry_at
+    
+    if redis_available():
+        logger.warning(f"Redis unavailable, retrying in {RETRY_INTERVAL}s: {error}")
+    _retry_at = time.monotonic() + RETRY_INTERVAL
+
+
+async def close_redis():
+    """Close Redis connection pool"""
+    global _redis_client
+    
+    if _redis_client is not None:
+        try:
+            await _redis_client.close()
+        except Exception as e:
+            logger.warning(f"Redis close failed: {e}")
+        _redis_client = None
@@ -0,0 +1,239 @@
+"""
+Response cache for LLM completions
+
+Exact tier: keyed by (model, normalized messages, temperature, max tokens,
+tools). Semantic tier: for low-temperature agents, serves a cached response
+when a new prompt embeds within a cosine-similarity threshold of a cached
+one with the same model and system prompt.
+"""
+
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import time
+
+import numpy as np
+from prometheus_client import Counter
+
+from core.config import settings
+from core.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Set per request (X-Breezer-Cache: bypass / Cache-Control: no-cache)
+cache_bypass: ContextVar[bool] = ContextVar("cache_bypass", default=False)
+
+CACHE_REQUESTS = Counter(
+    "breezer_llm_cache_requests_total",
+    "LLM response cache lookups by outcome",
+    ["agent", "result"]  # result: hit_exact, hit_semantic, miss, bypass
+)
+
+
+class _SemanticEntry:
+    __slots__ = ("vector", "key", "expires_at")
+    
+    def __init__(self, vector: np.ndarray, key: str, expires_at: float):
+        self.vector = vector
+        self.key = key
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """In-process LLM response cache with TTL, size bounds and a semantic tier"""
+    
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: int = 3600,
+        semantic_max_entries: int = 500
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_max_entries = semantic_max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._semantic: Dict[str, List[_SemanticEntry]] = {}
+    
+    async def get(
+        self,
+        agent: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Any = None
+    ) -> Optional[Any]:
+        """
+        Look up a cached response
+        
+        Returns:
+            Cached completion response or None
+        """
+        if cache_bypass.get():
+            CACHE_REQUESTS.labels(agent=agent, result="bypass").inc()
+            return None
+        
+        key = self._key(model, messages, temperature, max_tokens, tools, tool_choice)
+        response = self._get_exact(key)
+        if response is not None:
+            CACHE_REQUESTS.labels(agent=agent, result="hit_exact").inc()
+            return response
+        
+        if self._semantic_eligible(agent, temperature, tools):
+            response = await self._get_semantic(agent, model, messages)
+            if response is not None:
+                CACHE_REQUESTS.labels(agent=agent, result="hit_semantic").inc()
+                return response
+        
+        CACHE_REQUESTS.labels(agent=agent, result="miss").inc()
+        return None
+    
+    async def set(
+        self,
+        agent: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        temperature: float,
+        max_tokens: Optional[int],
+        response: Any,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Any = None
+    ):
+        """Store a completion response"""
+        if cache_bypass.get():
+            return
+        
+        key = self._key(model, messages, temperature, max_tokens, tools, tool_choice)
+        expires_at = time.monotonic() + self.ttl
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        
+        if self._semantic_eligible(agent, temperature, tools):
+            try:
+                vector = await self._embed_prompt(messages)
+            except Exception as e:
+                logger.warning(f"Semantic cache embedding failed: {e}")
+                return
+            bucket = self._semantic.setdefault(self._bucket(agent, model, messages), [])
+            bucket.append(_SemanticEntry(vector, key, expires_at))
+            if len(bucket) > self.semantic_max_entries:
+                del bucket[:len(bucket) - self.semantic_max_entries]
+    
+    def clear(self):
+        self._entries.clear()
+        self._semantic.clear()
+    
+    def _get_exact(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return response
+    
+    async def _get_semantic(
+        self,
+        agent: str,
+        model: str,
+        messages: List[Dict[str, Any]]
+    ) -> Optional[Any]:
+        bucket_key = self._bucket(agent, model, messages)
+        bucket = self._semantic.get(bucket_key)
+        if not bucket:
+            return None
+        
+        now = time.monotonic()
+        bucket[:] = [entry for entry in bucket if entry.expires_at >= now and entry.key in self._entries]
+        if not bucket:
+            return None
+        
+        try:
+            query = await self._embed_prompt(messages)
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {e}")
+            return None
+        
+        scores = np.stack([entry.vector for entry in bucket]) @ query
+        best = int(np.argmax(scores))
+        if scores[best] < settings.CACHE_SEMANTIC_THRESHOLD:
+            return None
+        return self._get_exact(bucket[best].key)
+    
+    def _semantic_eligible(self, agent: str, temperature: float, tools: Any) -> bool:
+        return (
+            settings.CACHE_SEMANTIC_ENABLED
+            and not tools
+            and agent in settings.CACHE_SEMANTIC_AGENTS
+            and temperature <= settings.CACHE_SEMANTIC_MAX_TEMPERATURE
+        )
+    
+    async def _embed_prompt(self, messages: List[Dict[str, Any]]) -> np.ndarray:
+        # Imported lazily: embeddings pull in the model stack
+        from core.embeddings import embed_text
+        
+        text = "\n\n".join(
+            str(message.get("content") or "")
+            for message in messages
+            if message.get("role") != "system"
+        )
+        vector = np.asarray(await embed_text(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def _bucket(self, agent: str, model: str, messages: List[Dict[str, Any]]) -> str:
+        # Near-duplicate prompts are only comparable under the same system prompt
+        system = "".join(
+            str(message.get("content") or "")
+            for message in messages
+            if message.get("role") == "system"
+        )
+        digest = hashlib.sha256(system.encode("utf-8")).hexdigest()[:16]
+        return f"{agent}:{model}:{digest}"
+    
+    def _key(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Any,
+        tool_choice: Any
+    ) -> str:
+        normalized = [
+            {
+                key: normalize_text(value) if key == "content" and isinstance(value, str) else value
+                for key, value in message.items()
+                if key in ("role", "content", "name", "tool_call_id", "tool_calls")
+            }
+            for message in messages
+        ]
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": normalized,
+                "temperature": round(float(temperature), 3),
+                "max_tokens": max_tokens,
+                "tools": tools,
+                "tool_choice": tool_choice
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Global cache instance
+response_cache = ResponseCache(
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    ttl=settings.CACHE_TTL,
+    semantic_max_entries=settings.CACHE_SEMANTIC_MAX_ENTRIES
+)
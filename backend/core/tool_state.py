@@ -1,68 +1,250 @@
-"""In-memory manager for pending tool-call conversations."""
+"""Storage for pending tool-call conversations.
+
+A conversation waiting on tool output is stored under its request ID
+between ``/query`` and ``/tool-result``. Two backends are available:
+
+* ``redis``: shared by all API workers, expiry through native key TTLs,
+  states stored as msgpack + zstd (JSON/zlib when those are not installed).
+* ``memory``: single-process deployments; sharded locks and a background
+  sweeper that drops expired entries.
+
+If Redis fails the manager falls back to the in-memory backend.
+"""
 
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, Optional
-from datetime import datetime, timedelta
+import json
+import logging
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.redis_client import get_redis, redis_available, report_redis_failure
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Encoding header byte: (serializer, compressor)
+_MSGPACK_ZSTD = 1
+_MSGPACK_ZLIB = 2
+_JSON_ZSTD = 3
+_JSON_ZLIB = 4
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    """Serialize and compress a conversation state."""
+    if msgpack:
+        payload = msgpack.packb(state, use_bin_type=True, default=str)
+    else:
+        payload = json.dumps(state, separators=(",", ":"), default=str).encode("utf-8")
+
+    if _zstd_compressor:
+        header = _MSGPACK_ZSTD if msgpack else _JSON_ZSTD
+        return bytes([header]) + _zstd_compressor.compress(payload)
+
+    header = _MSGPACK_ZLIB if msgpack else _JSON_ZLIB
+    return bytes([header]) + zlib.compress(payload, 6)
+
+
+def decode_state(data: bytes) -> Dict[str, Any]:
+    """Inverse of encode_state."""
+    header, body = data[0], data[1:]
+
+    if header in (_MSGPACK_ZSTD, _JSON_ZSTD):
+        if not _zstd_decompressor:
+            raise ValueError("zstandard is required to decode this tool state")
+        payload = _zstd_decompressor.decompress(body)
+    else:
+        payload = zlib.decompress(body)
+
+    if header in (_MSGPACK_ZSTD, _MSGPACK_ZLIB):
+        if not msgpack:
+            raise ValueError("msgpack is required to decode this tool state")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+class MemoryToolStateBackend:
+    """Process-local states in lock-sharded dicts, swept in the background."""
+
+    def __init__(self, ttl_seconds: int, shards: int = 16) -> None:
+        self._ttl = ttl_seconds
+        self._shards: List[Dict[str, Tuple[float, Dict[str, Any]]]] = [{} for _ in range(shards)]
+        self._locks = [asyncio.Lock() for _ in range(shards)]
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _shard(self, request_id: str) -> int:
+        return hash(request_id) % len(self._shards)
+
+    async def set(self, request_id: str, state: Dict[str, Any]) -> None:
+        index = self._shard(request_id)
+        async with self._locks[index]:
+            self._shards[index][request_id] = (time.monotonic() + self._ttl, state)
+
+    async def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        index = self._shard(request_id)
+        async with self._locks[index]:
+            entry = self._shards[index].get(request_id)
+            if not entry:
+                return None
+            if entry[0] < time.monotonic():
+                del self._shards[index][request_id]
+                return None
+            return entry[1]
+
+    async def pop(self, request_id: str) -> Optional[Dict[str, Any]]:
+        index = self._shard(request_id)
+        async with self._locks[index]:
+            entry = self._shards[index].pop(request_id, None)
+        if not entry or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    async def delete(self, request_id: str) -> None:
+        index = self._shard(request_id)
+        async with self._locks[index]:
+            self._shards[index].pop(request_id, None)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def start(self, interval: float) -> None:
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop(interval))
+
+    async def stop(self) -> None:
+        if self._sweeper:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def sweep(self) -> int:
+        """Drop expired entries; returns how many were removed."""
+        removed = 0
+        now = time.monotonic()
+        for index, shard in enumerate(self._shards):
+            async with self._locks[index]:
+                expired = [key for key, (expires_at, _) in shard.items() if expires_at < now]
+                for key in expired:
+                    del shard[key]
+                removed += len(expired)
+        return removed
+
+    async def _sweep_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            removed = await self.sweep()
+            if removed:
+                logger.debug("Swept %d expired tool states", removed)
+
+
+class RedisToolStateBackend:
+    """States shared across workers as compact values with native TTLs."""
+
+    KEY_PREFIX = "breezer:tool_state:"
+
+    def __init__(self, ttl_seconds: int) -> None:
+        self._ttl = ttl_seconds
+
+    async def set(self, request_id: str, state: Dict[str, Any]) -> None:
+        await get_redis().set(self.KEY_PREFIX + request_id, encode_state(state), ex=self._ttl)
+
+    async def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        data = await get_redis().get(self.KEY_PREFIX + request_id)
+        return decode_state(data) if data else None
+
+    async def pop(self, request_id: str) -> Optional[Dict[str, Any]]:
+        # GETDEL needs Redis 6.2; a transaction works everywhere
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.get(self.KEY_PREFIX + request_id)
+            pipe.delete(self.KEY_PREFIX + request_id)
+            data, _ = await pipe.execute()
+        return decode_state(data) if data else None
+
+    async def delete(self, request_id: str) -> None:
+        await get_redis().delete(self.KEY_PREFIX + request_id)
 
 
 class ToolStateManager:
     """Tracks pending tool-call conversations keyed by request ID."""
 
-    def __init__(self, ttl_seconds: int = 600) -> None:
-        self._lock = asyncio.Lock()
-        self._state: Dict[str, Dict[str, Any]] = {}
-        self._ttl = timedelta(seconds=ttl_seconds)
+    def __init__(self, ttl_seconds: int = 600, backend: str = "memory") -> None:
+        self._ttl = ttl_seconds
+        self._memory = MemoryToolStateBackend(ttl_seconds)
+        self._redis = RedisToolStateBackend(ttl_seconds) if backend == "redis" else None
+
+    async def start(self) -> None:
+        self._memory.start(settings.TOOL_STATE_SWEEP_INTERVAL)
+
+    async def stop(self) -> None:
+        await self._memory.stop()
 
     async def set_state(self, request_id: str, state: Dict[str, Any]) -> None:
-        async with self._lock:
-            if not state:
-                self._state.pop(request_id, None)
+        if not state:
+            await self.clear_state(request_id)
+            return
+        state["updated_at"] = datetime.utcnow().isoformat()
+
+        if self._use_redis():
+            try:
+                await self._redis.set(request_id, state)
                 return
-            state["updated_at"] = datetime.utcnow().isoformat()
-            self._state[request_id] = state
+            except Exception as exc:
+                report_redis_failure(exc)
+        await self._memory.set(request_id, state)
 
     async def get_state(self, request_id: str) -> Optional[Dict[str, Any]]:
-        async with self._lock:
-            state = self._state.get(request_id)
-            if not state:
-                return None
-
-            if self._is_expired(state):
-                self._state.pop(request_id, None)
-                return None
-
-            return state
+        if self._use_redis():
+            try:
+                state = await self._redis.get(request_id)
+                if state:
+                    return state
+            except Exception as exc:
+                report_redis_failure(exc)
+        return await self._memory.get(request_id)
 
     async def pop_state(self, request_id: str) -> Optional[Dict[str, Any]]:
-        async with self._lock:
-            state = self._state.pop(request_id, None)
-            if not state:
-                return None
-
-            if self._is_expired(state):
-                return None
-
-            return state
+        if self._use_redis():
+            try:
+                state = await self._redis.pop(request_id)
+                if state:
+                    return state
+            except Exception as exc:
+                report_redis_failure(exc)
+        return await self._memory.pop(request_id)
 
     async def clear_state(self, request_id: str) -> None:
-        async with self._lock:
-            if request_id in self._state:
-                del self._state[request_id]
-
-    def _is_expired(self, state: Dict[str, Any]) -> bool:
-        timestamp = state.get("updated_at")
-        if not timestamp:
-            return False
-
-        try:
-            updated_at = datetime.fromisoformat(timestamp)
-        except (TypeError, ValueError):
-            return False
+        if self._use_redis():
+            try:
+                await self._redis.delete(request_id)
+            except Exception as exc:
+                report_redis_failure(exc)
+        await self._memory.delete(request_id)
 
-        return datetime.utcnow() - updated_at > self._ttl
+    def _use_redis(self) -> bool:
+        return self._redis is not None and redis_available()
 
 
 # Global instance
-tool_state_manager = ToolStateManager()
+tool_state_manager = ToolStateManager(
+    ttl_seconds=settings.TOOL_STATE_TTL,
+    backend=settings.TOOL_STATE_BACKEND
+)
@@ -5,17 +5,26 @@ Main application entry point
 
 import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from prometheus_client import make_asgi_app
 import logging
 
+from agents.classifier import request_classifier
 from api.routes import agent, health, tasks, context, tools
 from core.config import settings
 from core.database import init_db
-from core.embeddings import init_embeddings
+from core.embeddings import init_embeddings, shutdown_embeddings
+from core.rate_limiter import rate_limit
+from core.redis_client import close_redis
+from core.response_cache import cache_bypass
+from core.tool_state import tool_state_manager
+from services.language_servers import language_servers
+from services.sandbox import sandbox_pools
 from services.vector_store import init_vector_store
+from services.workspace_indexer import workspace_indexer
+from services.workspace_watcher import workspace_watchers
 
 # Configure logging
 logging.basicConfig(
@@ -41,6 +50,10 @@ async def lifespan(app: FastAPI):
     # Initialize embeddings model (GPU if available)
     logger.info("Initializing embeddings...")
     await init_embeddings()
+    await request_classifier.warmup()
+    await tool_state_manager.start()
+    await sandbox_pools.start()
+    await language_servers.start()
     
     logger.info("✅ BREEZER_X Backend ready!")
     
@@ -48,6 +61,13 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("Shutting down...")
+    await tool_state_manager.stop()
+    await sandbox_pools.stop()
+    await language_servers.stop()
+    await workspace_watchers.shutdown()
+    await workspace_indexer.shutdown()
+    await shutdown_embeddings()
+    await close_redis()
 
 
 # Create FastAPI app
@@ -71,14 +91,28 @@ app.add_middleware(
 metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
 
-# Include routers
+# Include routers (LLM-backed agent routes are rate limited per client)
 app.include_router(health.router, prefix="/health", tags=["health"])
-app.include_router(agent.router, prefix="/api/agent", tags=["agent"])
+app.include_router(agent.router, prefix="/api/agent", tags=["agent"], dependencies=[Depends(rate_limit)])
 app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
 app.include_router(context.router, prefix="/api/context", tags=["context"])
 app.include_router(tools.router, prefix="/api/tools", tags=["tools"])
 
 
+@app.middleware("http")
+async def response_cache_bypass(request: Request, call_next):
+    """Honor per-request LLM response cache bypass headers"""
+    bypass = (
+        request.headers.get("x-breezer-cache", "").lower() == "bypass"
+        or "no-cache" in request.headers.get("cache-control", "").lower()
+    )
+    token = cache_bypass.set(bypass)
+    try:
+        return await call_next(request)
+    finally:
+        cache_bypass.reset(token)
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
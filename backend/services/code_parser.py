@@ -0,0 +1,296 @@
+"""
+Tree-sitter based source parsing into symbol-level chunks
+
+Kept free of heavy imports (torch, database, vector store) so it can be
+loaded cheaply in process-pool workers.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from tree_sitter import Language, Node, Parser
+
+# File extension -> tree-sitter grammar name
+LANGUAGE_EXTENSIONS: Dict[str, str] = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+    ".ts": "typescript",
+    ".tsx": "tsx",
+}
+
+# Node types that define a symbol, per grammar family
+_PYTHON_DEFINITIONS = {
+    "function_definition": "function",
+    "class_definition": "class",
+}
+_JS_DEFINITIONS = {
+    "function_declaration": "function",
+    "generator_function_declaration": "function",
+    "class_declaration": "class",
+    "abstract_class_declaration": "class",
+    "method_definition": "method",
+    "interface_declaration": "interface",
+    "type_alias_declaration": "type",
+    "enum_declaration": "enum",
+}
+_CLASS_KINDS = {"class", "interface"}
+
+# Chunks larger than this are split (classes into members, others by lines)
+MAX_CHUNK_CHARS = 4000
+
+# Per-process parser cache
+_parsers: Dict[str, Parser] = {}
+
+
+def detect_language(path: str) -> Optional[str]:
+    """Map a file path to a supported grammar name"""
+    return LANGUAGE_EXTENSIONS.get(Path(path).suffix.lower())
+
+
+def content_hash(data: bytes) -> str:
+    """Hash file content for change detection"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _get_parser(language: str) -> Parser:
+    parser = _parsers.get(language)
+    if parser is None:
+        if language == "python":
+            import tree_sitter_python as grammar
+            ts_language = Language(grammar.language())
+        elif language == "javascript":
+            import tree_sitter_javascript as grammar
+            ts_language = Language(grammar.language())
+        elif language == "typescript":
+            import tree_sitter_typescript as grammar
+            ts_language = Language(grammar.language_typescript())
+        elif language == "tsx":
+            import tree_sitter_typescript as grammar
+            ts_language = Language(grammar.language_tsx())
+        else:
+            raise ValueError(f"Unsupported language: {language}")
+        parser = Parser(ts_language)
+        _parsers[language] = parser
+    return parser
+
+
+def parse_source(source: bytes, language: str) -> Dict[str, Any]:
+    """
+    Parse source into symbols, dependencies and chunks
+    
+    Args:
+        source: File content
+        language: Grammar name from detect_language
+        
+    Returns:
+        Dict with ``symbols`` (name, kind, parent, line range),
+        ``dependencies`` (imported modules) and ``chunks`` (content with
+        symbol and line range, ready for embedding)
+    """
+    tree = _get_parser(language).parse(source)
+    definitions = _PYTHON_DEFINITIONS if language == "python" else _JS_DEFINITIONS
+    
+    symbols: List[Dict[str, Any]] = []
+    chunks: List[Dict[str, Any]] = []
+    dependencies: List[str] = []
+    
+    _walk(tree.root_node, source, definitions, None, True, symbols, chunks, dependencies)
+    
+    # Imports, constants and script code between top-level definitions
+    # (the whole file when it has none) are indexed as module chunks
+    chunks.extend(_module_chunks(source, symbols))
+    
+    return {
+        "symbols": symbols,
+        "dependencies": sorted(set(dependencies)),
+        "chunks": chunks
+    }
+
+
+def parse_files(batch: List[Tuple[str, str, Optional[str]]]) -> List[Dict[str, Any]]:
+    """
+    Read, hash and parse a batch of files (process-pool entry point)
+    
+    Args:
+        batch: (absolute path, relative path, previously indexed hash) tuples
+        
+    Returns:
+        One result per file: ``file_path``, ``content_hash``, ``language``,
+        ``unchanged`` and, for changed files, the parse_source output or
+        an ``error``
+    """
+    results: List[Dict[str, Any]] = []
+    for absolute, relative, known_hash in batch:
+        language = detect_language(relative)
+        result: Dict[str, Any] = {"file_path": relative, "language": language}
+        try:
+            data = Path(absolute).read_bytes()
+            result["content_hash"] = content_hash(data)
+            result["unchanged"] = result["content_hash"] == known_hash
+            if not result["unchanged"]:
+                result.update(parse_source(data, language))
+        except Exception as e:
+            result["unchanged"] = False
+            result["error"] = str(e)
+        results.append(result)
+    return results
+
+
+def _walk(
+    node: Node,
+    source: bytes,
+    definitions: Dict[str, str],
+    parent: Optional[Tuple[str, str]],
+    emit_chunks: bool,
+    symbols: List[Dict[str, Any]],
+    chunks: List[Dict[str, Any]],
+    dependencies: List[str]
+):
+    for child in node.named_children:
+        if child.type in ("import_statement", "import_from_statement"):
+            dependencies.extend(_import_modules(child))
+            continue
+        
+        definition, outer, kind = _unwrap_definition(child, definitions)
+        if definition is None:
+            _walk(child, source, definitions, parent, emit_chunks, symbols, chunks, dependencies)
+            continue
+        
+        if kind == "function" and parent is not None and parent[1] in _CLASS_KINDS:
+            kind = "method"
+        name = _node_name(definition)
+        qualified = f"{parent[0]}.{name}" if parent else name
+        symbols.append({
+            "name": name,
+            "kind": kind,
+            "parent": parent[0] if parent else None,
+            "start_line": outer.start_point[0] + 1,
+            "end_line": outer.end_point[0] + 1
+        })
+        
+        descend_chunks = emit_chunks
+        if emit_chunks:
+            text = source[outer.start_byte:outer.end_byte].decode("utf-8", errors="replace")
+            if len(text) <= MAX_CHUNK_CHARS or kind not in _CLASS_KINDS:
+                chunks.extend(_split_chunk(text, qualified, kind, outer.start_point[0] + 1))
+                descend_chunks = False
+        
+        # Always descend for nested symbols; only emit member chunks when the
+        # enclosing definition was too large to index whole
+        body = definition.child_by_field_name("body")
+        if body is None:
+            value = definition.child_by_field_name("value")
+            body = value.child_by_field_name("body") if value is not None else None
+        if body is not None:
+            _walk(body, source, definitions, (qualified, kind), descend_chunks, symbols, chunks, dependencies)
+
+
+def _unwrap_definition(
+    node: Node,
+    definitions: Dict[str, str]
+) -> Tuple[Optional[Node], Node, Optional[str]]:
+    """Return (definition node, outermost node incl. decorators / export, kind)"""
+    if node.type in definitions:
+        return node, node, definitions[node.type]
+    if node.type in ("decorated_definition", "export_statement"):
+        for child in node.named_children:
+            definition, _, kind = _unwrap_definition(child, definitions)
+            if definition is not None:
+                return definition, node, kind
+    if node.type in ("lexical_declaration", "variable_declaration"):
+        # const handler = () => {...}
+        for declarator in node.named_children:
+            value = declarator.child_by_field_name("value")
+            if value is not None and value.type in ("arrow_function", "function_expression", "function"):
+                return declarator, node, "function"
+    return None, node, None
+
+
+def _module_chunks(source: bytes, symbols: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Chunk the runs of non-blank lines not covered by a top-level definition"""
+    lines = source.decode("utf-8", errors="replace").splitlines(keepends=True)
+    covered = [False] * len(lines)
+    for symbol in symbols:
+        if symbol["parent"] is None:
+            for index in range(symbol["start_line"] - 1, min(symbol["end_line"], len(lines))):
+                covered[index] = True
+    
+    chunks: List[Dict[str, Any]] = []
+    start = None
+    for index in range(len(lines) + 1):
+        if index < len(lines) and not covered[index]:
+            if start is None and lines[index].strip():
+                start = index
+            continue
+        if start is not None:
+            end = index
+            while not lines[end - 1].strip():
+                end -= 1
+            chunks.extend(_split_chunk("".join(lines[start:end]), None, "module", start + 1))
+            start = None
+    return chunks
+
+
+def _node_name(node: Node) -> str:
+    name = node.child_by_field_name("name")
+    if name is None:
+        return "<anonymous>"
+    return name.text.decode("utf-8", errors="replace")
+
+
+def _import_modules(node: Node) -> List[str]:
+    modules: List[str] = []
+    source = node.child_by_field_name("source")
+    if source is not None:
+        # JavaScript / TypeScript: import x from "module"
+        modules.append(source.text.decode("utf-8", errors="replace").strip("'\""))
+    elif node.type == "import_from_statement":
+        module = node.child_by_field_name("module_name")
+        if module is not None:
+            modules.append(module.text.decode("utf-8", errors="replace"))
+    else:
+        for child in node.named_children:
+            if child.type == "dotted_name":
+                modules.append(child.text.decode("utf-8", errors="replace"))
+            elif child.type == "aliased_import":
+                name = child.child_by_field_name("name")
+                if name is not None:
+                    modules.append(name.text.decode("utf-8", errors="replace"))
+    return modules
+
+
+def _split_chunk(text: str, symbol: Optional[str], kind: str, start_line: int) -> List[Dict[str, Any]]:
+    """Split text into chunks of at most MAX_CHUNK_CHARS on line boundaries"""
+    chunks: List[Dict[str, Any]] = []
+    lines = text.splitlines(keepends=True)
+    current: List[str] = []
+    size = 0
+    first_line = start_line
+    
+    for offset, line in enumerate(lines):
+        if current and size + len(line) > MAX_CHUNK_CHARS:
+            chunks.append(_chunk("".join(current), symbol, kind, first_line))
+            current, size = [], 0
+            first_line = start_line + offset
+        current.append(line)
+        size += len(line)
+    
+    if current:
+        chunks.append(_chunk("".join(current), symbol, kind, first_line))
+    return chunks
+
+
+def _chunk(text: str, symbol: Optional[str], kind: str, start_line: int) -> Dict[str, Any]:
+    return {
+        "content": text,
+        "symbol": symbol,
+        "kind": kind,
+        "start_line": start_line,
+        "end_line": start_line + max(0, text.count("\n") - (1 if text.endswith("\n") else 0))
+    }
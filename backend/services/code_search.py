@@ -0,0 +1,491 @@
+"""
+Trigram code search
+
+Each workspace gets an inverted index from byte trigrams (ASCII-lowercased)
+to the files containing them, kept as sorted numpy arrays and persisted
+under CODE_SEARCH_INDEX_DIR. A query's required literals select candidate
+files through the index, so only those files are read and matched.
+
+The index is refreshed from file mtimes: new and changed files go into a
+small delta index and removed ones are masked out, until the delta is
+large enough to be merged into the main arrays (which is when the index
+is saved).
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import fnmatch
+import hashlib
+import heapq
+import logging
+import os
+import re
+import time
+
+import numpy as np
+
+from core.config import settings
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# Bytes checked for NUL when deciding whether a file is binary
+BINARY_SNIFF_BYTES = 8192
+
+DEFINITION_PATTERN = re.compile(
+    r"^\s*(?:export\s+)?(?:async\s+)?(?:def|class|function|interface|type|struct|enum|fn|func|"
+    r"const|let|var|public|private|protected)\b"
+)
+
+_EMPTY = np.empty(0, dtype=np.uint32)
+
+
+def trigrams_of(data: bytes) -> np.ndarray:
+    """Sorted unique trigrams of ASCII-lowercased bytes, as 24-bit integers"""
+    if len(data) < 3:
+        return _EMPTY
+    b = np.frombuffer(data.lower(), dtype=np.uint8).astype(np.uint32)
+    return np.unique((b[:-2] << 16) | (b[1:-1] << 8) | b[2:])
+
+
+def required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """
+    Literal runs (3+ chars) every match of a regex must contain
+    
+    Conservative: alternations, optional parts and character classes break
+    runs, and non-ASCII characters are dropped because case folding may
+    match them against different bytes.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, RecursionError):
+        return []
+    
+    runs: List[str] = []
+    
+    def walk(items):
+        current: List[str] = []
+        
+        def flush():
+            if len(current) >= 3:
+                runs.append("".join(current))
+            current.clear()
+        
+        for op, value in items:
+            if op is sre_parse.LITERAL and value < 128:
+                current.append(chr(value))
+            elif op is sre_parse.AT:
+                continue  # anchors consume nothing
+            elif op is sre_parse.SUBPATTERN:
+                flush()
+                walk(value[-1])
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                flush()
+                if value[0] >= 1:
+                    walk(value[2])
+            else:
+                flush()
+        flush()
+    
+    walk(parsed)
+    return runs
+
+
+def _build_csr(trigrams: np.ndarray, files: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(keys, offsets, postings) from parallel trigram / file id arrays"""
+    if not len(trigrams):
+        return _EMPTY, np.zeros(1, dtype=np.int64), _EMPTY
+    order = np.lexsort((files, trigrams))
+    trigrams, files = trigrams[order], files[order]
+    keys, starts = np.unique(trigrams, return_index=True)
+    offsets = np.append(starts, len(trigrams)).astype(np.int64)
+    return keys.astype(np.uint32), offsets, files.astype(np.uint32)
+
+
+def _postings(keys: np.ndarray, offsets: np.ndarray, postings: np.ndarray, trigram: int) -> np.ndarray:
+    i = int(np.searchsorted(keys, trigram))
+    if i < len(keys) and keys[i] == trigram:
+        return postings[offsets[i]:offsets[i + 1]]
+    return _EMPTY
+
+
+class TrigramIndex:
+    """Trigram index of one workspace"""
+    
+    def __init__(self, root: Path, index_path: Optional[Path] = None):
+        self.root = root
+        self.index_path = index_path
+        # File table, by file id
+        self.paths: List[str] = []
+        self.mtimes: List[int] = []
+        self.sizes: List[int] = []
+        self.ids: Dict[str, int] = {}
+        # Main index
+        self.keys = _EMPTY
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = _EMPTY
+        # Changes since the last merge
+        self.delta: Dict[int, np.ndarray] = {}
+        self.dead: Set[int] = set()
+        self._delta_csr: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self._dead_array = _EMPTY
+        self.refreshed_at = 0.0
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def refresh(self) -> Dict[str, int]:
+        """Bring the index up to date with the workspace by mtime and size (blocking)"""
+        current = self._scan()
+        removed = [path for path in self.ids if path not in current]
+        changed = [
+            path for path, (mtime, size) in current.items()
+            if path not in self.ids
+            or self.mtimes[self.ids[path]] != mtime
+            or self.sizes[self.ids[path]] != size
+        ]
+        
+        for path in removed:
+            self.dead.add(self.ids.pop(path))
+        for path in changed:
+            if path in self.ids:
+                self.dead.add(self.ids.pop(path))
+            mtime, size = current[path]
+            file_id = len(self.paths)
+            self.paths.append(path)
+            self.mtimes.append(mtime)
+            self.sizes.append(size)
+            self.ids[path] = file_id
+            self.delta[file_id] = self._read_trigrams(path)
+        
+        if removed or changed:
+            self._delta_csr = None
+            self._dead_array = np.fromiter(self.dead, dtype=np.uint32, count=len(self.dead))
+            if len(self.delta) + len(self.dead) > max(1000, len(self.ids) // 20):
+                self.merge()
+                self.save()
+        
+        self.refreshed_at = time.monotonic()
+        return {"files": len(self.ids), "changed": len(changed), "removed": len(removed)}
+    
+    def merge(self):
+        """Fold the delta into the main arrays and compact file ids"""
+        counts = np.diff(self.offsets)
+        trigrams = [np.repeat(self.keys, counts)]
+        files = [self.postings]
+        for file_id, file_trigrams in self.delta.items():
+            trigrams.append(file_trigrams)
+            files.append(np.full(len(file_trigrams), file_id, dtype=np.uint32))
+        trigrams = np.concatenate(trigrams)
+        files = np.concatenate(files)
+        
+        # Renumber live files 0..n-1 in path order
+        live = sorted(self.ids.items())
+        remap = np.full(len(self.paths), np.iinfo(np.uint32).max, dtype=np.uint32)
+        for new_id, (_, old_id) in enumerate(live):
+            remap[old_id] = new_id
+        files = remap[files]
+        keep = files != np.iinfo(np.uint32).max
+        
+        self.keys, self.offsets, self.postings = _build_csr(trigrams[keep], files[keep])
+        self.paths = [path for path, _ in live]
+        self.mtimes = [self.mtimes[old_id] for _, old_id in live]
+        self.sizes = [self.sizes[old_id] for _, old_id in live]
+        self.ids = {path: new_id for new_id, path in enumerate(self.paths)}
+        self.delta = {}
+        self.dead = set()
+        self._delta_csr = None
+        self._dead_array = _EMPTY
+    
+    def save(self):
+        if not self.index_path:
+            return
+        if self.delta or self.dead:
+            self.merge()
+        
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp.npz")
+        np.savez(
+            tmp,
+            version=np.array([INDEX_VERSION]),
+            keys=self.keys,
+            offsets=self.offsets,
+            postings=self.postings,
+            mtimes=np.array(self.mtimes, dtype=np.int64),
+            sizes=np.array(self.sizes, dtype=np.int64),
+            paths=np.frombuffer("\0".join(self.paths).encode("utf-8"), dtype=np.uint8)
+        )
+        os.replace(tmp, self.index_path)
+    
+    def load(self) -> bool:
+        if not self.index_path or not self.index_path.exists():
+            return False
+        try:
+            with np.load(self.index_path) as data:
+                if int(data["version"][0]) != INDEX_VERSION:
+                    return False
+                self.keys = data["keys"]
+                self.offsets = data["offsets"]
+                self.postings = data["postings"]
+                self.mtimes = data["mtimes"].tolist()
+                self.sizes = data["sizes"].tolist()
+                raw = data["paths"].tobytes().decode("utf-8")
+            self.paths = raw.split("\0") if raw else []
+            self.ids = {path: file_id for file_id, path in enumerate(self.paths)}
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding unreadable code search index {self.index_path}: {e}")
+            return False
+    
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """{relative path: (mtime_ns, size)} of searchable files"""
+        ignored = set(settings.INDEXER_IGNORED_DIRS)
+        max_bytes = settings.TOOL_MAX_FILE_SIZE_BYTES
+        # The index may live inside the workspace it indexes
+        index_dir = str(self.index_path.parent.resolve()) if self.index_path else None
+        files: Dict[str, Tuple[int, int]] = {}
+        stack = [(str(self.root), "")]
+        
+        while stack:
+            directory, prefix = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in ignored and entry.path != index_dir:
+                                stack.append((entry.path, prefix + entry.name + "/"))
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            if stat.st_size <= max_bytes:
+                                files[prefix + entry.name] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        continue
+        return files
+    
+    def _read_trigrams(self, path: str) -> np.ndarray:
+        try:
+            data = (self.root / path).read_bytes()
+        except OSError:
+            return _EMPTY
+        if b"\0" in data[:BINARY_SNIFF_BYTES]:
+            return _EMPTY  # binary: never a candidate
+        return trigrams_of(data)
+    
+    def candidates(self, literals: List[str]) -> Optional[np.ndarray]:
+        """
+        File ids that contain every literal's trigrams
+        
+        Returns:
+            Sorted file ids, or None when the literals give no trigrams
+            (every file is a candidate)
+        """
+        if self._delta_csr is None:
+            delta_files = [np.full(len(t), file_id, dtype=np.uint32) for file_id, t in self.delta.items()]
+            self._delta_csr = _build_csr(
+                np.concatenate(list(self.delta.values())) if self.delta else _EMPTY,
+                np.concatenate(delta_files) if delta_files else _EMPTY
+            )
+        
+        trigrams = np.unique(np.concatenate(
+            [trigrams_of(literal.encode("utf-8")) for literal in literals] or [_EMPTY]
+        ))
+        if not len(trigrams):
+            return None
+        
+        lists = []
+        for trigram in trigrams:
+            files = _postings(self.keys, self.offsets, self.postings, trigram)
+            delta = _postings(*self._delta_csr, trigram)
+            if len(delta):
+                # Delta ids are assigned after every main id, so this stays sorted
+                files = np.concatenate((files, delta))
+            if not len(files):
+                return _EMPTY
+            lists.append(files)
+        
+        # Rarest first: the running result stays small and each step is a binary search
+        lists.sort(key=len)
+        result = lists[0]
+        for files in lists[1:]:
+            positions = np.minimum(np.searchsorted(files, result), len(files) - 1)
+            result = result[files[positions] == result]
+            if not len(result):
+                break
+        
+        if len(self._dead_array):
+            result = result[~np.isin(result, self._dead_array)]
+        return result
+    
+    def search(
+        self,
+        query: str,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        path_glob: Optional[str] = None,
+        max_results: int = 20,
+        context_lines: int = 2
+    ) -> Dict[str, Any]:
+        """
+        Ranked line-level matches for a literal or regex query
+        
+        Raises:
+            ValueError: If the query is empty or not a valid regex
+        """
+        if not query:
+            raise ValueError("Query must not be empty")
+        started = time.perf_counter()
+        flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+        source = query if regex else re.escape(query)
+        try:
+            pattern = re.compile(source, flags)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}") from e
+        
+        literals = required_literals(source, flags) if regex else [
+            part for part in re.split(r"[^\x00-\x7f]+", query) if len(part) >= 3
+        ]
+        candidate_ids = self.candidates(literals)
+        if candidate_ids is None:
+            paths = sorted(self.ids)
+        else:
+            paths = sorted(self.paths[file_id] for file_id in candidate_ids.tolist())
+        if path_glob:
+            paths = [path for path in paths if fnmatch.fnmatch(path, path_glob)]
+        
+        max_files = settings.CODE_SEARCH_MAX_FILES_SCANNED
+        truncated = len(paths) > max_files
+        hits: List[Tuple[float, str, int, int, str]] = []
+        matched_files = 0
+        
+        for path in paths[:max_files]:
+            file_hits = self._match_file(path, pattern, query if not regex else None)
+            if file_hits:
+                matched_files += 1
+                # Files with a few focused matches rank above files matching everywhere
+                bonus = 1.0 / (1 + 0.1 * len(file_hits)) - 0.05 * path.count("/")
+                hits.extend((score + bonus, path, line, column, text) for score, line, column, text in file_hits)
+        
+        top = heapq.nsmallest(max_results, hits, key=lambda hit: (-hit[0], hit[1], hit[2]))
+        return {
+            "query": query,
+            "hits": self._with_context(top, context_lines),
+            "total_hits": len(hits),
+            "files_matched": matched_files,
+            "files_scanned": min(len(paths), max_files),
+            "files_indexed": len(self.ids),
+            "truncated": truncated or len(hits) > max_results,
+            "took_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    
+    def _match_file(
+        self,
+        path: str,
+        pattern: re.Pattern,
+        literal: Optional[str]
+    ) -> List[Tuple[float, int, int, str]]:
+        """(score, line, column, line text) per matching line, 1-based"""
+        try:
+            text = (self.root / path).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return []
+        
+        hits: List[Tuple[float, int, int, str]] = []
+        line_no, line_pos, last_line = 1, 0, 0
+        
+        for match in pattern.finditer(text):
+            # Advance the line counter incrementally instead of recounting from 0
+            line_no += text.count("\n", line_pos, match.start())
+            line_pos = match.start()
+            if line_no == last_line:
+                continue
+            last_line = line_no
+            
+            start = text.rfind("\n", 0, match.start()) + 1
+            end = text.find("\n", match.start())
+            line = text[start:end if end >= 0 else len(text)]
+            score = 1.0
+            if DEFINITION_PATTERN.match(line):
+                score += 2.0
+            if literal is not None and literal in line:
+                score += 0.5  # exact case
+            hits.append((score, line_no, match.start() - start + 1, line))
+        return hits
+    
+    def _with_context(self, hits: List[Tuple[float, str, int, int, str]], context_lines: int) -> List[Dict[str, Any]]:
+        """Hit dicts with surrounding lines, reading each file once"""
+        lines_by_path: Dict[str, List[str]] = {}
+        results = []
+        for score, path, line_no, column, text in hits:
+            if path not in lines_by_path:
+                try:
+                    content = (self.root / path).read_text(encoding="utf-8", errors="replace")
+                except OSError:
+                    content = ""
+                lines_by_path[path] = content.split("\n")
+            lines = lines_by_path[path]
+            results.append({
+                "path": path,
+                "line": line_no,
+                "column": column,
+                "text": text,
+                "before": lines[max(0, line_no - 1 - context_lines):line_no - 1],
+                "after": lines[line_no:line_no + context_lines],
+                "score": round(score, 3)
+            })
+        return results
+
+
+class CodeSearchService:
+    """Per-workspace trigram indexes, loaded or built on first use"""
+    
+    def __init__(self):
+        self._indexes: Dict[str, TrigramIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+    
+    async def search(self, workspace_root: Path, query: str, **options) -> Dict[str, Any]:
+        """
+        Search a workspace, refreshing its index if it is older than
+        CODE_SEARCH_REFRESH_SECONDS
+        
+        Raises:
+            ValueError: If the query is invalid
+        """
+        key = str(workspace_root)
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            index = self._indexes.get(key)
+            if index is None:
+                index = await asyncio.to_thread(self._open, workspace_root)
+                self._indexes[key] = index
+            elif time.monotonic() - index.refreshed_at > settings.CODE_SEARCH_REFRESH_SECONDS:
+                await asyncio.to_thread(index.refresh)
+            
+            return await asyncio.to_thread(index.search, query, **options)
+    
+    def _open(self, root: Path) -> TrigramIndex:
+        digest = hashlib.sha1(str(root).encode("utf-8")).hexdigest()[:16]
+        index = TrigramIndex(root, Path(settings.CODE_SEARCH_INDEX_DIR) / f"{digest}.npz")
+        started = time.monotonic()
+        loaded = index.load()
+        stats = index.refresh()
+        if not loaded:
+            index.save()
+        logger.info(
+            f"🔎 Code search index {'loaded' if loaded else 'built'} for {root}: "
+            f"{stats['files']} files ({stats['changed']} read) in {time.monotonic() - started:.2f}s"
+        )
+        return index
+
+
+# Global code search service
+code_search = CodeSearchService()
@@ -0,0 +1,251 @@
+"""
+Random-access reads of workspace files
+
+Line ranges are served from a memory map of the file plus a cached array
+of newline offsets (built once per file version with a chunked vectorised
+scan), so after the first access reading a range costs O(range), not
+O(file). Symbol targets resolve to line ranges through the tree-sitter
+parser, cached per file version as well.
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import mmap
+import os
+import threading
+
+import numpy as np
+
+from core.config import settings
+from services.code_parser import detect_language, parse_source
+
+# Bytes scanned per step while building a line index (bounds temporary memory)
+SCAN_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Encodings where b"\n" is always a line break
+RANGE_ENCODINGS = {"utf-8", "latin-1"}
+
+
+class LineIndex:
+    """Newline byte offsets of one version of a file"""
+    
+    def __init__(self, newlines: np.ndarray, size: int):
+        self.newlines = newlines
+        self.size = size
+    
+    @property
+    def line_count(self) -> int:
+        if self.size == 0:
+            return 0
+        trailing = len(self.newlines) and self.newlines[-1] == self.size - 1
+        return len(self.newlines) + (0 if trailing else 1)
+    
+    def span(self, start_line: int, end_line: int) -> Tuple[int, int]:
+        """Byte range [start, end) of 1-based inclusive lines (including the last newline)"""
+        start = 0 if start_line <= 1 else int(self.newlines[start_line - 2]) + 1
+        end = int(self.newlines[end_line - 1]) + 1 if end_line - 1 < len(self.newlines) else self.size
+        return start, end
+    
+    def line_of(self, offset: int) -> int:
+        """1-based line containing a byte offset"""
+        return int(np.searchsorted(self.newlines, offset, side="left")) + 1
+    
+    @classmethod
+    def build(cls, data: mmap.mmap, size: int) -> "LineIndex":
+        parts = []
+        for start in range(0, size, SCAN_CHUNK_BYTES):
+            chunk = np.frombuffer(data, dtype=np.uint8, count=min(SCAN_CHUNK_BYTES, size - start), offset=start)
+            parts.append(np.flatnonzero(chunk == 10).astype(np.int64) + start)
+        newlines = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        return cls(newlines, size)
+
+
+class FileRangeReader:
+    """Line, byte and symbol range reads with per-file caches"""
+    
+    def __init__(self, cache_size: int = 64):
+        self.cache_size = max(1, cache_size)
+        self._line_indexes: "OrderedDict[str, Tuple[Tuple[int, int], LineIndex]]" = OrderedDict()
+        self._symbols: "OrderedDict[str, Tuple[Tuple[int, int], list]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def read_lines(
+        self,
+        target: Path,
+        start_line: int,
+        end_line: Optional[int],
+        encoding: str,
+        max_bytes: int
+    ) -> Dict[str, Any]:
+        """
+        Read 1-based inclusive lines (end_line None = to the end of the file)
+        
+        Output is capped at max_bytes, cut at a line boundary; ``next_line``
+        tells the caller where to continue. A single line longer than
+        max_bytes is cut mid-line and returns ``next_offset`` instead.
+        """
+        self._check_encoding(encoding)
+        with self._open(target) as (data, version):
+            index = self._line_index(target, data, version)
+            total = index.line_count
+            start_line = max(1, start_line)
+            end_line = total if end_line is None else min(end_line, total)
+            if total == 0 or start_line > total:
+                return self._lines_result("", start_line, start_line - 1, total, False)
+            if end_line < start_line:
+                raise ValueError("end_line must not be before start_line")
+            
+            start, end = index.span(start_line, end_line)
+            truncated = end - start > max_bytes
+            partial = False
+            if truncated:
+                # Cut after the last full line that fits; always return at least part of one line
+                cut = start + max_bytes
+                last_newline = data.rfind(b"\n", start, cut)
+                partial = last_newline < 0
+                end = cut if partial else last_newline + 1
+                end_line = index.line_of(end - 1)
+            
+            content = data[start:end].decode(encoding, errors="replace")
+            result = self._lines_result(content, start_line, end_line, total, truncated)
+            if partial:
+                # A line longer than max_bytes: the rest of it is only reachable by byte offset
+                result.pop("next_line", None)
+                result["next_offset"] = end
+            return result
+    
+    def read_bytes(
+        self,
+        target: Path,
+        offset: int,
+        length: Optional[int],
+        encoding: str,
+        max_bytes: int
+    ) -> Dict[str, Any]:
+        """Read a byte range (decoded with replacement at cut characters)"""
+        self._check_encoding(encoding)
+        with self._open(target) as (data, version):
+            size = version[1]
+            start = min(max(0, offset), size)
+            end = size if length is None else min(size, start + max(0, length))
+            truncated = end - start > max_bytes
+            end = min(end, start + max_bytes)
+            
+            result: Dict[str, Any] = {
+                "content": data[start:end].decode(encoding, errors="replace"),
+                "offset": start,
+                "length": end - start,
+                "total_bytes": size,
+                "truncated": truncated
+            }
+            if end > start:
+                index = self._line_index(target, data, version)
+                result["start_line"] = index.line_of(start)
+                result["end_line"] = index.line_of(end - 1)
+            if truncated or end < size:
+                result["next_offset"] = end
+            return result
+    
+    def find_symbol(self, target: Path, relative: str, symbol: str) -> Dict[str, Any]:
+        """
+        Locate a function or class by name (``name`` or ``Parent.name``)
+        
+        Raises:
+            ValueError: If the file type is unsupported or the symbol is not found
+        """
+        language = detect_language(relative)
+        if language is None:
+            raise ValueError("Symbol lookup is not supported for this file type")
+        
+        stat = target.stat()
+        if stat.st_size > settings.INDEXER_MAX_FILE_BYTES:
+            raise ValueError("File is too large for symbol lookup; request a line range")
+        version = (stat.st_mtime_ns, stat.st_size)
+        
+        key = str(target)
+        with self._lock:
+            cached = self._symbols.get(key)
+        if cached and cached[0] == version:
+            symbols = cached[1]
+        else:
+            symbols = parse_source(target.read_bytes(), language)["symbols"]
+            self._remember(self._symbols, key, (version, symbols))
+        
+        matches = [
+            entry for entry in symbols
+            if symbol in (entry["name"], f"{entry['parent']}.{entry['name']}")
+        ]
+        if not matches:
+            raise ValueError(f"Symbol not found: {symbol}")
+        return {
+            "match": matches[0],
+            "other_matches": [
+                {"name": m["name"], "parent": m["parent"], "kind": m["kind"], "start_line": m["start_line"]}
+                for m in matches[1:]
+            ]
+        }
+    
+    def _line_index(self, target: Path, data: mmap.mmap, version: Tuple[int, int]) -> LineIndex:
+        key = str(target)
+        with self._lock:
+            cached = self._line_indexes.get(key)
+            if cached and cached[0] == version:
+                self._line_indexes.move_to_end(key)
+                return cached[1]
+        
+        index = LineIndex.build(data, version[1])
+        self._remember(self._line_indexes, key, (version, index))
+        return index
+    
+    def _remember(self, cache: OrderedDict, key: str, value: Any):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+    
+    def _open(self, target: Path):
+        return _MappedFile(target)
+    
+    def _check_encoding(self, encoding: str):
+        if encoding.lower() not in RANGE_ENCODINGS:
+            raise ValueError(f"Ranged reads support {', '.join(sorted(RANGE_ENCODINGS))} only")
+    
+    def _lines_result(self, content: str, start_line: int, end_line: int, total: int, truncated: bool) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "content": content,
+            "start_line": start_line,
+            "end_line": end_line,
+            "total_lines": total,
+            "truncated": truncated
+        }
+        if end_line < total:
+            result["next_line"] = end_line + 1
+        return result
+
+
+class _MappedFile:
+    """Read-only memory map of a file, usable as a context manager yielding (map, (mtime_ns, size))"""
+    
+    def __init__(self, target: Path):
+        self.target = target
+        self._file = None
+        self._map = None
+    
+    def __enter__(self):
+        self._file = open(self.target, "rb")
+        stat = os.fstat(self._file.fileno())
+        version = (stat.st_mtime_ns, stat.st_size)
+        # mmap cannot map empty files; an empty bytes object behaves the same for slicing
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+        return self._map, version
+    
+    def __exit__(self, *exc):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+
+# Global reader
+file_range_reader = FileRangeReader(settings.TOOL_FILE_READ_INDEX_CACHE)
@@ -0,0 +1,647 @@
+"""
+Pooled language servers for workspace diagnostics
+
+One long-running language server process per (workspace, language),
+spoken to over stdio with LSP JSON-RPC. Workspace source files are opened
+in the server on first use; afterwards only files whose mtime changed are
+re-sent (didChange / didOpen / didClose), so a warm query is answered from
+the server's incremental state instead of a cold project analysis.
+
+Servers idle longer than LSP_IDLE_TIMEOUT, using more than
+LSP_MEMORY_LIMIT_MB of resident memory (process tree), or beyond
+LSP_MAX_SERVERS (least recently used first) are shut down; the next query
+for that workspace starts cold.
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+
+import psutil
+from prometheus_client import Counter, Gauge, Histogram
+
+from core.config import settings
+from services.workspace_tree import workspace_trees
+
+logger = logging.getLogger(__name__)
+
+# LSP languageId per extension; the pool language is the key of LSP_SERVERS serving it
+LANGUAGE_IDS: Dict[str, Tuple[str, str]] = {
+    ".py": ("python", "python"),
+    ".pyi": ("python", "python"),
+    ".ts": ("typescript", "typescript"),
+    ".tsx": ("typescript", "typescriptreact"),
+    ".js": ("typescript", "javascript"),
+    ".jsx": ("typescript", "javascriptreact"),
+    ".mjs": ("typescript", "javascript"),
+    ".cjs": ("typescript", "javascript"),
+}
+
+SEVERITIES = {1: "error", 2: "warning", 3: "information", 4: "hint"}
+
+SYMBOL_KINDS = {
+    2: "module", 5: "class", 6: "method", 7: "property", 8: "field", 9: "constructor",
+    10: "enum", 11: "interface", 12: "function", 13: "variable", 14: "constant", 23: "struct",
+}
+
+QUERY_LATENCY = Histogram(
+    "breezer_lsp_query_seconds",
+    "workspace_diagnostics latency per language server, by whether the server was started",
+    ["language", "start"],
+    buckets=(0.01, 0.05, 0.25, 1, 2.5, 5, 10, 30, 60)
+)
+SERVER_STARTS = Counter("breezer_lsp_server_starts_total", "Language server processes started", ["language"])
+EVICTIONS = Counter("breezer_lsp_evictions_total", "Language servers shut down by the pool", ["language", "reason"])
+SERVERS = Gauge("breezer_lsp_servers", "Running language servers", ["language"])
+
+
+class LanguageServerError(Exception):
+    """Raised when a language server cannot be started or stops answering"""
+
+
+class LanguageServer:
+    """One language server process and the documents it has open"""
+    
+    def __init__(self, root: Path, language: str, command: List[str]):
+        self.root = root
+        self.root_uri = root.as_uri()
+        self.language = language
+        self.command = command
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()  # one sync + query at a time
+        self.users = 0  # pool queries holding this server; the pool never evicts it while > 0
+        # uri -> raw LSP diagnostics, as last published
+        self.diagnostics: Dict[str, List[Dict[str, Any]]] = {}
+        # relative path -> (mtime_ns, version) of open documents
+        self.documents: Dict[str, Tuple[int, int]] = {}
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._awaiting: Set[str] = set()
+        self._published = asyncio.Event()
+    
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+    
+    async def start(self):
+        """
+        Spawn the server and complete the initialize handshake
+        
+        Raises:
+            LanguageServerError: If the executable is missing or the handshake fails
+        """
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *self.command,
+                cwd=self.root,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                start_new_session=True  # own process group, so helpers (tsserver) die with it
+            )
+        except FileNotFoundError as exc:
+            raise LanguageServerError(f"{self.command[0]} is not installed") from exc
+        except OSError as exc:
+            raise LanguageServerError(f"{self.command[0]} could not be started: {exc}") from exc
+        
+        self._reader = asyncio.create_task(self._read_loop())
+        await self.request("initialize", {
+            "processId": os.getpid(),
+            "rootUri": self.root_uri,
+            "rootPath": str(self.root),
+            "workspaceFolders": [{"uri": self.root_uri, "name": self.root.name}],
+            "capabilities": {
+                "textDocument": {
+                    "synchronization": {"didSave": False, "dynamicRegistration": False},
+                    "publishDiagnostics": {"relatedInformation": False, "versionSupport": False}
+                },
+                "workspace": {"configuration": True, "workspaceFolders": True, "symbol": {}}
+            }
+        })
+        await self.notify("initialized", {})
+        logger.info(f"🧠 Started {self.language} language server for {self.root} (pid {self.process.pid})")
+    
+    async def stop(self):
+        if self.alive:
+            try:
+                await asyncio.wait_for(self.request("shutdown", None), 5)
+                await self.notify("exit", None)
+                await asyncio.wait_for(self.process.wait(), 5)
+            except (LanguageServerError, asyncio.TimeoutError):
+                pass
+        if self.process is not None:
+            # Also reaps helpers left behind by a graceful exit or a crash
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await self.process.wait()
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+    
+    def rss_bytes(self) -> int:
+        """Resident memory of the server and its child processes"""
+        if not self.alive:
+            return 0
+        try:
+            process = psutil.Process(self.process.pid)
+            total = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    continue
+            return total
+        except psutil.Error:
+            return 0
+    
+    async def query(self, paths: List[str], complete: bool, symbol_query: Optional[str]) -> Dict[str, Any]:
+        """
+        Sync the given files and collect their diagnostics (and workspace symbols)
+        
+        Args:
+            paths: Relative paths of source files for this server
+            complete: ``paths`` is every source file, so open documents
+                missing from it were deleted
+            symbol_query: Optional workspace/symbol query
+        """
+        async with self.lock:
+            self.last_used = time.monotonic()
+            deadline = time.monotonic() + settings.LSP_REQUEST_TIMEOUT
+            skipped = await self._sync(paths, complete)
+            settled = await self._settle(deadline)
+            
+            wanted = {(self.root / path).as_uri() for path in paths}
+            diagnostics = [
+                (self._relative(uri), diagnostic)
+                for uri, items in self.diagnostics.items() if uri in wanted or complete
+                for diagnostic in items
+            ]
+            result: Dict[str, Any] = {
+                "diagnostics": diagnostics,
+                "files": len(self.documents),
+                "complete": settled and not skipped
+            }
+            if symbol_query:
+                symbols = await self.request("workspace/symbol", {"query": symbol_query})
+                result["symbols"] = [self._symbol(symbol) for symbol in symbols or []]
+            self.last_used = time.monotonic()
+            return result
+    
+    async def request(self, method: str, params: Any) -> Any:
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+            return await asyncio.wait_for(future, settings.LSP_REQUEST_TIMEOUT)
+        except asyncio.TimeoutError as exc:
+            raise LanguageServerError(f"{self.language} language server timed out on {method}") from exc
+        finally:
+            self._pending.pop(request_id, None)
+    
+    async def notify(self, method: str, params: Any):
+        await self._send({"jsonrpc": "2.0", "method": method, "params": params})
+    
+    async def _sync(self, paths: List[str], complete: bool) -> int:
+        """Open, update or close documents whose files changed; returns files over the open cap"""
+        if complete:
+            listed = set(paths)
+            for path in [path for path in self.documents if path not in listed]:
+                await self._close(path)
+        
+        changes = await asyncio.to_thread(self._read_changed, paths)
+        skipped = 0
+        for path, mtime_ns, text in changes:
+            uri = (self.root / path).as_uri()
+            known = self.documents.get(path)
+            if text is None:
+                if known:
+                    await self._close(path)
+                continue
+            if known is None:
+                if len(self.documents) >= settings.LSP_MAX_OPEN_FILES:
+                    skipped += 1
+                    continue
+                version = 1
+                await self.notify("textDocument/didOpen", {"textDocument": {
+                    "uri": uri,
+                    "languageId": LANGUAGE_IDS[Path(path).suffix.lower()][1],
+                    "version": version,
+                    "text": text
+                }})
+            else:
+                version = known[1] + 1
+                await self.notify("textDocument/didChange", {
+                    "textDocument": {"uri": uri, "version": version},
+                    "contentChanges": [{"text": text}]
+                })
+            self.documents[path] = (mtime_ns, version)
+            self._awaiting.add(uri)
+        return skipped
+    
+    def _read_changed(self, paths: List[str]) -> List[Tuple[str, int, Optional[str]]]:
+        """(path, mtime_ns, text or None if gone/too big) for files not yet synced at their mtime"""
+        changes = []
+        for path in paths:
+            target = self.root / path
+            try:
+                stat = target.stat()
+                known = self.documents.get(path)
+                if known and known[0] == stat.st_mtime_ns:
+                    continue
+                if stat.st_size > settings.INDEXER_MAX_FILE_BYTES:
+                    changes.append((path, 0, None))
+                    continue
+                changes.append((path, stat.st_mtime_ns, target.read_text(encoding="utf-8", errors="replace")))
+            except OSError:
+                changes.append((path, 0, None))
+        return changes
+    
+    async def _close(self, path: str):
+        uri = (self.root / path).as_uri()
+        self.documents.pop(path, None)
+        self.diagnostics.pop(uri, None)
+        self._awaiting.discard(uri)
+        await self.notify("textDocument/didClose", {"textDocument": {"uri": uri}})
+    
+    async def _settle(self, deadline: float) -> bool:
+        """
+        Wait until every changed document has fresh diagnostics, or until
+        the server has gone quiet for LSP_DIAGNOSTICS_SETTLE after
+        publishing something
+        
+        Returns:
+            True if no document is still waiting for diagnostics
+        """
+        published = False
+        while self._awaiting and self.alive:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._published.clear()
+            wait = min(remaining, settings.LSP_DIAGNOSTICS_SETTLE) if published else remaining
+            try:
+                await asyncio.wait_for(self._published.wait(), wait)
+                published = True
+            except asyncio.TimeoutError:
+                if published:
+                    break
+        if not self.alive:
+            raise LanguageServerError(f"{self.language} language server exited")
+        # Documents the server did not report on are not waited for again
+        settled = not self._awaiting
+        self._awaiting.clear()
+        return settled
+    
+    async def _read_loop(self):
+        stdout = self.process.stdout
+        try:
+            while True:
+                length = None
+                while True:
+                    line = await stdout.readline()
+                    if not line:
+                        return
+                    line = line.strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                if length is None:
+                    continue
+                await self._dispatch(json.loads(await stdout.readexactly(length)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.warning(f"{self.language} language server stream failed: {e}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(LanguageServerError(f"{self.language} language server exited"))
+            self._published.set()
+    
+    async def _dispatch(self, message: Dict[str, Any]):
+        method = message.get("method")
+        if method is None:
+            future = self._pending.get(message.get("id"))
+            if future and not future.done():
+                if "error" in message:
+                    future.set_exception(LanguageServerError(message["error"].get("message", "request failed")))
+                else:
+                    future.set_result(message.get("result"))
+        elif "id" in message:
+            # Server -> client requests: answer what we advertise, acknowledge the rest
+            params = message.get("params") or {}
+            result: Any = None
+            if method == "workspace/configuration":
+                result = [None] * len(params.get("items", []))
+            elif method == "workspace/workspaceFolders":
+                result = [{"uri": self.root_uri, "name": self.root.name}]
+            await self._send({"jsonrpc": "2.0", "id": message["id"], "result": result})
+        elif method == "textDocument/publishDiagnostics":
+            params = message.get("params") or {}
+            uri = self._normalize_uri(params.get("uri", ""))
+            self.diagnostics[uri] = params.get("diagnostics") or []
+            self._awaiting.discard(uri)
+            self._published.set()
+    
+    async def _send(self, message: Dict[str, Any]):
+        if not self.alive:
+            raise LanguageServerError(f"{self.language} language server is not running")
+        body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+        try:
+            self.process.stdin.write(b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as exc:
+            raise LanguageServerError(f"{self.language} language server exited") from exc
+    
+    def _normalize_uri(self, uri: str) -> str:
+        """Re-encode a server URI the way Path.as_uri() does, so lookups match"""
+        parsed = urlparse(uri)
+        if parsed.scheme != "file":
+            return uri
+        return Path(unquote(parsed.path)).as_uri()
+    
+    def _relative(self, uri: str) -> str:
+        path = Path(unquote(urlparse(uri).path))
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            return str(path)
+    
+    def _symbol(self, symbol: Dict[str, Any]) -> Dict[str, Any]:
+        location = symbol.get("location") or {}
+        start = (location.get("range") or {}).get("start") or {}
+        return {
+            "name": symbol.get("name"),
+            "kind": SYMBOL_KINDS.get(symbol.get("kind"), "symbol"),
+            "container": symbol.get("containerName"),
+            "path": self._relative(location.get("uri", "")),
+            "line": start.get("line", 0) + 1 if start else None
+        }
+
+
+class LanguageServerPool:
+    """Warm language servers keyed by (workspace, language)"""
+    
+    def __init__(self):
+        self._servers: "OrderedDict[Tuple[str, str], LanguageServer]" = OrderedDict()
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._sweep_task: Optional[asyncio.Task] = None
+    
+    async def diagnostics(
+        self,
+        workspace_root: Path,
+        paths: Optional[List[str]] = None,
+        symbol_query: Optional[str] = None,
+        limit: int = 50
+    ) -> Dict[str, Any]:
+        """
+        Diagnostics (and optionally workspace symbols) for a workspace
+        
+        Args:
+            workspace_root: Resolved workspace root
+            paths: Relative files to check; defaults to every source file
+            symbol_query: Also run a workspace/symbol query
+            limit: Maximum diagnostics and symbols returned
+        
+        Raises:
+            LanguageServerError: If no language server could answer
+        """
+        complete = paths is None
+        totals: Dict[str, int] = {}
+        by_language: Dict[str, List[str]] = {}
+        if paths is None:
+            by_language, totals = await asyncio.to_thread(self._source_files, workspace_root)
+        else:
+            for path in paths:
+                language = LANGUAGE_IDS.get(Path(path).suffix.lower(), (None,))[0]
+                if language in settings.LSP_SERVERS:
+                    by_language.setdefault(language, []).append(path)
+        
+        results = await asyncio.gather(
+            *(self._query(workspace_root, language, files, complete, symbol_query)
+              for language, files in by_language.items()),
+            return_exceptions=True
+        )
+        
+        diagnostics: List[Dict[str, Any]] = []
+        symbols: List[Dict[str, Any]] = []
+        servers: List[Dict[str, Any]] = []
+        errors: Dict[str, str] = {}
+        for language, result in zip(by_language, results):
+            if isinstance(result, LanguageServerError):
+                errors[language] = str(result)
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            for path, diagnostic in result["diagnostics"]:
+                start = (diagnostic.get("range") or {}).get("start") or {}
+                diagnostics.append({
+                    "path": path,
+                    "line": start.get("line", 0) + 1,
+                    "column": start.get("character", 0) + 1,
+                    "severity": SEVERITIES.get(diagnostic.get("severity"), "error"),
+                    "message": diagnostic.get("message", ""),
+                    "source": diagnostic.get("source"),
+                    "code": diagnostic.get("code")
+                })
+            symbols.extend(result.get("symbols", []))
+            server = {key: result[key] for key in ("language", "cold", "latency_ms", "files", "complete")}
+            if language in totals:
+                server["files_total"] = totals[language]
+            servers.append(server)
+        
+        if errors and not servers:
+            raise LanguageServerError("; ".join(errors.values()))
+        
+        rank = {name: position for position, name in enumerate(SEVERITIES.values())}
+        diagnostics.sort(key=lambda d: (rank.get(d["severity"], 0), d["path"], d["line"], d["column"]))
+        counts: Dict[str, int] = {}
+        for diagnostic in diagnostics:
+            counts[diagnostic["severity"]] = counts.get(diagnostic["severity"], 0) + 1
+        
+        response: Dict[str, Any] = {
+            "diagnostics": diagnostics[:limit],
+            "total": len(diagnostics),
+            "counts": counts,
+            "servers": servers
+        }
+        if symbol_query:
+            response["symbols"] = symbols[:limit]
+        if errors:
+            response["errors"] = errors
+        return response
+    
+    async def _query(
+        self,
+        root: Path,
+        language: str,
+        paths: List[str],
+        complete: bool,
+        symbol_query: Optional[str]
+    ) -> Dict[str, Any]:
+        key = (str(root), language)
+        started = time.perf_counter()
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            server = self._servers.get(key)
+            if server is not None and not server.alive:
+                await self._evict(key, "crash")
+                server = None
+            cold = server is None
+            if cold:
+                server = LanguageServer(root, language, settings.LSP_SERVERS[language])
+                try:
+                    await server.start()
+                except LanguageServerError:
+                    await server.stop()
+                    raise
+                SERVER_STARTS.labels(language).inc()
+                self._servers[key] = server
+                await self._enforce_capacity(keep=key)
+                self._update_gauge()
+            self._servers.move_to_end(key)
+            # Taken before the per-key lock is released, so another
+            # workspace's cold start cannot evict it before the query runs
+            server.users += 1
+        
+        try:
+            result = await server.query(paths, complete, symbol_query)
+        except LanguageServerError:
+            if not server.alive:
+                await self._evict(key, "crash")
+            raise
+        finally:
+            server.users -= 1
+        elapsed = time.perf_counter() - started
+        QUERY_LATENCY.labels(language, "cold" if cold else "warm").observe(elapsed)
+        
+        rss = await asyncio.to_thread(server.rss_bytes)
+        if rss > settings.LSP_MEMORY_LIMIT_MB * 1024 * 1024 and not server.users:
+            logger.warning(f"{language} language server for {root} uses {rss >> 20} MiB; restarting on next use")
+            await self._evict(key, "memory")
+        
+        result.update(language=language, cold=cold, latency_ms=round(elapsed * 1000, 1))
+        return result
+    
+    def _source_files(self, root: Path) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+        """
+        Gitignore-aware source files per server language, at most
+        LSP_MAX_OPEN_FILES each, plus the total found per language
+        """
+        files: Dict[str, List[str]] = {}
+        totals: Dict[str, int] = {}
+        cursor = None
+        while True:
+            page = workspace_trees.list(root, "", depth=32, cursor=cursor, limit=500)
+            for entry in page["entries"]:
+                if entry["is_dir"]:
+                    continue
+                language = LANGUAGE_IDS.get(Path(entry["name"]).suffix.lower(), (None,))[0]
+                if language not in settings.LSP_SERVERS:
+                    continue
+                totals[language] = totals.get(language, 0) + 1
+                if totals[language] <= settings.LSP_MAX_OPEN_FILES:
+                    files.setdefault(language, []).append(entry["name"])
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return files, totals
+    
+    async def _enforce_capacity(self, keep: Optional[Tuple[str, str]] = None):
+        while len(self._servers) > settings.LSP_MAX_SERVERS:
+            victim = next(
+                (key for key, server in self._servers.items() if key != keep and not server.users),
+                None
+            )
+            if victim is None:
+                return
+            await self._evict(victim, "capacity")
+    
+    async def _evict(self, key: Tuple[str, str], reason: str):
+        server = self._servers.pop(key, None)
+        if server is None:
+            return
+        EVICTIONS.labels(server.language, reason).inc()
+        logger.info(f"🧠 Stopping {server.language} language server for {key[0]} ({reason})")
+        await server.stop()
+        self._update_gauge()
+    
+    async def sweep(self):
+        """Stop idle, crashed and over-memory servers, and any over LSP_MAX_SERVERS"""
+        now = time.monotonic()
+        limit = settings.LSP_MEMORY_LIMIT_MB * 1024 * 1024
+        for key, server in list(self._servers.items()):
+            if server.users:
+                continue
+            if not server.alive:
+                await self._evict(key, "crash")
+            elif now - server.last_used > settings.LSP_IDLE_TIMEOUT:
+                await self._evict(key, "idle")
+            elif await asyncio.to_thread(server.rss_bytes) > limit:
+                await self._evict(key, "memory")
+        # Servers kept past LSP_MAX_SERVERS while a query held them
+        await self._enforce_capacity()
+        self._update_gauge()
+    
+    async def start(self):
+        if settings.LSP_ENABLED and self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+    
+    async def stop(self):
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+        for key in list(self._servers):
+            await self._evict(key, "shutdown")
+    
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(settings.LSP_SWEEP_INTERVAL)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning(f"Language server sweep failed: {e}")
+    
+    def _update_gauge(self):
+        counts: Dict[str, int] = {language: 0 for language in settings.LSP_SERVERS}
+        for server in self._servers.values():
+            counts[server.language] = counts.get(server.language, 0) + 1
+        for language, count in counts.items():
+            SERVERS.labels(language).set(count)
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "workspace": root,
+                "language": language,
+                "pid": server.process.pid if server.process else None,
+                "open_files": len(server.documents),
+                "idle_seconds": round(now - server.last_used, 1)
+            }
+            for (root, language), server in self._servers.items()
+        ]
+
+
+# Global language server pool
+language_servers = LanguageServerPool()
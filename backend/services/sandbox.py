@@ -4,11 +4,23 @@ Docker sandbox service for safe code execution
 
 import docker
 from docker.models.containers import Container
-from typing import Dict, Any, Optional, List
+from contextlib import aclosing, asynccontextmanager
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Deque, Dict, Any, Optional, List, Set
 import asyncio
+import codecs
+import functools
+import io
+import posixpath
+import socket
+import tarfile
+import threading
+import time
 import uuid
 import logging
-from datetime import datetime
+
+from prometheus_client import Counter, Gauge, Histogram
 
 from core.config import settings
 
@@ -25,11 +37,146 @@ except Exception as e:
     docker_client = None
 
 
+# Base image per language
+SANDBOX_IMAGES = {
+    "python": "python:3.11-slim",
+    "javascript": "node:18-slim",
+    "typescript": "node:18-slim",
+    "go": "golang:1.21-alpine",
+    "rust": "rust:1.75-slim",
+}
+
+# Program file and run command (relative to /workspace) per language
+RUN_COMMANDS = {
+    "python": ("main.py", "python main.py"),
+    "javascript": ("main.js", "node main.js"),
+    "typescript": ("main.js", "node main.js"),
+    "go": ("main.go", "go run main.go"),
+    "rust": ("main.rs", "rustc main.rs && ./main"),
+}
+
+# stdin is written into the workspace and redirected, not streamed over the exec socket
+STDIN_FILE = ".stdin"
+
+# Paths a run may write to; reset() clears them between leases
+SCRATCH_PATHS = ("/workspace", "/tmp")
+
+# $HOME and toolchain caches (go run's build cache, ~/.cache) point into
+# /tmp, so they are writable with a read-only root and cleared by reset()
+SANDBOX_ENVIRONMENT = {
+    "PYTHONUNBUFFERED": "1",
+    "NODE_ENV": "development",
+    "HOME": "/tmp/home",
+    "XDG_CACHE_HOME": "/tmp/cache",
+    "GOCACHE": "/tmp/cache/go-build",
+}
+
+# Images known to be present locally, so they are only checked once
+_local_images: Set[str] = set()
+
+LEASE_WAIT = Histogram(
+    "breezer_sandbox_lease_wait_seconds",
+    "Time spent waiting to lease a pooled sandbox",
+    ["language"],
+    buckets=(0.001, 0.01, 0.05, 0.25, 1, 2.5, 5, 10, 30)
+)
+COLD_STARTS = Counter("breezer_sandbox_cold_starts_total", "Sandbox containers started", ["language"])
+RECYCLED = Counter("breezer_sandbox_recycled_total", "Pooled sandboxes discarded", ["language", "reason"])
+POOL_SIZE = Gauge("breezer_sandbox_pool_size", "Pooled sandboxes by state", ["language", "state"])
+
+
 class SandboxExecutionError(Exception):
     """Sandbox execution error"""
     pass
 
 
+# The Docker SDK is blocking; its calls run here instead of on the event loop
+_docker_executor = ThreadPoolExecutor(
+    max_workers=settings.SANDBOX_DOCKER_THREADS,
+    thread_name_prefix="docker"
+)
+
+
+async def _docker(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking Docker SDK call on the Docker thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_docker_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _pump_stream(stream, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+    """Forward (stdout, stderr) chunks from a demuxed exec stream to the event loop"""
+    try:
+        for chunk in stream:
+            loop.call_soon_threadsafe(queue.put_nowait, chunk)
+    except Exception as e:
+        loop.call_soon_threadsafe(queue.put_nowait, e)
+    finally:
+        loop.call_soon_threadsafe(queue.put_nowait, None)
+
+
+def _workspace_on_tmpfs() -> bool:
+    """Whether /workspace is a tmpfs mount (put_archive/get_archive cannot reach it)"""
+    return settings.SANDBOX_READ_ONLY_ROOT or bool(settings.SANDBOX_WORKSPACE_TMPFS)
+
+
+def _scratch_mounts() -> Optional[Dict[str, str]]:
+    """tmpfs mounts for the writable scratch paths; needed when the root is read-only"""
+    if not _workspace_on_tmpfs():
+        return None
+    options = f",{settings.SANDBOX_WORKSPACE_TMPFS}" if settings.SANDBOX_WORKSPACE_TMPFS else ""
+    return {"/workspace": f"rw,exec,mode=1777{options}", "/tmp": "rw,exec,mode=1777"}
+
+
+def build_archive(files: Dict[str, str]) -> bytes:
+    """
+    In-memory tar of {relative path: content}
+    
+    Raises:
+        SandboxExecutionError: If a path is absolute or leaves the workspace
+    """
+    buffer = io.BytesIO()
+    now = time.time()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name, content in files.items():
+            path = posixpath.normpath(name)
+            if path.startswith(("/", "../")) or path in (".", ".."):
+                raise SandboxExecutionError(f"Invalid sandbox file path: {name}")
+            
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            info.mode = 0o644
+            info.mtime = now
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def extract_archive(data: bytes, strip: str = "") -> Dict[str, bytes]:
+    """Regular files of a tar archive as {path: content}, dropping a leading directory"""
+    files = {}
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            name = member.name[2:] if member.name.startswith("./") else member.name
+            if strip and name.startswith(strip + "/"):
+                name = name[len(strip) + 1:]
+            files[name] = archive.extractfile(member).read()
+    return files
+
+
+async def _ensure_image(image: str):
+    """Pull an image unless it is already known to be present"""
+    if image in _local_images:
+        return
+    try:
+        await _docker(docker_client.images.get, image)
+    except docker.errors.ImageNotFound:
+        logger.info(f"Pulling image: {image}")
+        await _docker(docker_client.images.pull, image)
+    _local_images.add(image)
+
+
 class Sandbox:
     """Docker-based code execution sandbox"""
     
@@ -46,6 +193,8 @@ class Sandbox:
         self.cpu_limit = cpu_limit or settings.SANDBOX_CPU_LIMIT
         self.container: Optional[Container] = None
         self.container_id = f"breezer-sandbox-{uuid.uuid4().hex[:8]}"
+        self.uses = 0
+        self.dirty = False
         
     async def start(self):
         """Start sandbox container"""
@@ -56,26 +205,12 @@ class Sandbox:
             raise SandboxExecutionError("Docker client is not available. Sandbox functionality is disabled.")
         
         try:
-            # Select base image based on language
-            images = {
-                "python": "python:3.11-slim",
-                "javascript": "node:18-slim",
-                "typescript": "node:18-slim",
-                "go": "golang:1.21-alpine",
-                "rust": "rust:1.75-slim",
-            }
-            
-            image = images.get(self.language, "python:3.11-slim")
-            
-            # Pull image if not exists
-            try:
-                docker_client.images.get(image)
-            except docker.errors.ImageNotFound:
-                logger.info(f"Pulling image: {image}")
-                docker_client.images.pull(image)
+            image = SANDBOX_IMAGES.get(self.language, "python:3.11-slim")
+            await _ensure_image(image)
             
             # Create container
-            self.container = docker_client.containers.create(
+            self.container = await _docker(
+                docker_client.containers.create,
                 image=image,
                 name=self.container_id,
                 detach=True,
@@ -84,18 +219,14 @@ class Sandbox:
                 mem_limit=self.memory_limit,
                 cpu_quota=self.cpu_limit * 100000,  # Convert to microseconds
                 network_mode="none",  # Isolated network
-                read_only=False,
+                read_only=settings.SANDBOX_READ_ONLY_ROOT,
                 working_dir="/workspace",
-                volumes={
-                    # Mount a tmpfs for workspace
-                },
-                environment={
-                    "PYTHONUNBUFFERED": "1",
-                    "NODE_ENV": "development"
-                }
+                tmpfs=_scratch_mounts(),
+                environment=SANDBOX_ENVIRONMENT
             )
             
-            self.container.start()
+            await _docker(self.container.start)
+            COLD_STARTS.labels(language=self.language).inc()
             logger.info(f"✅ Sandbox started: {self.container_id}")
             
         except Exception as e:
@@ -122,65 +253,37 @@ class Sandbox:
         if not self.container:
             raise SandboxExecutionError("Sandbox not started")
         
+        stdout: List[str] = []
+        stderr: List[str] = []
+        
         try:
-            start_time = datetime.now()
-            
-            # Create files if provided
-            if files:
-                for filename, content in files.items():
-                    self.container.exec_run(
-                        f"sh -c 'cat > /workspace/{filename}'",
-                        stdin=True,
-                        socket=True
-                    )
-            
-            # Write main code file
-            if self.language == "python":
-                code_file = "main.py"
-                cmd = f"python /workspace/{code_file}"
-            elif self.language in ["javascript", "typescript"]:
-                code_file = "main.js"
-                cmd = f"node /workspace/{code_file}"
-            elif self.language == "go":
-                code_file = "main.go"
-                cmd = f"go run /workspace/{code_file}"
-            elif self.language == "rust":
-                code_file = "main.rs"
-                cmd = f"rustc /workspace/{code_file} && ./main"
-            else:
-                raise SandboxExecutionError(f"Unsupported language: {self.language}")
+            async with aclosing(self.execute_stream(code, stdin=stdin, files=files)) as events:
+                async for event in events:
+                    if event["type"] == "stdout":
+                        stdout.append(event["data"])
+                    elif event["type"] == "stderr":
+                        stderr.append(event["data"])
+                    else:
+                        result = event
             
-            # Write code to file
-            self.container.exec_run(
-                f"sh -c 'cat > /workspace/{code_file}'",
-                stdin=True,
-                socket=True
-            ).output.write(code.encode())
-            
-            # Execute with timeout
-            exec_result = self.container.exec_run(
-                cmd,
-                stdin=stdin is not None,
-                demux=True,
-                workdir="/workspace"
-            )
-            
-            stdout, stderr = exec_result.output
-            stdout = stdout.decode() if stdout else ""
-            stderr = stderr.decode() if stderr else ""
-            
-            execution_time = (datetime.now() - start_time).total_seconds()
+            if result["timed_out"]:
+                stderr.append(f"\nExecution timed out after {self.timeout}s")
             
             return {
-                "stdout": stdout,
-                "stderr": stderr,
-                "exit_code": exec_result.exit_code,
-                "execution_time": execution_time,
-                "success": exec_result.exit_code == 0
+                "stdout": "".join(stdout),
+                "stderr": "".join(stderr),
+                "exit_code": result["exit_code"],
+                "execution_time": result["execution_time"],
+                "success": result["exit_code"] == 0,
+                "timed_out": result["timed_out"]
             }
             
         except Exception as e:
             logger.error(f"❌ Sandbox execution failed: {e}")
+            # Rejected input (SandboxExecutionError) leaves the container intact;
+            # anything else may not, so it is not reused
+            if not isinstance(e, SandboxExecutionError):
+                self.dirty = True
             return {
                 "stdout": "",
                 "stderr": str(e),
@@ -190,12 +293,269 @@ class Sandbox:
                 "error": str(e)
             }
     
+    async def execute_stream(
+        self,
+        code: str,
+        stdin: Optional[str] = None,
+        files: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute code in sandbox, yielding output as it is produced
+        
+        The run is killed once it exceeds self.timeout. Killing stops the
+        container, so the sandbox is marked dirty and not reused.
+        
+        Args:
+            code: Code to execute
+            stdin: Standard input
+            files: Additional files to create {filename: content}
+            
+        Yields:
+            {"type": "stdout" | "stderr", "data": str} as output arrives, then
+            {"type": "exit", "exit_code", "execution_time", "timed_out"}
+        """
+        if not self.container:
+            raise SandboxExecutionError("Sandbox not started")
+        
+        self.uses += 1
+        started = time.monotonic()
+        running = False
+        finished = False
+        
+        try:
+            cmd = await _docker(self._write_sources, code, files, stdin)
+            
+            exec_id = (await _docker(
+                docker_client.api.exec_create,
+                self.container.id,
+                cmd,
+                workdir="/workspace"
+            ))["Id"]
+            running = True
+            stream = await _docker(docker_client.api.exec_start, exec_id, stream=True, demux=True)
+            
+            # The blocking stream is read on its own thread for the whole run
+            loop = asyncio.get_running_loop()
+            queue: asyncio.Queue = asyncio.Queue()
+            threading.Thread(
+                target=_pump_stream,
+                args=(stream, queue, loop),
+                name=f"{self.container_id}-output",
+                daemon=True
+            ).start()
+            
+            decoders = {
+                "stdout": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+                "stderr": codecs.getincrementaldecoder("utf-8")(errors="replace")
+            }
+            deadline = started + self.timeout
+            timed_out = False
+            
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    logger.warning(f"⏱️  Sandbox run exceeded {self.timeout}s, killing {self.container_id}")
+                    await self._kill()
+                    break
+                
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                
+                for kind, data in zip(("stdout", "stderr"), item):
+                    text = decoders[kind].decode(data) if data else ""
+                    if text:
+                        yield {"type": kind, "data": text}
+            
+            for kind, decoder in decoders.items():
+                text = decoder.decode(b"", final=True)
+                if text:
+                    yield {"type": kind, "data": text}
+            
+            exit_code = -1
+            if not timed_out:
+                exit_code = (await _docker(docker_client.api.exec_inspect, exec_id)).get("ExitCode")
+                # Killed (e.g. out of memory): the container may be in a bad state
+                if exit_code is None or exit_code >= 128:
+                    self.dirty = True
+                    exit_code = -1 if exit_code is None else exit_code
+            
+            finished = True
+            yield {
+                "type": "exit",
+                "exit_code": exit_code,
+                "execution_time": time.monotonic() - started,
+                "timed_out": timed_out
+            }
+        
+        finally:
+            # Consumer stopped early or the run failed: do not leave it running.
+            # Failures before the program started (e.g. invalid file paths)
+            # leave nothing to kill, so the container stays reusable.
+            if running and not finished and not self.dirty:
+                await self._kill()
+    
+    def _write_sources(self, code: str, files: Optional[Dict[str, str]], stdin: Optional[str]) -> List[str]:
+        """Copy the program, its files and stdin into the container (blocking); returns the run command"""
+        if self.language not in RUN_COMMANDS:
+            raise SandboxExecutionError(f"Unsupported language: {self.language}")
+        code_file, cmd = RUN_COMMANDS[self.language]
+        
+        sources = dict(files or {})
+        sources[code_file] = code
+        if stdin is not None:
+            sources[STDIN_FILE] = stdin
+            cmd = f"{cmd} < {STDIN_FILE}"
+        
+        self._inject_archive(build_archive(sources))
+        return ["sh", "-c", cmd]
+    
+    def _inject_archive(self, archive: bytes):
+        """Extract a tar archive into /workspace in one round trip (blocking)"""
+        if not _workspace_on_tmpfs():
+            if not self.container.put_archive("/workspace", archive):
+                raise SandboxExecutionError("Failed to copy files into sandbox")
+            return
+        
+        # put_archive writes beneath a tmpfs mount, so extract through tar's stdin instead
+        exec_id = docker_client.api.exec_create(
+            self.container.id, ["tar", "-x", "-C", "/workspace"], stdin=True
+        )["Id"]
+        sock = docker_client.api.exec_start(exec_id, socket=True)
+        raw = getattr(sock, "_sock", sock)
+        try:
+            raw.sendall(archive)
+            raw.shutdown(socket.SHUT_WR)
+            while raw.recv(65536):
+                pass
+        finally:
+            raw.close()
+        
+        if docker_client.api.exec_inspect(exec_id).get("ExitCode") != 0:
+            raise SandboxExecutionError("Failed to copy files into sandbox")
+    
+    async def fetch_artifacts(self, path: str = "/workspace/out") -> Dict[str, bytes]:
+        """
+        Copy files produced by a run out of the container as one archive
+        
+        Args:
+            path: Directory (or file) inside the container
+        
+        Returns:
+            {relative path: content} for the regular files under path;
+            empty if path does not exist
+        """
+        if not self.container:
+            raise SandboxExecutionError("Sandbox not started")
+        
+        try:
+            archive = await _docker(self._read_archive, path)
+        except docker.errors.NotFound:
+            return {}
+        return extract_archive(archive, strip=posixpath.basename(path.rstrip("/")))
+    
+    def _read_archive(self, path: str) -> bytes:
+        """Tar of a container path, capped at SANDBOX_ARTIFACT_MAX_BYTES (blocking)"""
+        limit = settings.SANDBOX_ARTIFACT_MAX_BYTES
+        
+        exec_id = None
+        if _workspace_on_tmpfs():
+            # Same tmpfs caveat as _inject_archive: archive it from inside the
+            # container, streamed so the cap applies before it is all read
+            parent, name = posixpath.split(path.rstrip("/"))
+            exec_id = docker_client.api.exec_create(
+                self.container.id, ["tar", "-c", "-C", parent or "/", name], stderr=False
+            )["Id"]
+            stream = docker_client.api.exec_start(exec_id, stream=True)
+        else:
+            stream, _ = self.container.get_archive(path)
+        
+        chunks, size = [], 0
+        for chunk in stream:
+            size += len(chunk)
+            if size > limit:
+                # Stop reading; a truncated tar must never be returned
+                stream.close()
+                raise SandboxExecutionError(f"Artifacts exceed {limit} bytes")
+            chunks.append(chunk)
+        
+        if exec_id is not None and docker_client.api.exec_inspect(exec_id).get("ExitCode") != 0:
+            raise docker.errors.NotFound(f"{path} not found in sandbox")
+        return b"".join(chunks)
+    
+    async def _kill(self):
+        """Kill the container, ending any running process; it will not be reused"""
+        self.dirty = True
+        try:
+            await _docker(self.container.kill)
+        except Exception as e:
+            logger.warning(f"Failed to kill sandbox {self.container_id}: {e}")
+    
+    async def reset(self) -> bool:
+        """
+        Clear the workspace so the container can be leased again
+        
+        Returns:
+            False when the container is unfit for reuse (reset failed or
+            processes from the last execution are still running)
+        """
+        if not self.container:
+            return False
+        
+        try:
+            result = await _docker(
+                self.container.exec_run,
+                "sh -c 'rm -rf /workspace/* /workspace/.[!.]* /tmp/* /tmp/.[!.]*'",
+                workdir="/"
+            )
+            if result.exit_code != 0:
+                return False
+            
+            # Only the container's own init process should be left
+            top = await _docker(self.container.top)
+            return len(top.get("Processes") or []) <= 1
+        except Exception as e:
+            logger.warning(f"Sandbox reset failed for {self.container_id}: {e}")
+            return False
+    
+    async def root_modified(self) -> bool:
+        """
+        Whether the last lease changed the container filesystem outside the
+        scratch paths (/workspace, /tmp); always False with a read-only root
+        """
+        if settings.SANDBOX_READ_ONLY_ROOT or not self.container:
+            return False
+        
+        try:
+            changes = await _docker(self.container.diff) or []
+        except Exception as e:
+            logger.warning(f"Sandbox diff failed for {self.container_id}: {e}")
+            return True
+        return any(
+            not any(change["Path"] == root or change["Path"].startswith(root + "/") for root in SCRATCH_PATHS)
+            for change in changes
+        )
+    
+    async def healthy(self) -> bool:
+        """Whether the container is still running"""
+        if not self.container:
+            return False
+        
+        try:
+            await _docker(self.container.reload)
+            return self.container.status == "running"
+        except Exception:
+            return False
+    
     async def cleanup(self):
         """Stop and remove container"""
         if self.container:
             try:
-                self.container.stop(timeout=5)
-                self.container.remove(force=True)
+                await _docker(self.container.stop, timeout=5)
+                await _docker(self.container.remove, force=True)
                 logger.info(f"🧹 Sandbox cleaned up: {self.container_id}")
             except Exception as e:
                 logger.error(f"❌ Cleanup failed: {e}")
@@ -215,7 +575,8 @@ async def execute_code(
     language: str = "python",
     timeout: int = None,
     stdin: Optional[str] = None,
-    files: Optional[Dict[str, str]] = None
+    files: Optional[Dict[str, str]] = None,
+    artifacts: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Convenience function to execute code in sandbox
@@ -226,27 +587,303 @@ async def execute_code(
         timeout: Execution timeout
         stdin: Standard input
         files: Additional files
+        artifacts: Container path to copy back after the run (result["artifacts"])
         
     Returns:
         Execution result
     """
-    async with Sandbox(language=language, timeout=timeout) as sandbox:
+    if settings.SANDBOX_POOL_ENABLED:
+        lease = sandbox_pools.lease(language, timeout=timeout)
+    else:
+        lease = Sandbox(language=language, timeout=timeout)
+    
+    async with lease as sandbox:
         result = await sandbox.execute(code, stdin=stdin, files=files)
+        if artifacts and not result.get("timed_out"):
+            try:
+                result["artifacts"] = await sandbox.fetch_artifacts(artifacts)
+            except Exception as e:
+                logger.warning(f"Failed to fetch sandbox artifacts: {e}")
+                result["artifacts_error"] = str(e)
     
     return result
 
 
+async def execute_code_stream(
+    code: str,
+    language: str = "python",
+    timeout: int = None,
+    stdin: Optional[str] = None,
+    files: Optional[Dict[str, str]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Execute code in sandbox, streaming output events (see Sandbox.execute_stream)
+    
+    Args:
+        code: Code to execute
+        language: Programming language
+        timeout: Execution timeout
+        stdin: Standard input
+        files: Additional files
+    """
+    if settings.SANDBOX_POOL_ENABLED:
+        lease = sandbox_pools.lease(language, timeout=timeout)
+    else:
+        lease = Sandbox(language=language, timeout=timeout)
+    
+    # aclosing: a consumer that stops early kills the run before the sandbox is returned
+    async with lease as sandbox:
+        async with aclosing(sandbox.execute_stream(code, stdin=stdin, files=files)) as events:
+            async for event in events:
+                yield event
+
+
+class SandboxPool:
+    """
+    Warm, reusable sandbox containers for one language
+    
+    Keeps at least min_size containers running and starts more on demand up
+    to max_size; beyond that, leases wait. A container is reset when it is
+    returned and recycled (removed and replaced) once it has served
+    max_uses executions, was left dirty, fails its reset or health check.
+    """
+    
+    def __init__(self, language: str, min_size: int, max_size: int, max_uses: int):
+        self.language = language
+        self.min_size = min_size
+        self.max_size = max(1, max_size)
+        self.max_uses = max_uses
+        self._idle: Deque[Sandbox] = deque()
+        self._size = 0  # idle, leased and starting
+        self._available = asyncio.Condition()
+        self._health_task: Optional[asyncio.Task] = None
+    
+    @asynccontextmanager
+    async def lease(self, timeout: Optional[int] = None) -> AsyncIterator[Sandbox]:
+        """
+        Lease a sandbox for the duration of the block
+        
+        Args:
+            timeout: Execution timeout for this lease (defaults to SANDBOX_TIMEOUT)
+        
+        Raises:
+            SandboxExecutionError: If no sandbox frees up within SANDBOX_POOL_LEASE_TIMEOUT
+        """
+        started = time.monotonic()
+        sandbox = await self._acquire()
+        LEASE_WAIT.labels(language=self.language).observe(time.monotonic() - started)
+        sandbox.timeout = timeout or settings.SANDBOX_TIMEOUT
+        
+        try:
+            yield sandbox
+        except BaseException:
+            sandbox.dirty = True
+            raise
+        finally:
+            await self._release(sandbox)
+    
+    async def _acquire(self) -> Sandbox:
+        deadline = time.monotonic() + settings.SANDBOX_POOL_LEASE_TIMEOUT
+        
+        while True:
+            async with self._available:
+                sandbox = self._idle.popleft() if self._idle else None
+                grow = sandbox is None and self._size < self.max_size
+                if grow:
+                    self._size += 1
+                elif sandbox is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise SandboxExecutionError(f"No {self.language} sandbox available")
+                    try:
+                        await asyncio.wait_for(self._available.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+            self._update_gauges()
+            
+            if grow:
+                return await self._start_sandbox()
+            if await sandbox.healthy():
+                return sandbox
+            await self._discard(sandbox, "unhealthy")
+    
+    async def _release(self, sandbox: Sandbox):
+        if sandbox.dirty:
+            reason = "dirty"
+        elif self.max_uses and sandbox.uses >= self.max_uses:
+            reason = "max_uses"
+        elif not await sandbox.reset():
+            reason = "reset_failed"
+        elif await sandbox.root_modified():
+            reason = "root_modified"
+        else:
+            sandbox.dirty = False
+            async with self._available:
+                self._idle.append(sandbox)
+                self._available.notify()
+            self._update_gauges()
+            return
+        
+        await self._discard(sandbox, reason)
+        self._schedule_fill()
+    
+    async def _start_sandbox(self) -> Sandbox:
+        """Start a container for a slot already counted in _size"""
+        sandbox = Sandbox(language=self.language)
+        try:
+            await sandbox.start()
+        except BaseException:
+            async with self._available:
+                self._size -= 1
+                self._available.notify()
+            self._update_gauges()
+            raise
+        return sandbox
+    
+    async def _discard(self, sandbox: Sandbox, reason: str):
+        RECYCLED.labels(language=self.language, reason=reason).inc()
+        logger.info(f"♻️  Recycling sandbox {sandbox.container_id} ({reason})")
+        await sandbox.cleanup()
+        async with self._available:
+            self._size -= 1
+            self._available.notify()
+        self._update_gauges()
+    
+    async def fill(self):
+        """Start containers until the pool holds min_size"""
+        while self._size < self.min_size:
+            self._size += 1
+            try:
+                sandbox = await self._start_sandbox()
+            except SandboxExecutionError as e:
+                logger.warning(f"Could not pre-warm {self.language} sandbox: {e}")
+                return
+            async with self._available:
+                self._idle.append(sandbox)
+                self._available.notify()
+            self._update_gauges()
+    
+    def _schedule_fill(self):
+        if self._size < self.min_size:
+            asyncio.create_task(self.fill())
+    
+    async def check_health(self):
+        """Recycle idle sandboxes whose container stopped, then refill"""
+        async with self._available:
+            idle = list(self._idle)
+            self._idle.clear()
+        
+        for sandbox in idle:
+            if await sandbox.healthy():
+                async with self._available:
+                    self._idle.append(sandbox)
+                    self._available.notify()
+            else:
+                await self._discard(sandbox, "unhealthy")
+        
+        self._update_gauges()
+        await self.fill()
+    
+    async def start(self, health_interval: float):
+        await self.fill()
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop(health_interval))
+    
+    async def stop(self):
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        
+        while self._idle:
+            sandbox = self._idle.popleft()
+            self._size -= 1
+            await sandbox.cleanup()
+        self._update_gauges()
+    
+    async def _health_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.warning(f"Sandbox health check failed: {e}")
+    
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "idle": len(self._idle),
+            "leased": self._size - len(self._idle),
+            "min_size": self.min_size,
+            "max_size": self.max_size
+        }
+    
+    def _update_gauges(self):
+        POOL_SIZE.labels(language=self.language, state="idle").set(len(self._idle))
+        POOL_SIZE.labels(language=self.language, state="leased").set(self._size - len(self._idle))
+
+
+class SandboxPoolManager:
+    """Per-language sandbox pools"""
+    
+    def __init__(self):
+        self._pools: Dict[str, SandboxPool] = {}
+    
+    def get(self, language: str) -> SandboxPool:
+        pool = self._pools.get(language)
+        if pool is None:
+            warm = language in settings.SANDBOX_POOL_LANGUAGES
+            pool = SandboxPool(
+                language,
+                min_size=settings.SANDBOX_POOL_MIN_SIZE if warm else 0,
+                max_size=settings.SANDBOX_POOL_MAX_SIZE,
+                max_uses=settings.SANDBOX_POOL_MAX_USES
+            )
+            self._pools[language] = pool
+        return pool
+    
+    def lease(self, language: str, timeout: Optional[int] = None):
+        """Async context manager leasing a sandbox for a language"""
+        return self.get(language).lease(timeout=timeout)
+    
+    async def start(self):
+        """Pre-warm the configured languages"""
+        if not settings.SANDBOX_ENABLED or not settings.SANDBOX_POOL_ENABLED or docker_client is None:
+            return
+        for language in settings.SANDBOX_POOL_LANGUAGES:
+            await self.get(language).start(settings.SANDBOX_POOL_HEALTH_INTERVAL)
+        logger.info(f"📦 Sandbox pools warm: {self.snapshot()}")
+    
+    async def stop(self):
+        for pool in self._pools.values():
+            await pool.stop()
+    
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {language: pool.snapshot() for language, pool in self._pools.items()}
+
+
+# Global sandbox pools
+sandbox_pools = SandboxPoolManager()
+
+
 async def cleanup_old_sandboxes():
     """Clean up any dangling sandbox containers"""
+    if docker_client is None:
+        return
+    
     try:
-        containers = docker_client.containers.list(
+        containers = await _docker(
+            docker_client.containers.list,
             filters={"name": "breezer-sandbox-"}
         )
         
         for container in containers:
             try:
-                container.stop(timeout=5)
-                container.remove(force=True)
+                await _docker(container.stop, timeout=5)
+                await _docker(container.remove, force=True)
                 logger.info(f"🧹 Cleaned up old sandbox: {container.name}")
             except Exception as e:
                 logger.error(f"Failed to cleanup {container.name}: {e}")
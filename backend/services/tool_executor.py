@@ -1,14 +1,42 @@
-"""Backend tool execution services with safety guards."""
+"""Backend tool execution services with safety guards.
+
+Tools are coroutines: commands run as asyncio subprocesses and file system
+work runs in threads, so a long ``terminal_command`` does not block other
+requests on the worker. ``execute_batch`` runs the independent tool calls
+of one model turn concurrently.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
 import shlex
-import subprocess
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from core.config import settings
+from services.code_search import code_search
+from services.file_ranges import file_range_reader
+from services.language_servers import LanguageServerError, language_servers
+from services.workspace_tree import workspace_trees
+from tools.definitions import TOOL_FUNCTIONS
+
+logger = logging.getLogger(__name__)
+
+TOOL_NAMES = frozenset(tool["name"] for tool in TOOL_FUNCTIONS)
+
+# Tools without side effects may run concurrently; the rest run alone, in order
+READ_ONLY_TOOLS = frozenset({
+    "file_read",
+    "file_list",
+    "code_search",
+    "git_status",
+    "git_diff",
+    "web_lookup",
+    "workspace_diagnostics",
+})
 
 
 class ToolExecutionError(Exception):
@@ -28,21 +56,68 @@ class ToolExecutionService:
 
     def _resolve_path(self, relative: str) -> Path:
         candidate = (self.workspace_root / relative).resolve()
-        if not str(candidate).startswith(str(self.workspace_root)):
+        # Compare path components, not string prefixes: /ws-other is not inside /ws
+        if candidate != self.workspace_root and self.workspace_root not in candidate.parents:
             raise ToolExecutionError("Path escapes workspace root")
         return candidate
 
-    def file_read(self, path: str, encoding: str = "utf-8") -> Dict[str, Any]:
+    async def file_read(
+        self,
+        path: str,
+        encoding: str = "utf-8",
+        start_line: Optional[int] = None,
+        end_line: Optional[int] = None,
+        offset: Optional[int] = None,
+        length: Optional[int] = None,
+        symbol: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return await asyncio.to_thread(
+            self._file_read, path, encoding, start_line, end_line, offset, length, symbol
+        )
+
+    def _file_read(
+        self,
+        path: str,
+        encoding: str,
+        start_line: Optional[int],
+        end_line: Optional[int],
+        offset: Optional[int],
+        length: Optional[int],
+        symbol: Optional[str]
+    ) -> Dict[str, Any]:
         target = self._resolve_path(path)
         if not target.is_file():
             raise ToolExecutionError("File not found")
-        size = target.stat().st_size
-        if size > settings.TOOL_MAX_FILE_SIZE_BYTES:
-            raise ToolExecutionError("File exceeds maximum readable size")
-        content = target.read_text(encoding=encoding)
-        return {"path": str(target.relative_to(self.workspace_root)), "content": content}
+        relative = str(target.relative_to(self.workspace_root))
+        by_lines = start_line is not None or end_line is not None
+        by_bytes = offset is not None or length is not None
+        if by_lines + by_bytes + (symbol is not None) > 1:
+            raise ToolExecutionError("Use only one of a line range, a byte range or a symbol")
 
-    def file_write(
+        limit = settings.TOOL_MAX_FILE_SIZE_BYTES
+        try:
+            if symbol is not None:
+                found = file_range_reader.find_symbol(target, relative, symbol)
+                match = found["match"]
+                result = file_range_reader.read_lines(
+                    target, match["start_line"], match["end_line"], encoding, limit
+                )
+                result.update(symbol=symbol, kind=match["kind"], other_matches=found["other_matches"])
+            elif by_lines:
+                result = file_range_reader.read_lines(target, start_line or 1, end_line, encoding, limit)
+            elif by_bytes:
+                result = file_range_reader.read_bytes(target, offset or 0, length, encoding, limit)
+            else:
+                if target.stat().st_size > limit:
+                    raise ToolExecutionError(
+                        "File exceeds maximum readable size; request a line range, byte range or symbol"
+                    )
+                return {"path": relative, "content": target.read_text(encoding=encoding)}
+        except ValueError as exc:
+            raise ToolExecutionError(str(exc)) from exc
+        return {"path": relative, **result}
+
+    async def file_write(
         self,
         path: str,
         content: str,
@@ -52,6 +127,9 @@ class ToolExecutionService:
     ) -> Dict[str, Any]:
         if settings.TOOL_REQUIRE_CONFIRMATION and not confirm:
             raise ToolExecutionError("Write operation requires user confirmation")
+        return await asyncio.to_thread(self._file_write, path, content, mode, encoding)
+
+    def _file_write(self, path: str, content: str, mode: str, encoding: str) -> Dict[str, Any]:
         target = self._resolve_path(path)
         if target.exists() and target.stat().st_size > settings.TOOL_MAX_FILE_SIZE_BYTES:
             raise ToolExecutionError("Target file exceeds maximum allowable size")
@@ -62,39 +140,86 @@ class ToolExecutionService:
             target.write_text(content, encoding=encoding)
         return {"path": str(target.relative_to(self.workspace_root)), "written_bytes": len(content)}
 
-    def file_list(self, path: str, max_entries: int = 50) -> Dict[str, Any]:
+    async def file_list(
+        self,
+        path: str,
+        max_entries: int = 50,
+        depth: int = 1,
+        glob: Optional[str] = None,
+        cursor: Optional[str] = None,
+        format: str = "entries"
+    ) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._file_list, path, max_entries, depth, glob, cursor, format)
+
+    def _file_list(
+        self,
+        path: str,
+        max_entries: int,
+        depth: int,
+        glob: Optional[str],
+        cursor: Optional[str],
+        format: str
+    ) -> Dict[str, Any]:
         max_entries = max(1, min(max_entries, 500))
         target = self._resolve_path(path)
         if not target.exists():
             raise ToolExecutionError("Directory not found")
         if not target.is_dir():
             raise ToolExecutionError("Path is not a directory")
-        entries: List[Dict[str, Any]] = []
-        for idx, child in enumerate(target.iterdir()):
-            if idx >= max_entries:
-                break
-            entries.append({
-                "name": child.name,
-                "is_dir": child.is_dir(),
-                "size": None if child.is_dir() else child.stat().st_size
-            })
-        return {"path": str(target.relative_to(self.workspace_root)), "entries": entries}
-
-    def git_status(self, detailed: bool = False) -> Dict[str, Any]:
+        if format not in ("entries", "tree"):
+            raise ToolExecutionError("format must be 'entries' or 'tree'")
+        relative = target.relative_to(self.workspace_root).as_posix()
+        try:
+            listing = workspace_trees.list(
+                self.workspace_root,
+                "" if relative == "." else relative,
+                depth=max(1, min(depth, 32)),
+                glob=glob,
+                cursor=cursor,
+                limit=max_entries,
+                tree=format == "tree"
+            )
+        except OSError as exc:
+            raise ToolExecutionError("Directory not found") from exc
+        return {"path": relative, **listing}
+
+    async def code_search(
+        self,
+        query: str,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        path_glob: Optional[str] = None,
+        max_results: int = 20,
+        context_lines: int = 2
+    ) -> Dict[str, Any]:
+        try:
+            return await code_search.search(
+                self.workspace_root,
+                query,
+                regex=regex,
+                case_sensitive=case_sensitive,
+                path_glob=path_glob,
+                max_results=max(1, min(max_results, 100)),
+                context_lines=max(0, min(context_lines, 10))
+            )
+        except ValueError as exc:
+            raise ToolExecutionError(str(exc)) from exc
+
+    async def git_status(self, detailed: bool = False) -> Dict[str, Any]:
         cmd = ["git", "status"]
         if detailed:
             cmd.extend(["--porcelain", "-b"])
-        return self._run_command(cmd)
+        return await self._run_command(cmd)
 
-    def git_diff(self, path: Optional[str] = None, staged: bool = False) -> Dict[str, Any]:
+    async def git_diff(self, path: Optional[str] = None, staged: bool = False) -> Dict[str, Any]:
         cmd = ["git", "diff"]
         if staged:
             cmd.append("--cached")
         if path:
             cmd.append(path)
-        return self._run_command(cmd)
+        return await self._run_command(cmd)
 
-    def terminal_command(self, command: str) -> Dict[str, Any]:
+    async def terminal_command(self, command: str) -> Dict[str, Any]:
         whitelist = settings.TOOL_TERMINAL_WHITELIST
         command_map = settings.TOOL_TERMINAL_COMMAND_MAP
         if command not in whitelist:
@@ -103,43 +228,128 @@ class ToolExecutionService:
         if not mapped:
             raise ToolExecutionError("Command mapping missing")
         cmd = shlex.split(mapped)
-        return self._run_command(cmd, timeout=120)
+        return await self._run_command(cmd, timeout=120)
 
-    def web_lookup(self, query: str) -> Dict[str, Any]:
+    async def web_lookup(self, query: str) -> Dict[str, Any]:
         if not settings.TOOL_WEB_LOOKUP_ENABLED:
             raise ToolExecutionError("Web lookup is disabled")
         # Placeholder implementation. Integration point for approved providers.
         return {"query": query, "results": []}
 
-    def workspace_diagnostics(self, limit: int = 50) -> Dict[str, Any]:
-        # Placeholder until LSP integration is available.
-        raise ToolExecutionError("Workspace diagnostics not yet implemented")
+    async def workspace_diagnostics(
+        self,
+        limit: int = 50,
+        paths: Optional[List[str]] = None,
+        symbol_query: Optional[str] = None
+    ) -> Dict[str, Any]:
+        if not settings.LSP_ENABLED:
+            raise ToolExecutionError("Workspace diagnostics are disabled")
+        relative = None
+        if paths:
+            relative = []
+            for path in paths:
+                target = self._resolve_path(path)
+                if not target.is_file():
+                    raise ToolExecutionError(f"File not found: {path}")
+                relative.append(target.relative_to(self.workspace_root).as_posix())
+        try:
+            return await language_servers.diagnostics(
+                self.workspace_root,
+                relative,
+                symbol_query=symbol_query,
+                limit=max(1, min(limit, 200))
+            )
+        except LanguageServerError as exc:
+            raise ToolExecutionError(str(exc)) from exc
 
-    def _run_command(self, cmd: List[str], timeout: int = 60) -> Dict[str, Any]:
+    async def _run_command(self, cmd: List[str], timeout: int = 60) -> Dict[str, Any]:
         try:
-            completed = subprocess.run(
-                cmd,
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
                 cwd=self.workspace_root,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                check=False
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
             )
         except FileNotFoundError as exc:
             raise ToolExecutionError("Command executable not found") from exc
-        except subprocess.TimeoutExpired as exc:
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            process.kill()
+            await process.wait()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
             raise ToolExecutionError("Command timed out") from exc
         return {
             "command": " ".join(cmd),
-            "exit_code": completed.returncode,
-            "stdout": completed.stdout,
-            "stderr": completed.stderr
+            "exit_code": process.returncode,
+            "stdout": stdout.decode("utf-8", errors="replace"),
+            "stderr": stderr.decode("utf-8", errors="replace")
         }
 
-    def execute(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        if not hasattr(self, name):
+    async def execute(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        if name not in TOOL_NAMES or not hasattr(self, name):
             raise ToolExecutionError("Unknown tool")
         method = getattr(self, name)
         if not callable(method):
             raise ToolExecutionError("Invalid tool handler")
-        return method(**arguments)
+        try:
+            return await method(**arguments)
+        except TypeError as exc:
+            raise ToolExecutionError(f"Invalid arguments for {name}: {exc}") from exc
+
+    async def execute_batch(
+        self,
+        calls: List[Dict[str, Any]],
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run one turn's tool calls, yielding each result as it completes.
+
+        Consecutive read-only calls run concurrently (up to ``concurrency``);
+        a mutating call waits for everything before it and runs alone, so
+        the batch has the same effect as running the calls in order.
+
+        Args:
+            calls: ``{"id", "name", "arguments"}`` dicts in the order the model emitted them
+            concurrency: Limit for concurrent calls (default TOOL_BATCH_CONCURRENCY)
+
+        Yields:
+            ``{"call_id", "name", "success", "result" | "error", "duration_ms"}``
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or settings.TOOL_BATCH_CONCURRENCY))
+
+        async def run(call: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                started = time.perf_counter()
+                outcome: Dict[str, Any] = {"call_id": call.get("id"), "name": call.get("name")}
+                try:
+                    outcome["result"] = await self.execute(call.get("name"), call.get("arguments") or {})
+                    outcome["success"] = True
+                except ToolExecutionError as exc:
+                    outcome["error"] = str(exc)
+                    outcome["success"] = False
+                except Exception as exc:
+                    # One broken call must not abort its siblings or the stream
+                    logger.warning(f"Tool {call.get('name')} failed in batch: {exc!r}")
+                    outcome["error"] = f"{type(exc).__name__}: {exc}"
+                    outcome["success"] = False
+                outcome["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                return outcome
+
+        # Split into runs of read-only calls separated by mutating barriers
+        groups: List[List[Dict[str, Any]]] = []
+        for call in calls:
+            if call.get("name") in READ_ONLY_TOOLS and groups and groups[-1][0].get("name") in READ_ONLY_TOOLS:
+                groups[-1].append(call)
+            else:
+                groups.append([call])
+
+        for group in groups:
+            tasks = [asyncio.create_task(run(call)) for call in group]
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    yield await finished
+            finally:
+                for task in tasks:
+                    task.cancel()
@@ -2,16 +2,20 @@
 Vector store service for code search using Qdrant
 """
 
+import httpx
 from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
 from qdrant_client.models import (
     Distance,
     VectorParams,
     PointStruct,
     Filter,
     FieldCondition,
+    MatchAny,
     MatchValue
 )
 from typing import List, Dict, Any, Optional
+import asyncio
 import hashlib
 import logging
 
@@ -24,6 +28,14 @@ logger = logging.getLogger(__name__)
 COLLECTION_CODE = "code_snippets"
 COLLECTION_DOCS = "documentation"
 
+# Errors that mean the embedding provider or Qdrant is unreachable
+_OUTAGE_ERRORS: tuple = (TimeoutError, ConnectionError, httpx.TransportError, ResponseHandlingException)
+try:
+    from openai import APIConnectionError  # optional: EMBEDDINGS_PROVIDER=openai
+    _OUTAGE_ERRORS += (APIConnectionError,)
+except ImportError:
+    pass
+
 # Global client
 _qdrant_client: Optional[AsyncQdrantClient] = None
 
@@ -103,21 +115,13 @@ async def index_code_snippet(
     client = get_client()
     
     # Generate ID from content hash
-    point_id = hashlib.sha256(
-        f"{workspace_id}:{file_path}:{content}".encode()
-    ).hexdigest()[:16]
+    point_id = _point_id(workspace_id, file_path, content)
     
     # Generate embedding
     embedding = await embed_text(content)
     
     # Prepare payload
-    payload = {
-        "content": content,
-        "file_path": file_path,
-        "language": language,
-        "workspace_id": workspace_id,
-        **(metadata or {})
-    }
+    payload = _build_payload(content, file_path, language, workspace_id, metadata)
     
     # Upsert point
     await client.upsert(
@@ -134,6 +138,132 @@ async def index_code_snippet(
     return point_id
 
 
+async def index_code_snippets(
+    snippets: List[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Index many code snippets with batched embedding and upserts
+    
+    Snippets are split into batches; each batch is embedded in one call and
+    upserted in one request, with at most ``concurrency`` batches in flight.
+    A batch failing on its content (e.g. a rejected point) is retried in
+    halves down to single snippets, so one bad snippet only fails itself;
+    outages (connection errors, timeouts, 429/5xx) fail the batch at once.
+    
+    Args:
+        snippets: Dicts with content, file_path, language, workspace_id
+            and optional metadata
+        batch_size: Snippets per embed/upsert batch
+        concurrency: Maximum batches in flight
+        
+    Returns:
+        Per-snippet results in input order: index, point_id, success, error
+    """
+    client = get_client()
+    batch_size = max(1, batch_size or settings.INDEX_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.INDEX_UPSERT_CONCURRENCY))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(snippets)
+    
+    async def index_batch(start: int, batch: List[Dict[str, Any]]):
+        point_ids = [
+            _point_id(item["workspace_id"], item["file_path"], item["content"])
+            for item in batch
+        ]
+        
+        async with semaphore:
+            try:
+                embeddings = await embed_texts([item["content"] for item in batch])
+                
+                await client.upsert(
+                    collection_name=COLLECTION_CODE,
+                    points=[
+                        PointStruct(
+                            id=point_id,
+                            vector=embedding,
+                            payload=_build_payload(
+                                item["content"],
+                                item["file_path"],
+                                item["language"],
+                                item["workspace_id"],
+                                item.get("metadata")
+                            )
+                        )
+                        for item, point_id, embedding in zip(batch, point_ids, embeddings)
+                    ]
+                )
+                error = None
+            except Exception as e:
+                error = str(e)
+                outage = _is_outage(e)
+        
+        if error is not None and len(batch) > 1 and not outage:
+            logger.warning(f"⚠️  Bulk index batch at {start} ({len(batch)} snippets) failed, retrying in halves: {error}")
+            middle = len(batch) // 2
+            await asyncio.gather(
+                index_batch(start, batch[:middle]),
+                index_batch(start + middle, batch[middle:])
+            )
+            return
+        if error is not None:
+            logger.error(f"❌ Indexing snippet {start} failed: {error}")
+        
+        for offset, point_id in enumerate(point_ids):
+            results[start + offset] = {
+                "index": start + offset,
+                "point_id": point_id if error is None else None,
+                "success": error is None,
+                "error": error
+            }
+    
+    await asyncio.gather(*(
+        index_batch(start, snippets[start:start + batch_size])
+        for start in range(0, len(snippets), batch_size)
+    ))
+    
+    return results
+
+
+def _is_outage(error: BaseException) -> bool:
+    """Whether an embed/upsert error hits every snippet alike, so retrying smaller batches cannot help"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, _OUTAGE_ERRORS):
+            return True
+        status = error.status_code if isinstance(error, UnexpectedResponse) else getattr(error, "status_code", None)
+        if isinstance(status, int) and (status == 429 or status >= 500):
+            return True
+        # Client libraries may wrap the transport error
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _point_id(workspace_id: str, file_path: str, content: str) -> str:
+    """Generate point ID from content hash"""
+    return hashlib.sha256(
+        f"{workspace_id}:{file_path}:{content}".encode()
+    ).hexdigest()[:16]
+
+
+def _build_payload(
+    content: str,
+    file_path: str,
+    language: str,
+    workspace_id: str,
+    metadata: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Build point payload for a code snippet"""
+    return {
+        "content": content,
+        "file_path": file_path,
+        "language": language,
+        "workspace_id": workspace_id,
+        **(metadata or {})
+    }
+
+
 async def search_code(
     query: str,
     workspace_id: Optional[str] = None,
@@ -216,6 +346,29 @@ async def delete_workspace_code(workspace_id: str):
     logger.info(f"Deleted code snippets for workspace: {workspace_id}")
 
 
+async def delete_files_code(workspace_id: str, file_paths: List[str]):
+    """Delete all code snippets indexed for the given files of a workspace"""
+    client = get_client()
+    
+    # Keep filters small for large change sets
+    for start in range(0, len(file_paths), settings.INDEX_BATCH_SIZE):
+        await client.delete(
+            collection_name=COLLECTION_CODE,
+            points_selector=Filter(
+                must=[
+                    FieldCondition(
+                        key="workspace_id",
+                        match=MatchValue(value=workspace_id)
+                    ),
+                    FieldCondition(
+                        key="file_path",
+                        match=MatchAny(any=file_paths[start:start + settings.INDEX_BATCH_SIZE])
+                    )
+                ]
+            )
+        )
+
+
 async def get_collection_stats() -> Dict[str, Any]:
     """Get vector store statistics"""
     client = get_client()
@@ -0,0 +1,363 @@
+"""
+Incremental workspace indexer
+
+Walks a workspace, parses supported files with tree-sitter into
+function/class-level chunks in a process pool, stores symbols in the
+CodeContext table and embeds chunks into the code collection. Files whose
+content hash matches the last indexed run are skipped.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+
+from sqlalchemy import and_, delete, or_, select
+
+from core.config import settings
+from core.database import AsyncSessionLocal, CodeContext
+from services.code_parser import detect_language, parse_files
+from services.vector_store import delete_files_code, index_code_snippets
+
+logger = logging.getLogger(__name__)
+
+# Files handed to a pool worker per task
+PARSE_BATCH_SIZE = 32
+
+# Rows per IN (...) query against code_context
+DB_BATCH_SIZE = 1000
+
+
+class WorkspaceIndexer:
+    """Indexes workspaces into the vector store and CodeContext table"""
+    
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._locks: Dict[str, asyncio.Lock] = {}
+    
+    async def index_workspace(
+        self,
+        workspace_path: str,
+        workspace_id: Optional[str] = None,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Index every supported file of a workspace, skipping unchanged files
+        
+        Args:
+            workspace_path: Workspace root on disk
+            workspace_id: Vector store workspace identifier (defaults to path)
+            force: Re-parse and re-embed even when content hashes match
+            
+        Returns:
+            Indexing statistics
+        """
+        root = self._resolve_root(workspace_path)
+        
+        async with self._lock_for(root):
+            started = time.monotonic()
+            workspace_id = workspace_id or workspace_path
+            files = await asyncio.to_thread(self._scan, root)
+            known = await self._load_hashes(str(root), workspace_id)
+            removed = sorted(set(known) - set(files))
+            # force only skips the "unchanged" shortcut; known still drives stale/removed cleanup
+            stats = await self._index(root, workspace_id, files, removed, known, force=force)
+            stats["files_scanned"] = len(files)
+            stats["duration_seconds"] = round(time.monotonic() - started, 3)
+        
+        logger.info(f"📚 Indexed workspace {root}: {stats}")
+        return stats
+    
+    async def index_files(
+        self,
+        workspace_path: str,
+        file_paths: Iterable[str],
+        workspace_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Re-index specific files of a workspace (deleted files are removed)
+        
+        A directory path indexes every file below it; a deleted directory
+        removes the files indexed below it.
+        
+        Args:
+            workspace_path: Workspace root on disk
+            file_paths: Paths relative to the workspace root
+            workspace_id: Vector store workspace identifier (defaults to path)
+            
+        Returns:
+            Indexing statistics
+        """
+        root = self._resolve_root(workspace_path)
+        
+        workspace_id = workspace_id or workspace_path
+        async with self._lock_for(root):
+            files: Dict[str, str] = {}
+            removed: List[str] = []
+            directories: List[str] = []
+            for relative in sorted(set(file_paths)):
+                absolute = root / relative
+                if absolute.is_file():
+                    if self._is_indexable(relative, absolute.stat().st_size):
+                        files[relative] = str(absolute)
+                elif absolute.is_dir():
+                    files.update(await asyncio.to_thread(self._scan, root, absolute))
+                elif detect_language(relative):
+                    removed.append(relative)
+                else:
+                    directories.append(relative)
+            
+            if directories:
+                removed.extend(await self._indexed_under(str(root), workspace_id, directories))
+            removed = [path for path in dict.fromkeys(removed) if path not in files]
+            
+            known = await self._load_hashes(str(root), workspace_id, list(files) + removed)
+            removed = [path for path in removed if path in known]
+            return await self._index(root, workspace_id, files, removed, known)
+    
+    async def forget_workspace(self, workspace_id: str):
+        """
+        Delete CodeContext rows of a vector store workspace so the next run
+        re-indexes every file
+        
+        Rows written before workspace_id was recorded are matched by path,
+        which was the default workspace_id.
+        """
+        legacy_path = str(Path(workspace_id).resolve())
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                delete(CodeContext).where(or_(
+                    CodeContext.workspace_id == workspace_id,
+                    and_(CodeContext.workspace_id.is_(None), CodeContext.workspace_path == legacy_path)
+                ))
+            )
+            await session.commit()
+    
+    async def shutdown(self):
+        """Stop parse worker processes"""
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
+    async def _index(
+        self,
+        root: Path,
+        workspace_id: str,
+        files: Dict[str, str],
+        removed: List[str],
+        known: Dict[str, str],
+        force: bool = False
+    ) -> Dict[str, Any]:
+        parsed = await self._parse([
+            (absolute, relative, None if force else known.get(relative))
+            for relative, absolute in files.items()
+        ])
+        
+        errors = {r["file_path"]: r["error"] for r in parsed if r.get("error")}
+        changed = [r for r in parsed if not r["unchanged"] and not r.get("error")]
+        
+        # Drop stale points for changed and removed files before re-embedding
+        stale = [r["file_path"] for r in changed if r["file_path"] in known] + removed
+        if stale:
+            await delete_files_code(workspace_id, stale)
+        
+        snippets: List[Dict[str, Any]] = []
+        owners: List[str] = []
+        for result in changed:
+            language = "typescript" if result["language"] == "tsx" else result["language"]
+            for chunk in result["chunks"]:
+                snippets.append({
+                    "content": chunk["content"],
+                    "file_path": result["file_path"],
+                    "language": language,
+                    "workspace_id": workspace_id,
+                    "metadata": {
+                        "symbol": chunk["symbol"],
+                        "kind": chunk["kind"],
+                        "start_line": chunk["start_line"],
+                        "end_line": chunk["end_line"],
+                        "content_hash": result["content_hash"]
+                    }
+                })
+                owners.append(result["file_path"])
+        
+        indexed = await index_code_snippets(snippets) if snippets else []
+        for owner, outcome in zip(owners, indexed):
+            if not outcome["success"]:
+                errors.setdefault(owner, outcome["error"])
+        
+        # Files with failed chunks keep their old hash so the next run retries them
+        stored = [r for r in changed if r["file_path"] not in errors]
+        await self._store_contexts(str(root), workspace_id, stored, removed)
+        
+        return {
+            "files_changed": len(changed),
+            "files_unchanged": sum(1 for r in parsed if r["unchanged"]),
+            "files_removed": len(removed),
+            "chunks_indexed": sum(1 for outcome in indexed if outcome["success"]),
+            "failures": [{"file_path": path, "error": error} for path, error in errors.items()]
+        }
+    
+    async def _parse(self, batch: List[tuple]) -> List[Dict[str, Any]]:
+        if not batch:
+            return []
+        
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(pool, parse_files, batch[start:start + PARSE_BATCH_SIZE])
+            for start in range(0, len(batch), PARSE_BATCH_SIZE)
+        ))
+        return [result for part in parts for result in part]
+    
+    async def _load_hashes(
+        self,
+        workspace_path: str,
+        workspace_id: str,
+        file_paths: Optional[List[str]] = None
+    ) -> Dict[str, str]:
+        """
+        Load content hashes of files indexed into this workspace_id
+        
+        Rows stored under another workspace_id are left out, so their files
+        are re-embedded into this one instead of being skipped as unchanged.
+        """
+        query = (
+            select(CodeContext.file_path, CodeContext.content_hash)
+            .where(self._owned_by(workspace_path, workspace_id))
+        )
+        hashes: Dict[str, str] = {}
+        async with AsyncSessionLocal() as session:
+            if file_paths is None:
+                rows = await session.execute(query)
+                hashes.update(dict(rows.all()))
+            else:
+                for start in range(0, len(file_paths), DB_BATCH_SIZE):
+                    rows = await session.execute(
+                        query.where(CodeContext.file_path.in_(file_paths[start:start + DB_BATCH_SIZE]))
+                    )
+                    hashes.update(dict(rows.all()))
+        return hashes
+    
+    async def _indexed_under(
+        self,
+        workspace_path: str,
+        workspace_id: str,
+        directories: List[str]
+    ) -> List[str]:
+        """Indexed files below the given directories (relative paths)"""
+        file_paths: List[str] = []
+        async with AsyncSessionLocal() as session:
+            for start in range(0, len(directories), DB_BATCH_SIZE):
+                rows = await session.execute(
+                    select(CodeContext.file_path)
+                    .where(self._owned_by(workspace_path, workspace_id))
+                    .where(or_(*(
+                        CodeContext.file_path.startswith(directory.rstrip("/") + "/", autoescape=True)
+                        for directory in directories[start:start + DB_BATCH_SIZE]
+                    )))
+                )
+                file_paths.extend(rows.scalars())
+        return file_paths
+    
+    def _owned_by(self, workspace_path: str, workspace_id: str):
+        """Rows of this workspace_id, plus rows written before workspace_id was recorded"""
+        return and_(
+            CodeContext.workspace_path == workspace_path,
+            or_(CodeContext.workspace_id == workspace_id, CodeContext.workspace_id.is_(None))
+        )
+    
+    async def _store_contexts(
+        self,
+        workspace_path: str,
+        workspace_id: str,
+        parsed: List[Dict[str, Any]],
+        removed: List[str]
+    ):
+        """Upsert CodeContext rows for parsed files and delete removed ones"""
+        async with AsyncSessionLocal() as session:
+            for start in range(0, len(removed), DB_BATCH_SIZE):
+                await session.execute(
+                    delete(CodeContext)
+                    .where(CodeContext.workspace_path == workspace_path)
+                    .where(CodeContext.file_path.in_(removed[start:start + DB_BATCH_SIZE]))
+                )
+            
+            for start in range(0, len(parsed), DB_BATCH_SIZE):
+                batch = parsed[start:start + DB_BATCH_SIZE]
+                rows = await session.execute(
+                    select(CodeContext)
+                    .where(CodeContext.workspace_path == workspace_path)
+                    .where(CodeContext.file_path.in_([r["file_path"] for r in batch]))
+                )
+                existing = {row.file_path: row for row in rows.scalars()}
+                
+                for result in batch:
+                    row = existing.get(result["file_path"])
+                    if row is None:
+                        row = CodeContext(
+                            context_id=str(uuid.uuid4()),
+                            workspace_path=workspace_path,
+                            file_path=result["file_path"]
+                        )
+                        session.add(row)
+                    row.workspace_id = workspace_id
+                    row.content_hash = result["content_hash"]
+                    row.symbols = result["symbols"]
+                    row.dependencies = result["dependencies"]
+            
+            await session.commit()
+    
+    def _scan(self, root: Path, directory: Optional[Path] = None) -> Dict[str, str]:
+        """Collect indexable files (below directory, if given) as {relative path: absolute path}"""
+        ignored: Set[str] = set(settings.INDEXER_IGNORED_DIRS)
+        files: Dict[str, str] = {}
+        
+        for dirpath, dirnames, filenames in os.walk(directory or root):
+            dirnames[:] = [d for d in dirnames if d not in ignored]
+            for filename in filenames:
+                absolute = os.path.join(dirpath, filename)
+                relative = os.path.relpath(absolute, root).replace(os.sep, "/")
+                try:
+                    size = os.path.getsize(absolute)
+                except OSError:
+                    continue
+                if self._is_indexable(relative, size):
+                    files[relative] = absolute
+        
+        return files
+    
+    def _is_indexable(self, relative: str, size: int) -> bool:
+        if size > settings.INDEXER_MAX_FILE_BYTES:
+            return False
+        if any(part in settings.INDEXER_IGNORED_DIRS for part in relative.split("/")[:-1]):
+            return False
+        return detect_language(relative) is not None
+    
+    def _resolve_root(self, workspace_path: str) -> Path:
+        root = Path(workspace_path).resolve()
+        if not root.is_dir():
+            raise ValueError(f"Workspace not found: {workspace_path}")
+        return root
+    
+    def _lock_for(self, root: Path) -> asyncio.Lock:
+        return self._locks.setdefault(str(root), asyncio.Lock())
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a worker that has torch/CUDA loaded is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+
+# Global indexer instance
+workspace_indexer = WorkspaceIndexer(workers=settings.INDEXER_WORKERS)
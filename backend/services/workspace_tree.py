@@ -0,0 +1,333 @@
+"""
+Cached workspace directory tree for the file_list tool
+
+Each directory is read once with os.scandir (file type from the dirent,
+one lstat per file for its size), filtered through the .gitignore rules
+that apply to it plus INDEXER_IGNORED_DIRS, and kept in memory as a
+sorted entry list. A cached directory is trusted for
+FILE_TREE_REFRESH_SECONDS; after that its mtime (and its .gitignore's) is
+re-checked and only changed directories are re-read. Note that editing a
+file in place does not touch its directory's mtime, so sizes can lag
+until the directory itself changes.
+
+Listings walk the cached tree in sorted pre-order, so a cursor is just
+the last returned path: the next page resumes by bisecting each level
+instead of re-walking everything before it.
+"""
+
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import fnmatch
+import os
+import re
+import threading
+import time
+
+from core.config import settings
+
+# (regex, negate, directories only)
+Rule = Tuple["re.Pattern[str]", bool, bool]
+
+# (path of the directory holding the .gitignore, with trailing "/", its rules)
+RuleChain = List[Tuple[str, List[Rule]]]
+
+# (name, is_dir, size)
+Entry = Tuple[str, bool, Optional[int]]
+
+# Chain above the workspace root; shared so identity checks hold
+_NO_RULES: RuleChain = []
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate one gitignore glob (no leading/trailing slash) to a regex"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+            if i + 2 == n:
+                out.append(".*")
+                i += 2
+                continue
+            if pattern[i + 2] == "/":
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+        if char == "*":
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif char == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return "".join(out)
+
+
+def parse_gitignore(text: str) -> List[Rule]:
+    """Compile the rules of one .gitignore file"""
+    rules: List[Rule] = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        line = re.sub(r"(?<!\\)\s+$", "", line)
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+        anchored = "/" in line
+        regex = _glob_to_regex(line.lstrip("/"))
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        try:
+            rules.append((re.compile(regex + r"\Z", re.DOTALL), negate, dir_only))
+        except re.error:
+            continue
+    return rules
+
+
+def is_ignored(chain: RuleChain, path: str, is_dir: bool) -> bool:
+    """Apply gitignore rules from the root down; the last matching rule wins"""
+    ignored = False
+    for base, rules in chain:
+        relative = path[len(base):]
+        for regex, negate, dir_only in rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relative):
+                ignored = not negate
+    return ignored
+
+
+class _Dir:
+    """Cached listing of one directory"""
+    
+    __slots__ = ("mtime_ns", "ignore_mtime_ns", "chain", "parent_chain", "entries", "names", "checked_at", "checked_in")
+    
+    def __init__(self, mtime_ns: int, ignore_mtime_ns: Optional[int], chain: RuleChain,
+                 parent_chain: RuleChain, entries: List[Entry]):
+        self.mtime_ns = mtime_ns
+        self.ignore_mtime_ns = ignore_mtime_ns
+        self.chain = chain
+        self.parent_chain = parent_chain
+        self.entries = entries
+        self.names = [entry[0] for entry in entries]
+        self.checked_at = time.monotonic()
+        self.checked_in = 0
+
+
+class WorkspaceTree:
+    """Lazily scanned, mtime-validated directory snapshot of one workspace"""
+    
+    def __init__(self, root: Path):
+        self.root = str(root)
+        self._dirs: Dict[str, _Dir] = {}
+        self._lock = threading.Lock()
+        self._call = 0  # listing counter; a directory is validated at most once per call
+    
+    def list(
+        self,
+        path: str = "",
+        depth: int = 1,
+        glob: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 200,
+        tree: bool = False
+    ) -> Dict[str, Any]:
+        """
+        List entries below a directory in sorted pre-order
+        
+        Args:
+            path: Directory relative to the workspace root ("" for the root)
+            depth: Levels to descend (1 = direct children)
+            glob: fnmatch pattern applied to paths relative to ``path``
+            cursor: ``next_cursor`` of the previous page
+            limit: Maximum entries per page
+            tree: Return an indented text rendering instead of entry dicts
+        
+        Returns:
+            {"entries": [...]} or {"tree": str}, plus "next_cursor" when
+            more entries remain
+        
+        Raises:
+            FileNotFoundError: If ``path`` is not a directory
+        """
+        path = path.strip("/")
+        after = cursor.strip("/").split("/") if cursor else None
+        with self._lock:
+            self._call += 1
+            self._dir(path)
+            walk = self._walk(path, "", max(1, depth), after)
+            page: List[Tuple[str, bool, Optional[int]]] = []
+            next_cursor = None
+            for item in walk:
+                if glob and not fnmatch.fnmatch(item[0], glob):
+                    continue
+                if len(page) == limit:
+                    next_cursor = page[-1][0]
+                    break
+                page.append(item)
+        
+        result: Dict[str, Any] = {}
+        if tree:
+            result["tree"] = render_tree(page)
+        else:
+            result["entries"] = [{"name": name, "is_dir": is_dir, "size": size} for name, is_dir, size in page]
+        if next_cursor:
+            result["next_cursor"] = next_cursor
+        return result
+    
+    def _walk(self, rel: str, prefix: str, depth: int, after: Optional[List[str]]) -> Iterator[Tuple[str, bool, Optional[int]]]:
+        try:
+            node = self._dir(rel)
+        except OSError:
+            return
+        entries = node.entries
+        start = 0
+        if after:
+            start = bisect_left(node.names, after[0])
+            if start < len(entries) and entries[start][0] == after[0]:
+                name, is_dir, _ = entries[start]
+                start += 1
+                if is_dir and depth > 1:
+                    yield from self._walk(self._join(rel, name), prefix + name + "/", depth - 1, after[1:] or None)
+        for name, is_dir, size in entries[start:]:
+            yield prefix + name, is_dir, size
+            if is_dir and depth > 1:
+                yield from self._walk(self._join(rel, name), prefix + name + "/", depth - 1, None)
+    
+    def _dir(self, rel: str) -> _Dir:
+        """Cached directory, re-read if its mtime, .gitignore or inherited rules changed"""
+        node = self._dirs.get(rel)
+        if node is not None and (
+            node.checked_in == self._call
+            or time.monotonic() - node.checked_at < settings.FILE_TREE_REFRESH_SECONDS
+        ):
+            return node
+        
+        parent_chain = self._dir(rel.rpartition("/")[0]).chain if rel else _NO_RULES
+        full = os.path.join(self.root, rel)
+        try:
+            mtime_ns = os.stat(full).st_mtime_ns
+            ignore_mtime_ns = self._mtime(os.path.join(full, ".gitignore"))
+        except OSError:
+            self._dirs.pop(rel, None)
+            raise
+        
+        if node is not None and node.parent_chain is parent_chain and node.ignore_mtime_ns == ignore_mtime_ns:
+            if node.mtime_ns == mtime_ns:
+                node.checked_at = time.monotonic()
+                node.checked_in = self._call
+                return node
+            chain = node.chain  # same rules: keep the chain object so children stay valid
+        else:
+            chain = parent_chain
+            if ignore_mtime_ns is not None:
+                try:
+                    with open(os.path.join(full, ".gitignore"), encoding="utf-8", errors="replace") as handle:
+                        rules = parse_gitignore(handle.read())
+                except OSError:
+                    rules = []
+                if rules:
+                    chain = parent_chain + [(rel + "/" if rel else "", rules)]
+        
+        node = _Dir(mtime_ns, ignore_mtime_ns, chain, parent_chain, self._scan(full, rel, chain))
+        node.checked_in = self._call
+        self._dirs[rel] = node
+        return node
+    
+    def _scan(self, full: str, rel: str, chain: RuleChain) -> List[Entry]:
+        ignored_dirs = settings.INDEXER_IGNORED_DIRS
+        prefix = rel + "/" if rel else ""
+        entries: List[Entry] = []
+        with os.scandir(full) as iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if is_dir and entry.name in ignored_dirs:
+                        continue
+                    if chain and is_ignored(chain, prefix + entry.name, is_dir):
+                        continue
+                    size = None if is_dir else entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+                entries.append((entry.name, is_dir, size))
+        entries.sort()
+        return entries
+    
+    def _join(self, rel: str, name: str) -> str:
+        return f"{rel}/{name}" if rel else name
+    
+    def _mtime(self, path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+
+def render_tree(page: List[Tuple[str, bool, Optional[int]]]) -> str:
+    """
+    Indented rendering of a listing page; parent directories missing from
+    the page (filtered out, or on an earlier page) are printed for context
+    """
+    lines: List[str] = []
+    shown: List[str] = []
+    for path, is_dir, _ in page:
+        parts = path.split("/")
+        parents = parts[:-1]
+        common = 0
+        while common < len(shown) and common < len(parents) and shown[common] == parents[common]:
+            common += 1
+        del shown[common:]
+        for level in range(common, len(parents)):
+            lines.append("  " * level + parents[level] + "/")
+            shown.append(parents[level])
+        lines.append("  " * len(parents) + parts[-1] + ("/" if is_dir else ""))
+        if is_dir:
+            shown.append(parts[-1])
+    return "\n".join(lines)
+
+
+class WorkspaceTreeService:
+    """Per-workspace cached trees, created on first use"""
+    
+    def __init__(self):
+        self._trees: Dict[str, WorkspaceTree] = {}
+        self._lock = threading.Lock()
+    
+    def list(self, workspace_root: Path, path: str = "", **options) -> Dict[str, Any]:
+        """
+        List a workspace directory (blocking; call from a worker thread)
+        
+        Raises:
+            FileNotFoundError: If ``path`` is not a directory
+        """
+        key = str(workspace_root)
+        with self._lock:
+            tree = self._trees.get(key)
+            if tree is None:
+                tree = self._trees[key] = WorkspaceTree(workspace_root)
+        return tree.list(path, **options)
+
+
+# Global workspace tree service
+workspace_trees = WorkspaceTreeService()
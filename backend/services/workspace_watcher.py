@@ -0,0 +1,200 @@
+"""
+Live re-indexing of registered workspaces from file-system events
+
+Each watched workspace gets an inotify-backed watcher (via watchfiles) that
+debounces event bursts into change sets, plus a consumer that coalesces
+pending changes and re-indexes only the affected files.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+
+from prometheus_client import Gauge, Histogram
+from watchfiles import Change, awatch
+
+from core.config import settings
+from services.code_parser import detect_language
+from services.workspace_indexer import workspace_indexer
+
+logger = logging.getLogger(__name__)
+
+WATCHER_PENDING = Gauge(
+    "breezer_watcher_pending_files",
+    "Changed files waiting to be re-indexed",
+    ["workspace"]
+)
+WATCHER_LAG = Gauge(
+    "breezer_watcher_lag_seconds",
+    "Age of the oldest change not yet re-indexed",
+    ["workspace"]
+)
+WATCHER_INDEX_LAG = Histogram(
+    "breezer_watcher_index_lag_seconds",
+    "Time from first file event to the change set being indexed",
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+
+
+class WorkspaceWatcher:
+    """Watches one workspace and keeps its index current"""
+    
+    def __init__(self, workspace_path: str, workspace_id: Optional[str] = None):
+        self.root = Path(workspace_path).resolve()
+        self.workspace_path = workspace_path
+        self.workspace_id = workspace_id or workspace_path
+        self._pending: Dict[str, float] = {}  # relative path -> first event time
+        self._in_flight: Dict[str, float] = {}  # change set being indexed
+        self._changed = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.indexed_files = 0
+        self.last_indexed_at: Optional[float] = None
+        
+        WATCHER_PENDING.labels(workspace=self.workspace_id).set_function(self.pending_files)
+        WATCHER_LAG.labels(workspace=self.workspace_id).set_function(self.lag)
+    
+    def start(self):
+        """Start watcher and indexing tasks"""
+        self._tasks = [
+            asyncio.create_task(self._watch(), name=f"watch:{self.root}"),
+            asyncio.create_task(self._consume(), name=f"reindex:{self.root}")
+        ]
+    
+    async def stop(self):
+        """Stop watching and drop pending changes"""
+        self._stop.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._pending.clear()
+        self._in_flight = {}
+        WATCHER_PENDING.remove(self.workspace_id)
+        WATCHER_LAG.remove(self.workspace_id)
+    
+    def pending_files(self) -> int:
+        """Changed files not yet re-indexed, including the change set in flight"""
+        return len(self._pending.keys() | self._in_flight.keys())
+    
+    def lag(self) -> float:
+        """Seconds since the oldest change not yet re-indexed was observed"""
+        seen = [*self._pending.values(), *self._in_flight.values()]
+        if not seen:
+            return 0.0
+        return time.monotonic() - min(seen)
+    
+    def status(self) -> Dict[str, Any]:
+        return {
+            "workspace_path": self.workspace_path,
+            "workspace_id": self.workspace_id,
+            "pending_files": self.pending_files(),
+            "lag_seconds": round(self.lag(), 3),
+            "indexed_files": self.indexed_files,
+            "running": any(not task.done() for task in self._tasks)
+        }
+    
+    def _accepts(self, change: Change, path: str) -> bool:
+        try:
+            relative = Path(path).relative_to(self.root).as_posix()
+        except ValueError:
+            return False
+        if relative == "." or any(part in settings.INDEXER_IGNORED_DIRS for part in relative.split("/")):
+            return False
+        if detect_language(relative) is not None:
+            return True
+        # A directory renamed or deleted arrives as a single event for the
+        # directory; index_files expands it into the files below it
+        if change == Change.deleted:
+            return True
+        return change == Change.added and os.path.isdir(path)
+    
+    async def _watch(self):
+        async for changes in awatch(
+            self.root,
+            watch_filter=self._accepts,
+            debounce=settings.WATCHER_DEBOUNCE_MS,
+            stop_event=self._stop
+        ):
+            now = time.monotonic()
+            for _, path in changes:
+                relative = Path(path).relative_to(self.root).as_posix()
+                # Keep the first-seen time so lag reflects the oldest change
+                self._pending.setdefault(relative, now)
+            self._changed.set()
+    
+    async def _consume(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            
+            # Everything queued so far becomes one change set; events arriving
+            # while it is indexed coalesce into the next one
+            batch, self._pending = self._pending, {}
+            # The change set counts towards the pending and lag gauges until
+            # index_files returns
+            self._in_flight = batch
+            try:
+                stats = await workspace_indexer.index_files(
+                    self.workspace_path,
+                    list(batch),
+                    workspace_id=self.workspace_id
+                )
+            except Exception as e:
+                logger.error(f"❌ Re-index of {len(batch)} files in {self.root} failed: {e}")
+                for path, seen in batch.items():
+                    self._pending.setdefault(path, seen)
+                await asyncio.sleep(settings.WATCHER_RETRY_DELAY)
+                self._changed.set()
+                continue
+            finally:
+                self._in_flight = {}
+            
+            now = time.monotonic()
+            for seen in batch.values():
+                WATCHER_INDEX_LAG.observe(now - seen)
+            self.indexed_files += len(batch)
+            self.last_indexed_at = time.time()
+            logger.info(f"🔄 Re-indexed {len(batch)} changed files in {self.root}: {stats}")
+
+
+class WorkspaceWatcherManager:
+    """Registry of watched workspaces"""
+    
+    def __init__(self):
+        self._watchers: Dict[str, WorkspaceWatcher] = {}
+    
+    async def watch(self, workspace_path: str, workspace_id: Optional[str] = None) -> Dict[str, Any]:
+        """Start watching a workspace (no-op if already watched)"""
+        root = Path(workspace_path).resolve()
+        if not root.is_dir():
+            raise ValueError(f"Workspace not found: {workspace_path}")
+        
+        key = str(root)
+        if key not in self._watchers:
+            watcher = WorkspaceWatcher(workspace_path, workspace_id)
+            watcher.start()
+            self._watchers[key] = watcher
+            logger.info(f"👀 Watching workspace: {root}")
+        return self._watchers[key].status()
+    
+    async def unwatch(self, workspace_path: str) -> bool:
+        """Stop watching a workspace"""
+        watcher = self._watchers.pop(str(Path(workspace_path).resolve()), None)
+        if watcher is None:
+            return False
+        await watcher.stop()
+        return True
+    
+    def status(self) -> List[Dict[str, Any]]:
+        return [watcher.status() for watcher in self._watchers.values()]
+    
+    async def shutdown(self):
+        for key in list(self._watchers):
+            await self._watchers.pop(key).stop()
+
+
+# Global watcher registry
+workspace_watchers = WorkspaceWatcherManager()
@@ -1,9 +1,15 @@
 """OpenAI function-call compatible definitions for Breezer tools."""
 
+import copy
+
 TOOL_FUNCTIONS = [
     {
         "name": "file_read",
-        "description": "Read the contents of a file within the current workspace.",
+        "description": (
+            "Read the contents of a file within the current workspace. For large files, read only "
+            "what you need: a line range, a byte range, or a function/class by name (symbol). "
+            "Truncated results return next_line or next_offset to continue from."
+        ),
         "parameters": {
             "type": "object",
             "properties": {
@@ -13,8 +19,32 @@ TOOL_FUNCTIONS = [
                 },
                 "encoding": {
                     "type": "string",
-                    "description": "Encoding to use when reading the file (default utf-8).",
+                    "description": "Encoding to use when reading the file (default utf-8). Ranged reads support utf-8 and latin-1.",
                     "enum": ["utf-8", "latin-1", "utf-16"],
+                },
+                "start_line": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": "First line to read (1-based). Defaults to 1 when end_line is given."
+                },
+                "end_line": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": "Last line to read, inclusive. Defaults to the end of the file."
+                },
+                "offset": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "description": "Byte offset to start reading at. Cannot be combined with a line range."
+                },
+                "length": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "description": "Number of bytes to read from offset. Defaults to the end of the file."
+                },
+                "symbol": {
+                    "type": "string",
+                    "description": "Name of a function or class to read, optionally qualified (e.g. 'Parser.parse'). Python, JavaScript and TypeScript only."
                 }
             },
             "required": ["path"],
@@ -51,7 +81,11 @@ TOOL_FUNCTIONS = [
     },
     {
         "name": "file_list",
-        "description": "List files and folders beneath a directory.",
+        "description": (
+            "List files and folders beneath a directory, skipping .gitignore'd paths. Use depth to "
+            "list recursively and format 'tree' for a compact overview; pass next_cursor back as "
+            "cursor to get the next page."
+        ),
         "parameters": {
             "type": "object",
             "properties": {
@@ -63,13 +97,75 @@ TOOL_FUNCTIONS = [
                     "type": "integer",
                     "minimum": 1,
                     "maximum": 500,
-                    "description": "Maximum number of entries to return (default 50)."
+                    "description": "Maximum number of entries per page (default 50)."
+                },
+                "depth": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 32,
+                    "description": "Directory levels to descend (default 1, direct children only)."
+                },
+                "glob": {
+                    "type": "string",
+                    "description": "Only return paths matching this pattern, relative to path (e.g. '*.py', 'src/*/index.ts')."
+                },
+                "cursor": {
+                    "type": "string",
+                    "description": "next_cursor from a previous call with the same arguments."
+                },
+                "format": {
+                    "type": "string",
+                    "enum": ["entries", "tree"],
+                    "description": "'entries' (default) returns name/is_dir/size objects; 'tree' returns an indented listing."
                 }
             },
             "required": ["path"],
             "additionalProperties": False
         }
     },
+    {
+        "name": "code_search",
+        "description": (
+            "Search the workspace for a literal string or regular expression using an index. "
+            "Returns ranked matching lines with surrounding context; prefer this over listing "
+            "directories and reading whole files to locate code."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Text to find, or a Python regular expression when regex is true."
+                },
+                "regex": {
+                    "type": "boolean",
+                    "description": "Treat query as a regular expression (default false)."
+                },
+                "case_sensitive": {
+                    "type": "boolean",
+                    "description": "Match case exactly (default false)."
+                },
+                "path_glob": {
+                    "type": "string",
+                    "description": "Only search paths matching this glob, e.g. 'src/*.py' or '*.ts'."
+                },
+                "max_results": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 100,
+                    "description": "Maximum number of matching lines to return (default 20)."
+                },
+                "context_lines": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "maximum": 10,
+                    "description": "Lines of context before and after each match (default 2)."
+                }
+            },
+            "required": ["query"],
+            "additionalProperties": False
+        }
+    },
     {
         "name": "git_status",
         "description": "Show git status for the workspace with optional short or detailed output.",
@@ -134,7 +230,10 @@ TOOL_FUNCTIONS = [
     },
     {
         "name": "workspace_diagnostics",
-        "description": "Fetch summarized LSP diagnostics and workspace symbols.",
+        "description": (
+            "Fetch type-checker / linter diagnostics (errors first) from the workspace's language "
+            "servers (Python, TypeScript/JavaScript), optionally with workspace symbols matching a query."
+        ),
         "parameters": {
             "type": "object",
             "properties": {
@@ -142,10 +241,30 @@ TOOL_FUNCTIONS = [
                     "type": "integer",
                     "minimum": 1,
                     "maximum": 200,
-                    "description": "Maximum number of diagnostics to return (default 50)."
+                    "description": "Maximum number of diagnostics (and symbols) to return (default 50)."
+                },
+                "paths": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Relative file paths to check. Defaults to all source files in the workspace."
+                },
+                "symbol_query": {
+                    "type": "string",
+                    "description": "Also return workspace symbols (classes, functions, ...) whose names match this query."
                 }
             },
             "additionalProperties": False
         }
     }
 ]
+
+
+# Chat-completions "tools" payload, built once so every request sends
+# byte-identical schemas (keeps the provider's cached prompt prefix valid)
+TOOL_SCHEMAS = [
+    {
+        "type": "function",
+        "function": copy.deepcopy(definition)
+    }
+    for definition in TOOL_FUNCTIONS
+]